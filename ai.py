@@ -0,0 +1,364 @@
+"""Module that contains the services which choose the moves of the AI opponent of the
+web-based game away from the request handlers, and the stronger AI strategies they run"""
+import concurrent.futures
+import logging
+import multiprocessing
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import metrics
+import mp_game_engine
+import transposition
+
+# Cell values of an observation of the user's board
+UNKNOWN, MISS, HIT, SUNK = 0, 1, 2, 3
+# Width of the square of cells the AI hunts in on larger boards (see density_window)
+DENSITY_WINDOW = 32
+# Best cells to attack of the positions evaluated by this process (see cached_density_attack)
+TRANSPOSITIONS = transposition.TranspositionCache()
+
+def observe(game: dict) -> tuple:
+    """Function used to build the compact observation of a web game the AI chooses its next
+    attack from, which is cheap to send to another process: the size of the board, the
+    lengths of the user's ships that are not sunk, a dictionary of the index (y * size + x)
+    of each cell the AI has attacked to what it saw there, every other cell being UNKNOWN,
+    the seed of the game and the number of the AI's turn. It takes the time of the AI's
+    attacks, whatever the size of the board
+
+    :param game: a dictionary containing the state of the game (see mp_game_engine.start_game)
+    """
+    size = len(game["user_board"])
+    cells = {}
+    for attacker, x, y, hit in game["moves"]:
+        if attacker == "AI_Player":
+            cells[y * size + x] = HIT if hit else MISS
+    sunk = [event["sunk"] for event in game["events"]
+            if event["attacker"] == "AI_Player" and event["sunk"]]
+    # Once every hit belongs to a sunk ship, the hits no longer need to be followed up
+    if sum(game["fleet"][ship] for ship in sunk) == list(cells.values()).count(HIT):
+        cells = {index: SUNK if cell == HIT else cell for index, cell in cells.items()}
+    lengths = tuple(length for ship, length in game["fleet"].items() if ship not in sunk)
+    return size, lengths, cells, game["seed"], len(game["previous_ai_attacks"])
+
+def fallback_attack(observation: tuple) -> tuple:
+    """Function used to choose the AI's attack with generate_attack, the same attack the
+    web game chooses when no stronger AI is used (see mp_game_engine.hunt_attack)
+
+    :param observation: a tuple returned by observe
+    """
+    size, _, cells, seed, _ = observation
+    attacked = [(index % size, index // size) for index in sorted(cells)]
+    return mp_game_engine.hunt_attack(seed, attacked, size)
+
+def position(game: dict) -> tuple:
+    """Function used to get the key of what the AI has seen of the user's board in a
+    transposition cache, and the symmetry which turns the board into the orientation it is
+    cached in, from the Zobrist hashes kept by the game (see transposition.position_key)
+
+    :param game: a dictionary containing the state of the game (see mp_game_engine.start_game)
+    """
+    return transposition.position_key(game["hashes"]["AI_Player"], game["fleet"],
+                                      game["user_ships"])
+
+def density_window(observation: tuple) -> tuple:
+    """Function used to get the square of cells the density of a position is counted on,
+    returns the x and y of its first cell and its width. While a hit has not been sunk only
+    the placements through a hit are counted, wherever they are. Otherwise the whole board
+    is counted up to DENSITY_WINDOW cells wide, and a square of that width placed with the
+    seed of the game and the turn on larger boards, where most cells are as good as each other
+
+    :param observation: a tuple returned by observe
+    """
+    size, _, cells, seed, turn = observation
+    if size <= DENSITY_WINDOW or HIT in cells.values():
+        return 0, 0, size
+    rng = random.Random(f"{seed}:{turn}:window")
+    return rng.randrange(size - DENSITY_WINDOW + 1), rng.randrange(size - DENSITY_WINDOW + 1), DENSITY_WINDOW
+
+def density_candidates(observation: tuple) -> list:
+    """Function used to find the cells covered by the most placements of the ships that
+    are not sunk, returns their sorted indexes. While a hit has not been sunk, only the
+    placements through a hit are counted, weighted by the number of hits they cover, and
+    otherwise those covering the cells of density_window. The density is kept in a
+    dictionary of the cells counted, so a move takes the same time whatever the size of the board
+
+    :param observation: a tuple returned by observe
+    """
+    size, lengths, cells, _, _ = observation
+    hits = [index for index, cell in cells.items() if cell == HIT]
+    density = {}
+    for length in lengths:
+        placements = set()
+        for step in (1, size):
+            if hits:
+                # Every placement of the ship through a hit, by the cell it starts on
+                for hit in hits:
+                    x, y = hit % size, hit // size
+                    offsets = range(max(x + length - size, 0), min(x, length - 1) + 1) if step == 1 \
+                        else range(max(y + length - size, 0), min(y, length - 1) + 1)
+                    placements.update((hit - step * offset, step) for offset in offsets)
+            else:
+                # Every placement of the ship covering a cell of the window
+                first_x, first_y, width = density_window(observation)
+                last_x, last_y = first_x + width - 1, first_y + width - 1
+                if step == 1:
+                    xs = range(max(first_x - length + 1, 0), min(last_x, size - length) + 1)
+                    ys = range(first_y, last_y + 1)
+                else:
+                    xs = range(first_x, last_x + 1)
+                    ys = range(max(first_y - length + 1, 0), min(last_y, size - length) + 1)
+                placements.update((y * size + x, step) for y in ys for x in xs)
+        for first, step in placements:
+            placement = range(first, first + step * length, step)
+            values = [cells.get(index, UNKNOWN) for index in placement]
+            if MISS in values or SUNK in values:
+                continue
+            weight = 1 + 20 * values.count(HIT)
+            for index in placement:
+                if index not in cells:
+                    density[index] = density.get(index, 0) + weight
+    if not hits:
+        first_x, first_y, width = density_window(observation)
+        density = {index: value for index, value in density.items()
+                   if first_x <= index % size < first_x + width
+                   and first_y <= index // size < first_y + width}
+    best = max(density.values(), default = 0)
+    return sorted(index for index, value in density.items() if value == best)
+
+def pick_candidate(observation: tuple, candidates: list) -> tuple:
+    """Function used to choose the AI's attack among the best cells of a position. Ties are
+    broken with the seed of the game and the turn, so the same observation gives the same attack
+
+    :param observation: a tuple returned by observe
+    :param candidates: a sorted list of the indexes of the best cells
+    """
+    size, _, _, seed, turn = observation
+    if not candidates:
+        return fallback_attack(observation)
+    index = random.Random(f"{seed}:{turn}").choice(candidates)
+    return index % size, index // size
+
+def density_attack(observation: tuple) -> tuple:
+    """Function used to choose the AI's attack on the cell covered by the most placements
+    of the ships that are not sunk (see density_candidates)
+
+    :param observation: a tuple returned by observe
+    """
+    return pick_candidate(observation, density_candidates(observation))
+
+def cached_density_attack(observation: tuple, key: tuple) -> tuple:
+    """Function used to choose the same attack as density_attack, looking up the best cells
+    of the position in the transposition cache of this process first. They are cached in
+    the orientation of the key, so a reflection or rotation of a position evaluated before
+    costs a lookup instead of an evaluation
+
+    :param observation: a tuple returned by observe
+    :param key: a tuple returned by position, the key and the symmetry of the position
+    """
+    key, symmetry = key
+    size = observation[0]
+    if density_window(observation)[2] < size:
+        # The window depends on the turn, so positions of larger boards are not cached
+        return density_attack(observation)
+    cached = TRANSPOSITIONS.get(key)
+    if cached is None:
+        candidates = density_candidates(observation)
+        TRANSPOSITIONS.put(key, transposition.transform(candidates, symmetry, size))
+    else:
+        candidates = transposition.transform(cached, transposition.INVERSES[symmetry], size)
+    return pick_candidate(observation, candidates)
+
+def anytime_attack(observation: tuple, budget: float, max_samples: int = 20000) -> tuple:
+    """Function used to choose the AI's attack within a time budget, whatever the size of
+    the board. It samples random placements of the ships that are not sunk (only those
+    through a hit while a hit has not been sunk) and attacks the cell covered by the most
+    of them, so its choice gets better the more placements it has time to sample. It
+    always has an attack to return, the one of generate_attack until a placement is
+    sampled. Returns the attack and the number of seconds used
+
+    :param observation: a tuple returned by observe
+    :param budget: a float value with the number of seconds the AI can think for
+    :param max_samples: an integer value with the number of placements after which the
+    choice is good enough to stop before the budget runs out
+    """
+    start = time.perf_counter()
+    deadline = start + budget
+    size, lengths, cells, seed, turn = observation
+    rng = random.Random(f"{seed}:{turn}")
+    hits = sorted(index for index, cell in cells.items() if cell == HIT)
+    density = {}
+    samples = 0
+    while samples < max_samples and time.perf_counter() < deadline:
+        # The clock is only read once per batch of samples
+        for _ in range(64):
+            length = rng.choice(lengths)
+            step = rng.choice((1, size))
+            if hits:
+                # Place the ship so that it goes through a random hit
+                hit = rng.choice(hits)
+                first = hit - step * rng.randrange(length)
+            else:
+                first = rng.randrange(size * size)
+            if first < 0:
+                continue
+            x, y = first % size, first // size
+            if (step == 1 and x + length > size) or (step == size and y + length > size):
+                continue
+            placement = range(first, first + step * length, step)
+            values = [cells.get(index, UNKNOWN) for index in placement]
+            if MISS in values or SUNK in values:
+                continue
+            weight = 1 + 20 * values.count(HIT)
+            for index in placement:
+                if index not in cells:
+                    density[index] = density.get(index, 0) + weight
+        samples += 64
+    if density:
+        index = max(density, key = lambda cell: (density[cell], -cell))
+        attack = index % size, index // size
+    else:
+        attack = fallback_attack(observation)
+    return attack, time.perf_counter() - start
+
+class MovePrecomputer:
+    """Computes the AI's next attack of each game in a background thread once a turn has
+    been answered, so the next /attack only has to look it up. The AI's attack only depends
+    on the seed of the game and its previous attacks (see mp_game_engine.hunt_attack), so a
+    move computed for the right turn is always the one the AI would have chosen. At most
+    limit moves are kept, the least recently computed being dropped first"""
+
+    def __init__(self, workers: int = 1, limit: int = 4096):
+        self.executor = ThreadPoolExecutor(max_workers = workers,
+                                           thread_name_prefix = "ai-precompute")
+        self.limit = limit
+        # Game id to (turn, attack), the turn being the number of the AI's previous attacks
+        self.moves = OrderedDict()
+        self.lock = threading.Lock()
+
+    def schedule(self, game_id: str, turn: int, choose, *arguments) -> None:
+        """Method used to compute the AI's attack for the next turn of a game in the background
+
+        :param game_id: a string value containing the id of the game
+        :param turn: an integer value with the number of the AI's previous attacks
+        :param choose: the function which chooses the attack, such as mp_game_engine.hunt_attack
+        :param arguments: the arguments of choose, which must not be changed by the game
+        """
+        self.executor.submit(self.compute, game_id, turn, choose, arguments)
+
+    def compute(self, game_id: str, turn: int, choose, arguments: tuple) -> None:
+        """Method used to compute and keep the AI's attack for the next turn of a game
+
+        :param game_id: a string value containing the id of the game
+        :param turn: an integer value with the number of the AI's previous attacks
+        :param choose: the function which chooses the attack
+        :param arguments: a tuple with the arguments of choose
+        """
+        try:
+            attack = choose(*arguments)
+        except Exception:
+            logging.exception("The AI's next attack of game %s could not be precomputed", game_id)
+            return
+        with self.lock:
+            self.moves[game_id] = (turn, attack)
+            self.moves.move_to_end(game_id)
+            while len(self.moves) > self.limit:
+                self.moves.popitem(last = False)
+
+    def lookup(self, game_id: str, turn: int) -> tuple:
+        """Method used to retrieve the precomputed AI attack of a game, returns None if it was
+        not computed in time or was computed for another turn
+
+        :param game_id: a string value containing the id of the game
+        :param turn: an integer value with the number of the AI's previous attacks
+        """
+        with self.lock:
+            move = self.moves.get(game_id)
+        if move is None or move[0] != turn:
+            return None
+        return move[1]
+
+    def shutdown(self) -> None:
+        """Method used to stop the background thread once the moves being computed are done"""
+        self.executor.shutdown(wait = True)
+
+class AIService:
+    """Runs a CPU-bound AI strategy in a pool of worker processes, so it does not hold the
+    GIL of the web server while it thinks. The strategy is sent the compact observation
+    of the game (see observe) and has a deadline to answer; when it misses the deadline,
+    fails or every worker is busy, the attack is chosen with generate_attack instead.
+    When a budget is given the strategy is an anytime one (see anytime_attack), sent the
+    budget as well, which should leave time within the deadline to send the move back"""
+
+    def __init__(self, strategy = density_attack, workers: int = 2, deadline: float = 0.05,
+                 budget: float = None):
+        self.strategy = strategy
+        self.workers = workers
+        self.deadline = deadline
+        self.budget = budget
+        # Worker processes are spawned rather than forked from a threaded server
+        self.executor = ProcessPoolExecutor(max_workers = workers,
+                                            mp_context = multiprocessing.get_context("spawn"))
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        """Method used to start the worker processes before the first move needs them"""
+        concurrent.futures.wait([self.executor.submit(int) for _ in range(self.workers)])
+
+    def release(self, _future = None) -> None:
+        """Method called once a worker has finished a move, even one past its deadline"""
+        with self.lock:
+            self.pending -= 1
+
+    def choose(self, observation: tuple, *arguments) -> tuple:
+        """Method used to choose the AI's attack within the deadline
+
+        :param observation: a tuple returned by observe
+        :param arguments: the other arguments of the strategy, such as the key of the
+        position for cached_density_attack
+        """
+        with self.lock:
+            busy = self.pending >= self.workers
+            if not busy:
+                self.pending += 1
+        if busy:
+            metrics.AI_FALLBACK_MOVES.inc("busy")
+            return fallback_attack(observation)
+        try:
+            if self.budget is None:
+                future = self.executor.submit(self.strategy, observation, *arguments)
+            else:
+                future = self.executor.submit(self.strategy, observation, *arguments,
+                                              self.budget)
+        except RuntimeError:
+            self.release()
+            logging.exception("The AI service could not take the move")
+            metrics.AI_FALLBACK_MOVES.inc("error")
+            return fallback_attack(observation)
+        future.add_done_callback(self.release)
+        try:
+            if self.budget is None:
+                x, y = future.result(timeout = self.deadline)
+            else:
+                (x, y), used = future.result(timeout = self.deadline)
+                metrics.AI_BUDGET_USED.observe(used / self.budget)
+        except concurrent.futures.TimeoutError:
+            logging.warning("The AI missed its deadline of %g seconds", self.deadline)
+            metrics.AI_FALLBACK_MOVES.inc("deadline")
+            return fallback_attack(observation)
+        except Exception:
+            logging.exception("The AI service failed to choose a move")
+            metrics.AI_FALLBACK_MOVES.inc("error")
+            return fallback_attack(observation)
+        size, _, cells, _, _ = observation
+        if not (0 <= x < size and 0 <= y < size) or y * size + x in cells:
+            logging.error("The AI chose the cell (%s, %s) which cannot be attacked", x, y)
+            metrics.AI_FALLBACK_MOVES.inc("error")
+            return fallback_attack(observation)
+        return x, y
+
+    def shutdown(self) -> None:
+        """Method used to stop the worker processes"""
+        self.executor.shutdown(wait = True, cancel_futures = True)
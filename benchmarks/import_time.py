@@ -0,0 +1,43 @@
+"""Benchmark which reports how long the game modules take to import, measured with
+python -X importtime in a fresh interpreter, and the files written while importing them.
+
+Run from the root directory of the project: python3 benchmarks/import_time.py"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_time(module: str, directory: str) -> tuple[float, float]:
+    """Function used to import a module in a fresh interpreter, returns the time taken by
+    the module itself and with everything it imports, in milliseconds
+
+    :param module: a string value containing the name of the module
+    :param directory: a string value containing the directory the interpreter is run in
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd = directory, capture_output = True, text = True, check = True,
+                            env = {**os.environ, "PYTHONPATH": ROOT})
+    for line in result.stderr.splitlines():
+        # Lines are in the format: import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[0].split(":")[1]) / 1000, int(fields[1]) / 1000
+    raise ValueError(f"{module} was not imported")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", nargs="+",
+                        default=["components", "game_engine", "mp_game_engine", "main"])
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+    print(f"{'module':<16} {'self ms':>10} {'total ms':>10}  files written")
+    for name in arguments.modules:
+        with tempfile.TemporaryDirectory() as empty_directory:
+            # The best of the runs is the least disturbed by the rest of the machine
+            timings = [import_time(name, empty_directory) for _ in range(arguments.repeat)]
+            written = sorted(os.listdir(empty_directory))
+        own, cumulative = min(timings, key = lambda timing: timing[1])
+        print(f"{name:<16} {own:>10.2f} {cumulative:>10.2f}  {', '.join(written) or 'none'}")
@@ -0,0 +1,202 @@
+"""Load test which plays full games of the web-based game from concurrent simulated
+clients and reports the throughput and the p50/p95/p99 latency of each route. Each
+client gets the placement page, posts its placement and attacks until the game is over.
+
+The clients use the Flask test client in-process by default, --serve starts the app on
+a loopback port and --url targets a server that is already running. The load test exits
+with status 1 when a latency budget such as --budget /attack:p99=50 is exceeded.
+
+Run from the root directory of the project: python3 benchmarks/load_test.py"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PERCENTILES = (50, 95, 99)
+
+class TestClient:
+    """Client which sends its requests to the app in-process through the Flask test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, body: dict = None) -> tuple[int, bytes]:
+        """Method used to send a request, returns the status code and the body of the response
+
+        :param method: a string value containing the HTTP method
+        :param path: a string value containing the path and query string of the request
+        :param body: a dictionary sent as the JSON body of the request
+        """
+        response = self.client.open(path, method = method, json = body)
+        data = response.get_data()
+        # A server closes the response once it is sent, which runs its close callbacks
+        response.close()
+        return response.status_code, data
+
+class HTTPClient:
+    """Client which sends its requests to a server over HTTP, keeping its cookies"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method: str, path: str, body: dict = None) -> tuple[int, bytes]:
+        """Method used to send a request, returns the status code and the body of the response
+
+        :param method: a string value containing the HTTP method
+        :param path: a string value containing the path and query string of the request
+        :param body: a dictionary sent as the JSON body of the request
+        """
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        http_request = urllib.request.Request(self.url + path, data = data, method = method,
+                                              headers = {"Content-Type": "application/json"})
+        try:
+            with self.opener.open(http_request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+def play_games(client, placement: dict, games: int, seed: int, latencies: dict) -> int:
+    """Function used to play full games as one client, records the latency of each request
+    under its route and returns the number of requests that failed
+
+    :param client: a TestClient or HTTPClient
+    :param placement: a dictionary containing the placement of the user's ships
+    :param games: an integer value with the number of games to play
+    :param seed: an integer value used to shuffle the attacks of the client
+    :param latencies: a dictionary of route to the list of latencies in seconds
+    """
+    shuffle = random.Random(seed)
+    cells = [(x, y) for x in range(10) for y in range(10)]
+    failures = 0
+
+    def send(route: str, method: str, path: str, body: dict = None) -> bytes:
+        """Function used to send a request and record its latency, returns the body"""
+        nonlocal failures
+        start = time.perf_counter()
+        status, data = client.request(method, path, body)
+        latencies.setdefault(route, []).append(time.perf_counter() - start)
+        if status != 200:
+            failures += 1
+        return data
+
+    for _ in range(games):
+        send("GET /placement", "GET", "/placement")
+        send("POST /placement", "POST", "/placement", placement)
+        for x, y in shuffle.sample(cells, len(cells)):
+            if b"finished" in send("GET /attack", "GET", f"/attack?x={x}&y={y}"):
+                break
+    return failures
+
+def percentile(values: list[float], rank: int) -> float:
+    """Function used to compute a percentile of sorted values with the nearest-rank method
+
+    :param values: a sorted list of values
+    :param rank: an integer value with the percentile, from 1 to 100
+    """
+    return values[max(-(-len(values) * rank // 100) - 1, 0)]
+
+def parse_budget(budget: str) -> tuple[str, int, float]:
+    """Function used to parse a latency budget such as /attack:p99=50, returns the route,
+    the percentile and the budget in milliseconds
+
+    :param budget: a string value containing the latency budget
+    """
+    target, milliseconds = budget.rsplit("=", 1)
+    route, rank = target.rsplit(":p", 1)
+    if " " not in route:
+        route = f"GET {route}"
+    return route, int(rank), float(milliseconds)
+
+def run(make_client, clients: int, games: int, placement: dict) -> tuple[dict, float, int]:
+    """Function used to play games from concurrent clients, returns the sorted latencies
+    of each route, the elapsed time in seconds and the number of failed requests
+
+    :param make_client: a function with no arguments which returns a new client
+    :param clients: an integer value with the number of concurrent clients
+    :param games: an integer value with the number of games played by each client
+    :param placement: a dictionary containing the placement of the user's ships
+    """
+    recorded = [{} for _ in range(clients)]
+    failures = [0] * clients
+    start = threading.Barrier(clients + 1)
+
+    def client_thread(index: int) -> None:
+        """Function run by the thread of each client"""
+        client = make_client()
+        start.wait()
+        failures[index] = play_games(client, placement, games, index, recorded[index])
+
+    threads = [threading.Thread(target = client_thread, args = (index,))
+               for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+    latencies = {}
+    for client_latencies in recorded:
+        for route, values in client_latencies.items():
+            latencies.setdefault(route, []).extend(values)
+    return {route: sorted(values) for route, values in latencies.items()}, elapsed, sum(failures)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--games", type=int, default=10, help="number of games per client")
+    parser.add_argument("--url", help="URL of a running server to load test over HTTP")
+    parser.add_argument("--serve", action="store_true",
+                        help="start the app on a loopback port and load test it over HTTP")
+    parser.add_argument("--budget", action="append", default=[],
+                        help="latency budget ROUTE:pPERCENTILE=MILLISECONDS, e.g. /attack:p99=50")
+    arguments = parser.parse_args()
+    budgets = [parse_budget(budget) for budget in arguments.budget]
+    with open("placement.json", "r", encoding="utf-8") as placement_file:
+        user_placement = json.load(placement_file)
+    server = None
+    if arguments.url:
+        new_client = lambda: HTTPClient(arguments.url)
+    else:
+        import main
+        if arguments.serve:
+            from werkzeug.serving import make_server
+            server = make_server("127.0.0.1", 0, main.app, threaded = True)
+            threading.Thread(target = server.serve_forever, daemon = True).start()
+            new_client = lambda: HTTPClient(f"http://127.0.0.1:{server.port}")
+        else:
+            new_client = lambda: TestClient(main.app)
+    route_latencies, seconds, failed = run(new_client, arguments.clients, arguments.games,
+                                           user_placement)
+    if server is not None:
+        server.shutdown()
+    played = arguments.clients * arguments.games
+    requests = sum(len(values) for values in route_latencies.values())
+    print(f"{played} games in {seconds:.2f} s: {played / seconds:.1f} games/s, "
+          f"{requests / seconds:.0f} requests/s, {failed} failed requests")
+    print(f"{'route':<20} {'requests':>10}" + "".join(f" {f'p{rank} ms':>10}"
+                                                      for rank in PERCENTILES))
+    for route, values in sorted(route_latencies.items()):
+        print(f"{route:<20} {len(values):>10}" + "".join(
+            f" {percentile(values, rank) * 1000:>10.2f}" for rank in PERCENTILES))
+    exceeded = False
+    for route, rank, budget in budgets:
+        if route not in route_latencies:
+            print(f"No requests were made to {route}")
+            exceeded = True
+            continue
+        latency = percentile(route_latencies[route], rank) * 1000
+        if latency > budget:
+            print(f"Budget exceeded: p{rank} of {route} is {latency:.2f} ms, over {budget:g} ms")
+            exceeded = True
+    sys.exit(1 if exceeded or failed else 0)
@@ -0,0 +1,47 @@
+"""Benchmark which reports how long the main and placement pages take to render for
+boards from 10x10 up to 100x100, and larger boards with --sizes.
+
+Run from the root directory of the project: python3 benchmarks/render_pages.py"""
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import render_template
+import components
+import main
+import mp_game_engine
+import rendering
+
+def time_render(function, repeat: int) -> float:
+    """Function used to time a render function, returns the average time in milliseconds
+
+    :param function: a function with no arguments which renders a page
+    :param repeat: an integer value with the number of times to render the page
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    arguments = parser.parse_args()
+    ships = components.create_battleships()
+    with main.app.test_request_context():
+        for size in arguments.sizes:
+            game = mp_game_engine.start_game(components.place_battleships(
+                components.initialise_board(size), dict(ships), "random"), dict(ships), seed=1)
+            dense = size <= components.SPARSE_BOARD_SIZE
+            main_page = lambda: render_template(
+                "main.html", size=size, cells=mp_game_engine.cell_records(game),
+                attack_grid=rendering.attack_grid(size) if dense else None,
+                player_grid=rendering.player_grid(size) if dense else None)
+            placement_page = lambda: render_template(
+                "placement.html", ships=ships, board_size=size, grid=rendering.placement_grid(size))
+            main_time = time_render(main_page, arguments.repeat)
+            compressed = len(rendering.compress(main_page().encode("utf-8")))
+            print(f"{size}x{size}: main.html {main_time:.2f}ms ({compressed} bytes gzipped), "
+                  f"placement.html {time_render(placement_page, arguments.repeat):.2f}ms")
@@ -0,0 +1,72 @@
+"""Benchmark which shows how the throughput of /attack scales with the number of worker
+processes sharing one SQLite game store.
+
+Run from the root directory of the project: python3 benchmarks/store_scaling.py"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def worker(database: str, games: int, start, results) -> None:
+    """Function run by each worker process, plays full games through the Flask app
+
+    :param database: a string value containing the path of the SQLite database
+    :param games: an integer value with the number of games to play
+    :param start: an event set once every worker is ready
+    :param results: a queue the number of attacks made is put on
+    """
+    os.environ["BATTLESHIPS_STORE"] = database
+    import main
+    with open("placement.json", "r", encoding="utf-8") as file:
+        placement = json.load(file)
+    client = main.app.test_client()
+    start.wait()
+    attacks = 0
+    for _ in range(games):
+        client.post("/placement", json=placement)
+        for y in range(10):
+            for x in range(10):
+                attacks += 1
+                if "finished" in client.get(f"/attack?x={x}&y={y}").get_json():
+                    break
+            else:
+                continue
+            break
+    results.put(attacks)
+
+def run(workers: int, games: int) -> float:
+    """Function used to run the benchmark with a number of workers, returns attacks per second
+
+    :param workers: an integer value with the number of worker processes
+    :param games: an integer value with the number of games played by each worker
+    """
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "games.db")
+        start = context.Event()
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(database, games, start, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        # Give every worker time to import the app before timing
+        time.sleep(2)
+        begin = time.perf_counter()
+        start.set()
+        attacks = sum(results.get() for _ in processes)
+        elapsed = time.perf_counter() - begin
+        for process in processes:
+            process.join()
+    return attacks / elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--games", type=int, default=20)
+    arguments = parser.parse_args()
+    for count in arguments.workers:
+        print(f"{count} worker(s): {run(count, arguments.games):.0f} attacks/s")
@@ -1,18 +1,106 @@
 """Module that contains the functions used to set up the components of the game
 for all versions of it, command-line and web-based."""
+import functools
 import random
 import json
 import re
 import logging
-logging.basicConfig(filename = 'battleships.log', encoding='utf-8',
-                    level=logging.DEBUG, format = '%(asctime)s %(levelname)s: %(message)s'
-                    ,datefmt='%Y-%m-%d %H:%M:%S')
+import profiling
 
-def initialise_board(size: int = 10) -> list[list]:
+def configure_logging(filename: str = "battleships.log", level: int = logging.DEBUG) -> None:
+    """Function used to send the log messages of every module to the log file. It is called
+    by the entry points of the game rather than when the modules are imported, and does
+    nothing if logging was already configured
+
+    :param filename: a string value containing the name of the log file
+    :param level: an integer value with the lowest level of the messages logged
+    """
+    logging.basicConfig(filename = filename, encoding='utf-8',
+                        level=level, format = '%(asctime)s %(levelname)s: %(message)s'
+                        ,datefmt='%Y-%m-%d %H:%M:%S')
+
+# Boards larger than this are sparse unless initialise_board is told otherwise
+SPARSE_BOARD_SIZE = 100
+
+class SparseRow:
+    """View of a row of a SparseBoard, read and written like a row of a nested list board"""
+    __slots__ = ("board", "y")
+
+    def __init__(self, board: "SparseBoard", y: int):
+        self.board = board
+        self.y = y
+
+    def __len__(self) -> int:
+        return self.board.size
+
+    def __getitem__(self, x: int):
+        if not 0 <= x < self.board.size:
+            raise IndexError("board index out of range")
+        return self.board.rows.get(self.y, {}).get(x)
+
+    def __setitem__(self, x: int, value) -> None:
+        if not 0 <= x < self.board.size:
+            raise IndexError("board index out of range")
+        if value is None:
+            row = self.board.rows.get(self.y)
+            if row is not None:
+                row.pop(x, None)
+                if not row:
+                    del self.board.rows[self.y]
+        else:
+            self.board.rows.setdefault(self.y, {})[x] = value
+
+    def __iter__(self):
+        row = self.board.rows.get(self.y, {})
+        return (row.get(x) for x in range(self.board.size))
+
+    def items(self) -> list[tuple]:
+        """Method used to list the (x, ship) pair of each cell of the row holding a ship"""
+        return sorted(self.board.rows.get(self.y, {}).items())
+
+class SparseBoard:
+    """Board which only stores the cells holding a ship, indexed by row, so a very large
+    and mostly empty board takes memory for its fleet rather than for its size. It is used
+    like the nested list of initialise_board: board[y][x] reads and writes a cell through
+    a view of row y, iterating over it gives the views of its rows and len(board) is its size"""
+
+    def __init__(self, size: int):
+        self.size = size
+        # Row index to a dictionary of column index to the ship in that cell
+        self.rows = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, y: int) -> SparseRow:
+        if not 0 <= y < self.size:
+            raise IndexError("board index out of range")
+        return SparseRow(self, y)
+
+    def __iter__(self):
+        return (SparseRow(self, y) for y in range(self.size))
+
+def row_items(row) -> list[tuple]:
+    """Function used to list the (x, ship) pair of each cell of a row holding a ship, in
+    the time taken by its ships for a row of a SparseBoard
+
+    :param row: a row of a board, a list or a SparseRow
+    """
+    if isinstance(row, SparseRow):
+        return row.items()
+    return [(x, cell) for x, cell in enumerate(row) if cell is not None]
+
+def initialise_board(size: int = 10, sparse: bool = None) -> list[list]:
     """Function used to initialise the board
     
     :param size: an integer value representing the size of the board
+    :param sparse: a boolean value, True for a SparseBoard and False for a nested list,
+    by default boards larger than SPARSE_BOARD_SIZE are sparse
     """
+    if sparse is None:
+        sparse = size > SPARSE_BOARD_SIZE
+    if sparse:
+        return SparseBoard(size)
     board = []
     # The loop will continue generating the board until it reaches the value of size
     for _ in range(size):
@@ -47,18 +135,75 @@ def create_battleships(filename: str = "battleships.txt")-> dict[str, int]:
         raise ValueError("The battleships.txt file is empty")
     return battleships
 
-def check_ways_to_place(length: str, board: list[list]) -> [str, str, str]:
+@functools.lru_cache(maxsize = 8)
+def read_fleet(filename: str) -> tuple:
+    """Function used to read a fleet definition file once, returns the (name, size) pair
+    of each ship
+
+    :param filename: a string value containing the name of the txt file of the fleet
+    """
+    return tuple(create_battleships(filename).items())
+
+def load_fleet(filename: str = "battleships.txt") -> dict[str, int]:
+    """Function used to retrieve each battle ship and their size like create_battleships,
+    the file is only read the first time it is loaded and a new dictionary is returned
+    each time so the caller can track the ships being sunk in it
+
+    :param filename: a string value containing the name of the txt file of the fleet
+    """
+    return dict(read_fleet(filename))
+
+# Largest size of the boards, whose coordinates must fit in the journal's 16-bit fields
+MAX_BOARD_SIZE = 10000
+
+class GameConfig:
+    """Configuration of a game, the size of its boards and its fleet. It is made once per
+    game, or once per server, and passed to every part of the game which depends on them
+    instead of each part building a board to find its size or reading the fleet file"""
+
+    def __init__(self, size: int = 10, fleet: dict = None):
+        if fleet is None:
+            fleet = load_fleet()
+        if not 1 <= size <= MAX_BOARD_SIZE:
+            raise ValueError(f"The size of the boards must be from 1 to {MAX_BOARD_SIZE}")
+        if max(fleet.values(), default = 0) > size:
+            raise ValueError("The ships of the fleet must fit on the boards")
+        self.size = size
+        self.fleet = dict(fleet)
+
+    def new_board(self) -> list[list]:
+        """Method used to initialise an empty board of the size of the game"""
+        return initialise_board(self.size)
+
+    def new_ships(self) -> dict[str, int]:
+        """Method used to get a new dictionary of the fleet, to track the ships being sunk in it"""
+        return dict(self.fleet)
+
+    def contains(self, x: int, y: int) -> bool:
+        """Method used to check if a coordinate is on the boards
+
+        :param x: an integer value with the x coordinate
+        :param y: an integer value with the y coordinate
+        """
+        return 0 <= x < self.size and 0 <= y < self.size
+
+@profiling.instrument
+def check_ways_to_place(length: str, board: list[list],
+                        rng: random.Random = None) -> [str, str, str]:
     """Function used check which orientation is possible for each ship to be placed on the board
     for the random placement algorithm.
     
     :param length: a string value containing the length of each ship from the battleships.txt file
     :param board: a nested list of length (default 10 but it depends of 
     size parameter in initialise_board function) representing the layout of a board
+    :param rng: the random.Random instance of the game, the random module is used if not given
     """
+    if rng is None:
+        rng = random
     ways_to_place = []
     #Starting position for generation
-    row_index = random.randint(0,len(board) - 1)
-    column_index = random.randint(0,len(board) - 1)
+    row_index = rng.randint(0,len(board) - 1)
+    column_index = rng.randint(0,len(board) - 1)
     testing_row = row_index
     testing_column = column_index
     #Right Check
@@ -124,7 +269,9 @@ def check_ways_to_place(length: str, board: list[list]) -> [str, str, str]:
         logging.info("Arragements were found for the ships on this iteration")
         return [ways_to_place, row_index, column_index]
 
-def place_battleships(board: list[list], ships: dict, algorithm = 'simple')-> list[list]:
+@profiling.instrument
+def place_battleships(board: list[list], ships: dict, algorithm = 'simple',
+                      placement: dict = None, rng: random.Random = None)-> list[list]:
     """Function used to update the board data structure to position the ships 
     on the board
     
@@ -134,7 +281,13 @@ def place_battleships(board: list[list], ships: dict, algorithm = 'simple')-> li
      and the size of the ship as the respective values
      :param algorithm: a string value with default value of 'simple' that 
      can be extended to include more sophisticated algorithms for placing ships 
+     :param placement: an optional dictionary in the placement.json format used by the
+     'custom' algorithm instead of reading the placement.json file
+     :param rng: the random.Random instance of the game used by the 'random' and 'strategic'
+     algorithms, the random module is used if not given
     """
+    if rng is None:
+        rng = random
     if algorithm.lower() == 'simple':
         row_index = 0
         for battleship, length in ships.items():
@@ -144,12 +297,14 @@ def place_battleships(board: list[list], ships: dict, algorithm = 'simple')-> li
     elif algorithm.lower() == "random":
         for battleship, length in ships.items():
             # orientation will contain the ways in which the ship can be placed
-            orientation = check_ways_to_place(length, board)
+            orientation = check_ways_to_place(length, board, rng)
             #While the return value of orientation is an empty
             #string, it will keep on trying random positions until finding a correct orientation
             while not orientation:
-                orientation = check_ways_to_place(length, board)
-            choice = random.choice(orientation[0])
+                if profiling.ENABLED:
+                    profiling.count("components.place_battleships.retries")
+                orientation = check_ways_to_place(length, board, rng)
+            choice = rng.choice(orientation[0])
             row_index = int(orientation[1])
             column_index = int(orientation[2])
             # Once the orientation is found, it will place the ship
@@ -170,8 +325,11 @@ def place_battleships(board: list[list], ships: dict, algorithm = 'simple')-> li
                     row_index -= 1
     elif algorithm.lower() == 'custom':
         try:
-            with open('placement.json', 'r', encoding = "UTF-8") as file:
-                placement_data = json.load(file)
+            if placement is None:
+                with open('placement.json', 'r', encoding = "UTF-8") as file:
+                    placement_data = json.load(file)
+            else:
+                placement_data = placement
             for battleship, data_about_ships in placement_data.items():
                 start_of_column, start_of_row, orientation = data_about_ships
                 row_index = int(start_of_row)
@@ -261,7 +419,7 @@ def place_battleships(board: list[list], ships: dict, algorithm = 'simple')-> li
         try:
             with open('strategic_placements.json', 'r', encoding = "UTF-8") as file:
                 placement_data = json.load(file)
-                placement = random.choice(placement_data)
+                placement = rng.choice(placement_data)
             for battleship, data_about_ships in placement.items():
                 start_of_column, start_of_row, orientation = data_about_ships
                 row_index = int(start_of_row)
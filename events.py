@@ -0,0 +1,188 @@
+"""Module that contains the notification of new game events to the server-sent events
+streams of the web-based game, and the hub which broadcasts them to spectators"""
+import json
+import logging
+import threading
+from collections import deque
+
+class GameNotifier:
+    """Wakes up the event streams of a game when new events are added to it. Streams
+    served by another worker process are not woken up, they find the new events the
+    next time their wait times out. The condition and version of a game are removed once
+    it is over and no stream is waiting on it"""
+
+    def __init__(self):
+        self.conditions = {}
+        self.versions = {}
+        # Game id to the number of streams waiting on the game
+        self.waiters = {}
+        # Ids of the games which are over but still have streams waiting on them
+        self.finished = set()
+        self.lock = threading.Lock()
+
+    def condition(self, game_id: str) -> threading.Condition:
+        """Method used to get the condition of a game, creating it if needed
+
+        :param game_id: a string value containing the id of the game
+        """
+        with self.lock:
+            if game_id not in self.conditions:
+                self.conditions[game_id] = threading.Condition()
+            return self.conditions[game_id]
+
+    def notify(self, game_id: str, version: int, finished: bool = False) -> None:
+        """Method used to record that a game now has a number of events and wake up its streams
+
+        :param game_id: a string value containing the id of the game
+        :param version: an integer value with the number of events of the game
+        :param finished: a boolean value, True if the game is over
+        """
+        condition = self.condition(game_id)
+        with condition:
+            self.versions[game_id] = version
+            condition.notify_all()
+        if finished:
+            with self.lock:
+                self.finished.add(game_id)
+            self.release(game_id)
+
+    def wait(self, game_id: str, version: int, timeout: float) -> bool:
+        """Method used to wait until a game has more than a number of events, returns
+        False if the timeout passed first
+
+        :param game_id: a string value containing the id of the game
+        :param version: an integer value with the number of events already sent
+        :param timeout: a float value with the number of seconds to wait for
+        """
+        with self.lock:
+            self.waiters[game_id] = self.waiters.get(game_id, 0) + 1
+        try:
+            condition = self.condition(game_id)
+            with condition:
+                return condition.wait_for(lambda: self.versions.get(game_id, 0) > version, timeout)
+        finally:
+            with self.lock:
+                self.waiters[game_id] -= 1
+                if not self.waiters[game_id]:
+                    del self.waiters[game_id]
+            self.release(game_id)
+
+    def release(self, game_id: str) -> None:
+        """Method used to remove the condition and version of a game once it is over and
+        no stream is waiting on it
+
+        :param game_id: a string value containing the id of the game
+        """
+        with self.lock:
+            if game_id in self.finished and game_id not in self.waiters:
+                self.finished.discard(game_id)
+                self.conditions.pop(game_id, None)
+                self.versions.pop(game_id, None)
+
+def format_event(event_id: int, event: dict) -> str:
+    """Function used to format a move event as a server-sent event
+
+    :param event_id: an integer value with the id of the event, its index in the game's events
+    :param event: a dictionary containing the move event (see mp_game_engine.apply_move)
+    """
+    return (f"id: {event_id}\nevent: move\n"
+            f"data: {json.dumps(event, separators=(',', ':'))}\n\n")
+
+class Subscriber:
+    """A spectator of a game, with a bounded queue of the (event id, encoded event) pairs
+    it has not received yet"""
+
+    def __init__(self, limit: int, condition: threading.Condition):
+        self.queue = deque()
+        self.limit = limit
+        self.condition = condition
+        self.dropped = False
+
+class BroadcastHub:
+    """Fans the move events of each game out to its spectators. Every event is encoded
+    once and the same bytes are put on the queue of every subscriber. A subscriber whose
+    queue would grow past its limit is dropped, so the memory used stays bounded however
+    slow the spectators are"""
+
+    def __init__(self, limit: int = 64):
+        self.limit = limit
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, game_id: str) -> Subscriber:
+        """Method used to add a spectator to a game
+
+        :param game_id: a string value containing the id of the game
+        """
+        with self.lock:
+            if game_id not in self.channels:
+                self.channels[game_id] = {"condition": threading.Condition(),
+                                          "subscribers": set(), "next_id": 0}
+            channel = self.channels[game_id]
+            subscriber = Subscriber(self.limit, channel["condition"])
+            with channel["condition"]:
+                channel["subscribers"].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, game_id: str, subscriber: Subscriber) -> None:
+        """Method used to remove a spectator from a game, the channel is removed with
+        its last spectator
+
+        :param game_id: a string value containing the id of the game
+        :param subscriber: the Subscriber returned by subscribe
+        """
+        with self.lock:
+            channel = self.channels.get(game_id)
+            if channel is None:
+                return
+            with channel["condition"]:
+                channel["subscribers"].discard(subscriber)
+                if not channel["subscribers"]:
+                    del self.channels[game_id]
+
+    def publish(self, game_id: str, first_id: int, new_events: list[dict]) -> None:
+        """Method used to broadcast new events of a game to its spectators, events which
+        were already published by this process are skipped
+
+        :param game_id: a string value containing the id of the game
+        :param first_id: an integer value with the id of the first of the new events
+        :param new_events: a list of move events (see mp_game_engine.apply_move)
+        """
+        with self.lock:
+            channel = self.channels.get(game_id)
+        if channel is None:
+            return
+        condition = channel["condition"]
+        with condition:
+            start = max(channel["next_id"] - first_id, 0)
+            chunks = [(event_id, format_event(event_id, event).encode("utf-8"))
+                      for event_id, event in enumerate(new_events[start:], first_id + start)]
+            if not chunks:
+                return
+            channel["next_id"] = chunks[-1][0] + 1
+            for subscriber in list(channel["subscribers"]):
+                if len(subscriber.queue) + len(chunks) > subscriber.limit:
+                    subscriber.dropped = True
+                    subscriber.queue.clear()
+                    channel["subscribers"].discard(subscriber)
+                    logging.warning("A spectator of game %s fell too far behind and was dropped",
+                                    game_id)
+                else:
+                    subscriber.queue.extend(chunks)
+            condition.notify_all()
+
+    @staticmethod
+    def receive(subscriber: Subscriber, timeout: float) -> list[tuple]:
+        """Method used to wait for the events queued for a spectator, returns them (an empty
+        list if the timeout passed first) or None if the spectator was dropped
+
+        :param subscriber: the Subscriber returned by subscribe
+        :param timeout: a float value with the number of seconds to wait for
+        """
+        with subscriber.condition:
+            subscriber.condition.wait_for(lambda: subscriber.queue or subscriber.dropped, timeout)
+            if subscriber.dropped:
+                return None
+            chunks = list(subscriber.queue)
+            subscriber.queue.clear()
+            return chunks
@@ -1,13 +1,18 @@
 """Module that contains the functions that wil manage the 
 game mechanics of the single player game"""
+import argparse
+import io
+import json
 import re
 import logging
+import sys
 import components
-logging.basicConfig(filename = 'Battleships.log', encoding='utf-8',
-                    level=logging.DEBUG, format = '%(asctime)s %(levelname)s: %(message)s'
-                    ,datefmt='%Y-%m-%d %H:%M:%S')
+import profiling
+import transposition
 
-def attack(coordinates: tuple, board: list[list], battleships: dict) -> bool:
+@profiling.instrument
+def attack(coordinates: tuple, board: list[list], battleships: dict,
+           hash_state: dict = None) -> bool:
     """Function used to check if there is a battleship at a certain coordinate 
     on the board for the corresponding attack
     
@@ -16,6 +21,8 @@ def attack(coordinates: tuple, board: list[list], battleships: dict) -> bool:
     size parameter in initialise_board function) representing the layout of a board
     :param battleships: a dictionary value containing the name of each ship as the key 
      and the size of the ship as the respective values
+    :param hash_state: a dictionary containing the Zobrist hashes of what the attacker has
+    seen of the board, updated with the attack (see transposition.new_hash_state)
     """
     coordinate_x = int(coordinates[0])
     coordinate_y = int(coordinates[1])
@@ -29,50 +36,152 @@ def attack(coordinates: tuple, board: list[list], battleships: dict) -> bool:
         hit_or_miss = True
     else:
         hit_or_miss = False
+    if hash_state is not None:
+        transposition.record_attack(hash_state, (coordinate_x, coordinate_y), hit_or_miss)
     return hit_or_miss
 
-def cli_coordinates_input() -> tuple:
-    """Function used to retrieve where the user wants to place his attack""" 
-    response = input("Enter coordinates for your attack, seperate " +
-                     "each coordinate by a comma (eg 1,1)")
+# Coordinates of an attack, x and y separated by a comma, of any number of digits
+COORDINATES = re.compile(r"^([0-9]+),([0-9]+)$")
+
+def cli_coordinates_input(read_input = input, output = print,
+                          config: components.GameConfig = None) -> tuple:
+    """Function used to retrieve where the user wants to place his attack
+
+    :param read_input: the function used to read the user's response, input by default
+    :param output: the function used to show messages to the user, print by default
+    :param config: the configuration of the game, whose board size the attack must be
+    within, the default configuration if not given
+    """
+    size = 10 if config is None else config.size
+    response = read_input("Enter coordinates for your attack, seperate " +
+                          "each coordinate by a comma (eg 1,1)")
     #Data Validation to make sure that the user enters their guess in the correct format
-    pattern = (
-    f'^[0-{len(components.initialise_board()) - 1}]{{1}},'
-    f'[0-{len(components.initialise_board()) - 1}]{{1}}$')
-    while not re.match(pattern, response):
-        print("Invalid response. Please enter your coordinate in the format x co-or, y co-or")
+    match = COORDINATES.match(response)
+    while match is None or not (int(match[1]) < size and int(match[2]) < size):
+        output("Invalid response. Please enter your coordinate in the format x co-or, y co-or")
         logging.error("The co-ordinates were not processed as it was not in the correct format.")
-        response = input("Enter coordinates for your attack, seperate each" +
-    " coordinate by a comma (eg 1,1)")      
-    x, y = response.split(',')
-    return (int(x),int(y))
+        response = read_input("Enter coordinates for your attack, seperate each" +
+    " coordinate by a comma (eg 1,1)")
+        match = COORDINATES.match(response)
+    return (int(match[1]),int(match[2]))
+
+def simple_game_loop(read_input = input, output = print,
+                     config: components.GameConfig = None) -> dict:
+    """Function used for intermediate manual testing through the command-line interface,
+    returns the result of the game. The game ends as incomplete if the input runs out
 
-def simple_game_loop() -> None:
-    """Function used for intermediate manual testing through the command-line interface"""
-    print("Welcome to Battleships!")
-    print("Let's get started!")
+    :param read_input: the function used to read the user's attacks, input by default
+    :param output: the function used to show messages to the user, print by default
+    :param config: the configuration of the game, the default configuration if not given
+    """
+    if config is None:
+        config = components.GameConfig()
+    output("Welcome to Battleships!")
+    output("Let's get started!")
     previous_attacks = []
-    ships = components.create_battleships()
+    ships = config.new_ships()
     logging.info("The AI's ships for the simple game loop were created")
-    board = components.place_battleships(components.initialise_board(), ships, 'simple')
+    board = components.place_battleships(config.new_board(), ships, 'simple')
     logging.info("The AI's board has been rendered in the simple game loop")
-    # A check to determine if all the ships were sunk
-    while all(value == 0 for value in ships.values()) is False:
-        player_input = cli_coordinates_input()
-        # Check to see if the attack has already been guessed
-        while player_input in previous_attacks:
-            logging.warning("The user guessed the same location more than once")
-            print("You have already guessed at that co-ordinate, choose another one!")
-            player_input = cli_coordinates_input()
-        previous_attacks.append(player_input)
-        if attack(player_input, board, ships) is True:
-            print("Hit!")
-            logging.info("A ship was hit on the AI board for this attack in simple game loop")
-        else:
-            print("Miss!")
-            logging.info("No ship was hit the AI board for this attack in simple game loop")
-    print("Game Over! All ships have been sunken")
+    result = {"game": "simple", "result": "incomplete", "moves": 0, "hits": 0, "repeated": 0}
+    try:
+        # A check to determine if all the ships were sunk
+        while all(value == 0 for value in ships.values()) is False:
+            player_input = cli_coordinates_input(read_input, output, config)
+            # Check to see if the attack has already been guessed
+            while player_input in previous_attacks:
+                logging.warning("The user guessed the same location more than once")
+                output("You have already guessed at that co-ordinate, choose another one!")
+                result["repeated"] += 1
+                player_input = cli_coordinates_input(read_input, output, config)
+            previous_attacks.append(player_input)
+            result["moves"] += 1
+            if attack(player_input, board, ships) is True:
+                output("Hit!")
+                result["hits"] += 1
+                logging.info("A ship was hit on the AI board for this attack in simple game loop")
+            else:
+                output("Miss!")
+                logging.info("No ship was hit the AI board for this attack in simple game loop")
+    except EOFError:
+        logging.warning("The input ended before the game was over in the simple game loop")
+        return result
+    output("Game Over! All ships have been sunken")
     logging.info("The game ended in the simple game loop and the user guessed all the ships.")
+    result["result"] = "won"
+    return result
+
+def script_reader(lines: list[str]):
+    """Function used to make a replacement for input which reads the moves of a script,
+    one per line. Blank lines and comments starting with # are skipped, and EOFError is
+    raised once the script runs out, as input does at the end of its input
+
+    :param lines: a list of the lines of the script
+    """
+    moves = iter(lines)
+
+    def read_input(_prompt: str = "") -> str:
+        """Function used to read the next move of the script"""
+        for line in moves:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                return line
+        raise EOFError("The script has no more moves")
+    return read_input
+
+def run_scripts(play_game, paths: list[str], transcripts: bool = False, out = None) -> list[dict]:
+    """Function used to play a game for each move script without pausing, and write one
+    JSON result line per game. The messages of each game are kept in a buffer rather
+    than printed, and are only added to its result when transcripts is True
+
+    :param play_game: a function which plays a game from its read_input and output
+    functions and returns its result
+    :param paths: a list of the paths of the scripts, - reads a script from standard input
+    :param transcripts: a boolean value, True to add the messages of each game to its result
+    :param out: the file the result lines are written to, standard output if not given
+    """
+    out = out or sys.stdout
+    results = []
+    for path in paths:
+        if path == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(path, "r", encoding="utf-8") as script:
+                lines = script.read().splitlines()
+        transcript = io.StringIO()
+        result = play_game(script_reader(lines), lambda *values: print(*values, file=transcript))
+        result["script"] = path
+        if transcripts:
+            result["transcript"] = transcript.getvalue()
+        results.append(result)
+        out.write(json.dumps(result) + "\n")
+    out.flush()
+    return results
 
 if __name__ == "__main__":
-    simple_game_loop()
+    parser = argparse.ArgumentParser(description="Play the single player game of Battleships")
+    parser.add_argument("--games", type=int, default=1, help="number of games to play in a row")
+    parser.add_argument("--capture", metavar="DIRECTORY",
+                        help="profile the games with cProfile and tracemalloc and write the "
+                        ".pstats file and allocation report to this directory")
+    parser.add_argument("--script", nargs="+", metavar="FILE",
+                        help="play a game from each move script (- for standard input) without "
+                        "prompts and write a JSON result line per game")
+    parser.add_argument("--transcripts", action="store_true",
+                        help="add the messages of each scripted game to its result line")
+    parser.add_argument("--size", type=int, default=10, help="size of the boards")
+    parser.add_argument("--fleet", default="battleships.txt", help="fleet definition file")
+    arguments = parser.parse_args()
+    # Scripted games only log warnings and errors, logging every move would slow them down
+    components.configure_logging(level=logging.WARNING if arguments.script else logging.DEBUG)
+    game_config = components.GameConfig(arguments.size, components.load_fleet(arguments.fleet))
+    if arguments.script:
+        run_scripts(lambda read_input, output: simple_game_loop(read_input, output, game_config),
+                    arguments.script, arguments.transcripts)
+    elif arguments.capture:
+        for path in profiling.profile_games(lambda: simple_game_loop(config=game_config),
+                                            arguments.games, arguments.capture, "simple_game"):
+            print(f"Written {path}")
+    else:
+        for _ in range(arguments.games):
+            simple_game_loop(config=game_config)
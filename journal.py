@@ -0,0 +1,271 @@
+"""Module that contains the crash-safe journal of the web games, each game is recorded
+as a snapshot of its initial placement followed by an append-only journal of its moves,
+which is replayed to rebuild every game in progress when the server restarts"""
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+import mp_game_engine
+import storage
+
+# Snapshot header: game number, game id, seed, length of the fleet json, size of the board,
+# length of the name of the algorithm used to place the AI's ships, lengths of the blobs of
+# the user's and the AI's boards
+SNAPSHOT = struct.Struct("<I32sQHHBII")
+# Move record: game number, attacker, x, y, result (1 for a hit)
+MOVE = struct.Struct("<IBHHB")
+# Attacker value of the move record written once a game is over
+GAME_OVER = 255
+
+def write_snapshot(file, number: int, game_id: str, game: dict) -> None:
+    """Function used to append the snapshot of a new game to the snapshots file
+
+    :param file: a binary file opened for appending
+    :param number: an integer value identifying the game in the moves file
+    :param game_id: a string value containing the id of the game
+    :param game: a dictionary containing the state of the game, with no moves played
+    """
+    fleet = json.dumps(game["user_ships"]).encode("utf-8")
+    algorithm = game["algorithm"].encode("utf-8")
+    user_blob = storage.encode_board(game["user_board"], game["user_ships"])
+    ai_blob = storage.encode_board(game["ai_board"], game["user_ships"])
+    file.write(SNAPSHOT.pack(number, game_id.encode("ascii"), game["seed"], len(fleet),
+                             len(game["user_board"]), len(algorithm), len(user_blob), len(ai_blob))
+               + fleet + algorithm + user_blob + ai_blob)
+
+def read_snapshots(path: str) -> tuple[dict, int]:
+    """Function used to read every snapshot of the snapshots file, returns a dictionary of
+    game number to (game id, fleet, seed, algorithm, user blob, ai blob) and the length of the file that
+    holds complete records. An incomplete record at the end of the file, left by a crash
+    while it was written, is ignored
+
+    :param path: a string value containing the path of the snapshots file
+    """
+    snapshots = {}
+    if not os.path.exists(path):
+        return snapshots, 0
+    with open(path, "rb") as file:
+        data = file.read()
+    offset = 0
+    while offset + SNAPSHOT.size <= len(data):
+        (number, game_id, seed, fleet_length, _, algorithm_length, user_length,
+         ai_length) = SNAPSHOT.unpack_from(data, offset)
+        end = offset + SNAPSHOT.size + fleet_length + algorithm_length + user_length + ai_length
+        if end > len(data):
+            logging.warning("An incomplete snapshot was found at the end of the journal")
+            break
+        fleet_end = offset + SNAPSHOT.size + fleet_length
+        algorithm_end = fleet_end + algorithm_length
+        board_end = algorithm_end + user_length
+        snapshots[number] = (game_id.decode("ascii"),
+                             json.loads(data[offset + SNAPSHOT.size:fleet_end]), seed,
+                             data[fleet_end:algorithm_end].decode("utf-8"),
+                             data[algorithm_end:board_end], data[board_end:end])
+        offset = end
+    return snapshots, offset
+
+def read_moves(path: str) -> bytes:
+    """Function used to read the move records of the moves file, an incomplete record
+    at the end of the file, left by a crash while it was written, is ignored
+
+    :param path: a string value containing the path of the moves file
+    """
+    if not os.path.exists(path):
+        return b""
+    with open(path, "rb") as file:
+        data = file.read()
+    return data[:len(data) - len(data) % MOVE.size]
+
+def replay_journal(snapshots: dict, moves: bytes) -> dict:
+    """Function used to rebuild every game that has not finished by running its moves
+    through game_engine.attack, returns a dictionary of game id to (game number, game state)
+
+    :param snapshots: a dictionary returned by read_snapshots
+    :param moves: the move records returned by read_moves
+    """
+    games = {number: storage.game_from_snapshot(fleet, user_blob, ai_blob, seed, algorithm)
+             for number, (_, fleet, seed, algorithm, user_blob, ai_blob) in snapshots.items()}
+    finished = set()
+    attackers = storage.ATTACKERS
+    apply_move = mp_game_engine.apply_move
+    for number, attacker, x, y, _ in MOVE.iter_unpack(moves):
+        if attacker == GAME_OVER:
+            finished.add(number)
+            continue
+        game = games.get(number)
+        if game is not None:
+            apply_move(game, attackers[attacker], (x, y))
+    logging.info("%d moves were replayed from the journal", len(moves) // MOVE.size)
+    return {snapshots[number][0]: (number, game) for number, game in games.items()
+            if number not in finished}
+
+def load_journal(directory: str) -> dict:
+    """Function used to rebuild every game that has not finished from a journal directory,
+    returns a dictionary of game id to (game number, game state)
+
+    :param directory: a string value containing the path of the journal directory
+    """
+    snapshots, _ = read_snapshots(os.path.join(directory, "games.bin"))
+    return replay_journal(snapshots, read_moves(os.path.join(directory, "moves.bin")))
+
+def read_game(directory: str, game_id: str) -> tuple:
+    """Function used to read a game as it was recorded in a journal directory, returns its
+    fleet, seed, the algorithm used to place the AI's ships, the blobs of its initial boards
+    and its moves in the same format as
+    storage.SQLiteGameStore.snapshot. Raises a KeyError if the game is not in the journal
+
+    :param directory: a string value containing the path of the journal directory
+    :param game_id: a string value containing the id of the game
+    """
+    snapshots, _ = read_snapshots(os.path.join(directory, "games.bin"))
+    for number, (snapshot_id, fleet, seed, algorithm, user_blob, ai_blob) in snapshots.items():
+        if snapshot_id == game_id:
+            records = MOVE.iter_unpack(read_moves(os.path.join(directory, "moves.bin")))
+            moves = [(storage.ATTACKERS[attacker], x, y, bool(hit))
+                     for game_number, attacker, x, y, hit in records
+                     if game_number == number and attacker != GAME_OVER]
+            return fleet, seed, algorithm, user_blob, ai_blob, moves
+    raise KeyError(game_id)
+
+class MoveJournal:
+    """Writer of a journal directory. Every record is written to the operating system
+    as soon as it is appended, so it survives the server process crashing, and the
+    moves file is fsynced in batches to survive a power loss without paying for an
+    fsync on every move. A batch is fsynced once it has batch_size moves, or by a timer
+    batch_interval seconds after its first move, so no move waits longer than that for
+    its fsync even when no other move follows it"""
+
+    def __init__(self, directory: str, snapshots_length: int = None,
+                 batch_size: int = 64, batch_interval: float = 0.05):
+        os.makedirs(directory, exist_ok=True)
+        self.snapshots = open(os.path.join(directory, "games.bin"), "ab")
+        self.moves = open(os.path.join(directory, "moves.bin"), "ab")
+        # Drop the incomplete records left at the end of the files by a crash
+        if snapshots_length is not None:
+            self.snapshots.truncate(snapshots_length)
+        self.moves.truncate(self.moves.tell() - self.moves.tell() % MOVE.size)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add_game(self, number: int, game_id: str, game: dict) -> None:
+        """Method used to record the snapshot of a new game, which is fsynced straight away
+
+        :param number: an integer value identifying the game in the moves file
+        :param game_id: a string value containing the id of the game
+        :param game: a dictionary containing the state of the game, with no moves played
+        """
+        with self.lock:
+            write_snapshot(self.snapshots, number, game_id, game)
+            self.snapshots.flush()
+            os.fsync(self.snapshots.fileno())
+
+    def add_moves(self, number: int, moves: list[tuple], finished: bool = False) -> None:
+        """Method used to append moves to the journal
+
+        :param number: an integer value identifying the game
+        :param moves: a list of (attacker, x, y, hit) tuples
+        :param finished: a boolean value, True if the game is over after these moves
+        """
+        records = b"".join(MOVE.pack(number, storage.ATTACKERS.index(attacker), x, y, int(hit))
+                           for attacker, x, y, hit in moves)
+        if finished:
+            records += MOVE.pack(number, GAME_OVER, 0, 0, 0)
+        with self.lock:
+            self.moves.write(records)
+            self.moves.flush()
+            self.pending += len(moves)
+            if (self.pending >= self.batch_size
+                    or time.monotonic() - self.last_sync >= self.batch_interval):
+                self.sync()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.batch_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def sync(self) -> None:
+        """Method used to fsync the moves that have been appended since the last sync,
+        the lock of the journal must be held"""
+        os.fsync(self.moves.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def flush(self) -> None:
+        """Method used by the timer to fsync the moves of a batch that was not filled"""
+        with self.lock:
+            if self.pending and not self.moves.closed:
+                self.sync()
+            self.timer = None
+
+    def close(self) -> None:
+        """Method used to sync and close the journal files, closing them again does nothing"""
+        with self.lock:
+            if self.moves.closed:
+                return
+            self.moves.flush()
+            self.sync()
+            self.moves.close()
+            self.snapshots.close()
+
+class JournalGameStore(storage.MemoryGameStore):
+    """Game store which keeps the games in memory and records them in a journal
+    directory, so the games in progress are rebuilt when the server restarts"""
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.numbers = {}
+        snapshots, snapshots_length = read_snapshots(os.path.join(directory, "games.bin"))
+        moves = read_moves(os.path.join(directory, "moves.bin"))
+        for game_id, (number, game) in replay_journal(snapshots, moves).items():
+            self.games[game_id] = game
+            self.locks[game_id] = threading.Lock()
+            self.numbers[game_id] = number
+        # Game numbers of finished games are never reused
+        self.next_number = max(snapshots, default=-1) + 1
+        self.journal = MoveJournal(directory, snapshots_length)
+        logging.info("%d games were rebuilt from the journal", len(self.games))
+
+    def create_game(self, game: dict) -> str:
+        """Method used to store a new game and record its snapshot, returns the id of the game
+
+        :param game: a dictionary containing the state of the game, with no moves played
+        """
+        game_id = super().create_game(game)
+        with self.lock:
+            number = self.next_number
+            self.next_number += 1
+            self.numbers[game_id] = number
+        self.journal.add_game(number, game_id, game)
+        return game_id
+
+    def close(self) -> None:
+        """Method used to fsync the last moves and close the journal, when the server shuts down"""
+        self.journal.close()
+
+    @contextmanager
+    def game(self, game_id: str, stored = None):
+        """Context manager which gives exclusive access to the state of a game and
+        journals the moves played on it once the block exits
+
+        :param game_id: a string value containing the id of the game
+        :param stored: a function called with the game and its number of moves before the
+        block once moves are journaled, before another turn can be played on the game
+        """
+        with super().game(game_id) as game:
+            played = len(game["moves"])
+            yield game
+            if len(game["moves"]) > played:
+                finished = (all(value == 0 for value in game["user_ships"].values())
+                            or all(value == 0 for value in game["ai_ships"].values()))
+                self.journal.add_moves(self.numbers[game_id], game["moves"][played:], finished)
+                if stored is not None:
+                    stored(game, played)
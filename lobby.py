@@ -0,0 +1,230 @@
+"""Module that contains the matchmaking lobby of the human-vs-human games of the web-based
+game. Players waiting for an opponent are paired with the player who has waited longest
+for the same size of boards and fleet, and the attacks of their matches are played with
+game_engine.attack. The lobby and its matches are kept in the memory of the worker process
+serving them, and both the waiting players and the matches are bounded in number"""
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+import components
+import game_engine
+
+# The seats of a match, the first player to have joined the lobby attacks first
+SEATS = ("Player_1", "Player_2")
+
+def lobby_key(config: components.GameConfig) -> tuple:
+    """Function used to get the key of the players who can be paired with each other,
+    players only play against players with the same size of boards and fleet
+
+    :param config: the configuration of the player's game
+    """
+    return config.size, tuple(sorted(config.fleet.items()))
+
+class Lobby:
+    """Players waiting for an opponent and the matches being played. Each size of boards
+    and fleet has its own queue of waiting players, oldest first, so joining, pairing and
+    leaving take constant time however many players are waiting. Players who waited longer
+    than the timeout are dropped, and the least recently played matches are dropped once
+    there are too many of them"""
+
+    def __init__(self, limit: int = 10000, match_limit: int = 10000, timeout: float = 300):
+        self.limit = limit
+        self.match_limit = match_limit
+        self.timeout = timeout
+        # Lobby key to an ordered dictionary of player id to waiting player, oldest first
+        self.queues = {}
+        # Player id to the lobby key of each waiting player
+        self.waiting = {}
+        # Match id to match, least recently played first
+        self.matches = OrderedDict()
+        # Player id to the match id of each player in a match
+        self.players = {}
+        self.lock = threading.Lock()
+
+    def join(self, config: components.GameConfig, placement: dict) -> dict:
+        """Method used to add a player to the lobby with their ships placed, returns their
+        player id, with the id of their match and their seat if an opponent was waiting.
+        Raises a ValueError if a ship of the fleet is not placed on the board
+
+        :param config: the configuration of the player's game
+        :param placement: a dictionary in the placement.json format containing the
+        placement of the player's ships
+        """
+        if not isinstance(placement, dict) or set(placement) != set(config.fleet):
+            raise ValueError("Every ship of the fleet must be placed")
+        if not all(isinstance(ship, list) and len(ship) == 3 and ship[2] in ("h", "v")
+                   for ship in placement.values()):
+            raise ValueError("Every ship must be placed as [x, y, orientation], the orientation "
+                             "being h or v")
+        ships = config.new_ships()
+        board = components.place_battleships(config.new_board(), ships, "custom", placement)
+        # A ship which was not placed could never be sunk, so the match would never end
+        if (sum(len(components.row_items(row)) for row in board)
+                != sum(config.fleet.values())):
+            raise ValueError("Every cell of every ship must be on the board")
+        player = {"id": secrets.token_urlsafe(16), "config": config, "board": board,
+                  "ships": ships, "joined": time.monotonic(), "matched": threading.Event()}
+        key = lobby_key(config)
+        with self.lock:
+            self.expire(key, player["joined"])
+            queue = self.queues.get(key)
+            if queue:
+                _, opponent = queue.popitem(last = False)
+                del self.waiting[opponent["id"]]
+                if not queue:
+                    del self.queues[key]
+                match = self.start_match(opponent, player)
+                return {"player": player["id"], "match_id": match["id"], "seat": SEATS[1]}
+            if len(self.waiting) >= self.limit:
+                for other_key in list(self.queues):
+                    self.expire(other_key, player["joined"])
+                if len(self.waiting) >= self.limit:
+                    logging.warning("A player could not join the lobby as it is full")
+                    raise RuntimeError("The lobby is full")
+            self.queues.setdefault(key, OrderedDict())[player["id"]] = player
+            self.waiting[player["id"]] = key
+        logging.info("A player joined the lobby for %dx%d boards", config.size, config.size)
+        return {"player": player["id"], "match_id": None, "seat": None}
+
+    def expire(self, key: tuple, now: float) -> None:
+        """Method used to drop the players of a queue who have waited longer than the
+        timeout, the lock of the lobby must be held
+
+        :param key: a tuple returned by lobby_key
+        :param now: a float value with the time.monotonic time of now
+        """
+        queue = self.queues.get(key)
+        while queue:
+            player = next(iter(queue.values()))
+            if now - player["joined"] <= self.timeout:
+                return
+            queue.popitem(last = False)
+            del self.waiting[player["id"]]
+            player["matched"].set()
+            logging.info("A player left the lobby after waiting too long for an opponent")
+        self.queues.pop(key, None)
+
+    def start_match(self, first: dict, second: dict) -> dict:
+        """Method used to start a match between two players, the lock of the lobby must be
+        held. The least recently played matches are dropped past the limit
+
+        :param first: the waiting player dictionary of the player who joined first
+        :param second: the waiting player dictionary of the player who joined second
+        """
+        match = {"id": secrets.token_urlsafe(16), "seats": {}, "boards": {}, "ships": {},
+                 "turns": {}, "next": SEATS[0], "events": [], "winner": None,
+                 "size": first["config"].size}
+        for seat, player in zip(SEATS, (first, second)):
+            match["seats"][player["id"]] = seat
+            match["boards"][seat] = player["board"]
+            match["ships"][seat] = player["ships"]
+            # The attacks of the seat to the index of their move event
+            match["turns"][seat] = {}
+            self.players[player["id"]] = match["id"]
+        self.matches[match["id"]] = match
+        while len(self.matches) > self.match_limit:
+            _, dropped = self.matches.popitem(last = False)
+            for player_id in dropped["seats"]:
+                del self.players[player_id]
+            logging.warning("The least recently played match was dropped, there were too many")
+        first["matched"].set()
+        logging.info("Two players were paired in the lobby")
+        return match
+
+    def leave(self, player_id: str) -> bool:
+        """Method used to remove a waiting player from the lobby, returns False if they
+        were not waiting
+
+        :param player_id: a string value containing the id returned by join
+        """
+        with self.lock:
+            key = self.waiting.pop(player_id, None)
+            if key is None:
+                return False
+            player = self.queues[key].pop(player_id)
+            if not self.queues[key]:
+                del self.queues[key]
+        player["matched"].set()
+        return True
+
+    def waiter(self, player_id: str) -> threading.Event:
+        """Method used to get the event set once a waiting player is paired or leaves the
+        lobby, returns None if they are not waiting
+
+        :param player_id: a string value containing the id returned by join
+        """
+        with self.lock:
+            key = self.waiting.get(player_id)
+            return None if key is None else self.queues[key][player_id]["matched"]
+
+    def seat(self, player_id: str) -> tuple:
+        """Method used to find the match of a player, returns the id of the match and the
+        seat of the player or None if they are not in a match
+
+        :param player_id: a string value containing the id returned by join
+        """
+        with self.lock:
+            match_id = self.players.get(player_id)
+            if match_id is None:
+                return None
+            return match_id, self.matches[match_id]["seats"][player_id]
+
+    def events(self, match_id: str, first_id: int = 0) -> list[dict]:
+        """Method used to get the move events of a match, raises a KeyError if the match
+        does not exist
+
+        :param match_id: a string value containing the id of the match
+        :param first_id: an integer value with the id of the first event returned
+        """
+        with self.lock:
+            return self.matches[match_id]["events"][first_id:]
+
+    def finished(self, match_id: str) -> bool:
+        """Method used to check if a match is over, raises a KeyError if the match does not exist
+
+        :param match_id: a string value containing the id of the match
+        """
+        with self.lock:
+            return self.matches[match_id]["winner"] is not None
+
+    def attack(self, player_id: str, coordinates: tuple) -> tuple:
+        """Method used to play a player's attack on their opponent's board, returns the id
+        of the match, the id of the move event and the move event. An attack on a cell the
+        player has already attacked returns its first move event without changing the match.
+        Raises a KeyError if the player is not in a match, an IndexError if the attack is
+        not on the boards and a ValueError if it is not their turn or the match is over
+
+        :param player_id: a string value containing the id returned by join
+        :param coordinates: a tuple value representing the x and y coordinate of the attack
+        """
+        coordinates = (int(coordinates[0]), int(coordinates[1]))
+        with self.lock:
+            match_id = self.players[player_id]
+            match = self.matches[match_id]
+            seat = match["seats"][player_id]
+            if not (0 <= coordinates[0] < match["size"] and 0 <= coordinates[1] < match["size"]):
+                raise IndexError("The attack must be on the boards")
+            turns = match["turns"][seat]
+            if coordinates in turns:
+                return match_id, turns[coordinates], match["events"][turns[coordinates]]
+            if match["winner"] is not None:
+                raise ValueError("The match is over")
+            if match["next"] != seat:
+                raise ValueError("It is not your turn")
+            opponent = SEATS[1 - SEATS.index(seat)]
+            board, ships = match["boards"][opponent], match["ships"][opponent]
+            type_of_ship_hit = board[coordinates[1]][coordinates[0]]
+            hit = game_engine.attack(coordinates, board, ships)
+            sunk = type_of_ship_hit if hit and ships[type_of_ship_hit] == 0 else None
+            game_over = sunk is not None and all(value == 0 for value in ships.values())
+            if game_over:
+                match["winner"] = seat
+            match["next"] = opponent
+            turns[coordinates] = len(match["events"])
+            # The same move events as the games against the AI, so they are streamed alike
+            match["events"].append({"attacker": seat, "cell": coordinates, "hit": hit,
+                                    "sunk": sunk, "game_over": game_over})
+            self.matches.move_to_end(match_id)
+            return match_id, turns[coordinates], match["events"][-1]
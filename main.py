@@ -1,34 +1,337 @@
 """Module which is the main entry point for the project, contains functions to handle the 
-webpage interfaces"""
+webpage interfaces. The app is built by create_app, and main.app is created the first
+time it is used, so importing the module does no I/O"""
+import atexit
+import hmac
 import json
+import os
 import logging
-from flask import Flask, render_template, jsonify, request
+import threading
+import time
+from flask import (Blueprint, Flask, Response, current_app, render_template, jsonify, request,
+                   redirect, g)
+import ai
 import components
-import game_engine
+import events
+import journal
+import lobby
+import metrics
 import mp_game_engine
-logging.basicConfig(filename = 'battleships.log', encoding='utf-8',
-                    level=logging.DEBUG, format = '%(asctime)s %(levelname)s: %(message)s'
-                    ,datefmt='%Y-%m-%d %H:%M:%S')
-
-app = Flask(__name__)
-ai_board = components.initialise_board()
-ai_ships = components.create_battleships()
-user_board = components.initialise_board()
-user_ships = components.create_battleships()
-players = {}
-previous_ai_attacks = []
-previous_user_attacks = []
-
-@app.route(rule = '/placement', methods = ["GET", "POST"])
+import opening_book
+import profiling
+import rendering
+import storage
+
+# The routes are registered on the app by create_app
+pages = Blueprint("battleships", __name__)
+app_lock = threading.Lock()
+
+def create_app(config: dict = None) -> Flask:
+    """Function used to create the Flask app of the web-based game, its settings are read
+    from the environment variables unless they are given in config. The games are kept in
+    memory unless BATTLESHIPS_STORE contains the path of a SQLite database, which lets
+    several worker processes serve the same games, or BATTLESHIPS_JOURNAL contains a
+    journal directory the games are rebuilt from on restart. The admin endpoints are only
+    served when BATTLESHIPS_ADMIN_TOKEN is set
+
+    :param config: a dictionary of settings overriding the environment variables
+    """
+    components.configure_logging()
+    app = Flask(__name__)
+    app.config.update(
+        BATTLESHIPS_STORE = os.environ.get("BATTLESHIPS_STORE"),
+        BATTLESHIPS_JOURNAL = os.environ.get("BATTLESHIPS_JOURNAL"),
+        BATTLESHIPS_ADMIN_TOKEN = os.environ.get("BATTLESHIPS_ADMIN_TOKEN"),
+        # Directory the .pstats files and allocation reports of the admin endpoints are written to
+        BATTLESHIPS_CAPTURE_DIR = os.environ.get("BATTLESHIPS_CAPTURE_DIR", "captures"),
+        BATTLESHIPS_FLEET = "battleships.txt",
+        BATTLESHIPS_BOARD_SIZE = 10,
+        BATTLESHIPS_AI_ALGORITHM = "random",
+        # "density" plays the AI's attacks with ai.cached_density_attack and "anytime" with
+        # ai.anytime_attack in a pool of worker processes with a deadline per move,
+        # otherwise they are chosen by generate_attack
+        BATTLESHIPS_AI = os.environ.get("BATTLESHIPS_AI", "random"),
+        BATTLESHIPS_AI_WORKERS = 2,
+        BATTLESHIPS_AI_DEADLINE = 0.05,
+        # Number of seconds the anytime AI thinks for, leaving time to send its move back
+        BATTLESHIPS_AI_BUDGET = 0.03,
+        # Path of the opening book the AI's first attacks are read from (see opening_book.py)
+        BATTLESHIPS_OPENING_BOOK = os.environ.get("BATTLESHIPS_OPENING_BOOK"),
+        # Most players waiting in the human-vs-human lobby and most matches kept, and the
+        # number of seconds a player waits for an opponent before leaving the lobby
+        BATTLESHIPS_LOBBY_LIMIT = 10000,
+        BATTLESHIPS_MATCH_LIMIT = 10000,
+        BATTLESHIPS_LOBBY_TIMEOUT = 300,
+        # Number of seconds an event stream waits for new events before sending a keep-alive
+        BATTLESHIPS_EVENTS_TIMEOUT = 15,
+        # Responses of these types and at least this many bytes are gzipped for clients accepting it
+        BATTLESHIPS_COMPRESSED_MIMETYPES = {"text/html", "application/json"},
+        BATTLESHIPS_COMPRESSION_MINIMUM_SIZE = 500)
+    app.config.update(config or {})
+    # The size of the boards and the fleet of every game served by the app
+    game_config = components.GameConfig(app.config["BATTLESHIPS_BOARD_SIZE"],
+                                        components.load_fleet(app.config["BATTLESHIPS_FLEET"]))
+    if app.config["BATTLESHIPS_JOURNAL"]:
+        store = journal.JournalGameStore(app.config["BATTLESHIPS_JOURNAL"])
+        # The last moves may still be waiting for their batch to be fsynced
+        atexit.register(store.close)
+    else:
+        store = storage.open_store(app.config["BATTLESHIPS_STORE"])
+    ai_service = None
+    if app.config["BATTLESHIPS_AI"] == "density":
+        ai_service = ai.AIService(ai.cached_density_attack, app.config["BATTLESHIPS_AI_WORKERS"],
+                                  app.config["BATTLESHIPS_AI_DEADLINE"])
+    elif app.config["BATTLESHIPS_AI"] == "anytime":
+        ai_service = ai.AIService(ai.anytime_attack, app.config["BATTLESHIPS_AI_WORKERS"],
+                                  app.config["BATTLESHIPS_AI_DEADLINE"],
+                                  app.config["BATTLESHIPS_AI_BUDGET"])
+    if ai_service is not None:
+        ai_service.start()
+    book = None
+    if app.config["BATTLESHIPS_OPENING_BOOK"]:
+        book = opening_book.OpeningBook(app.config["BATTLESHIPS_OPENING_BOOK"])
+    # Spectators of a game are dropped once this many of its events are waiting for them
+    app.extensions["battleships"] = {"store": store, "notifier": events.GameNotifier(),
+                                     "spectators": events.BroadcastHub(limit = 64),
+                                     "request_profiler": profiling.RequestProfiler(),
+                                     "memory_tracer": profiling.MemoryTracer(),
+                                     "precomputer": ai.MovePrecomputer(),
+                                     "ai_service": ai_service, "opening_book": book,
+                                     "game_config": game_config,
+                                     "lobby": lobby.Lobby(app.config["BATTLESHIPS_LOBBY_LIMIT"],
+                                                          app.config["BATTLESHIPS_MATCH_LIMIT"],
+                                                          app.config["BATTLESHIPS_LOBBY_TIMEOUT"])}
+    app.register_blueprint(pages)
+    return app
+
+def __getattr__(name: str):
+    """Function used to create main.app the first time it is used
+
+    :param name: a string value containing the name of the attribute of the module
+    """
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with app_lock:
+        if "app" not in globals():
+            globals()["app"] = create_app()
+    return globals()["app"]
+
+def services() -> dict:
+    """Function used to retrieve the game store, event notifier, spectator hub, request
+    profiler, memory tracer, AI move precomputer, AI service, opening book, game
+    configuration and human-vs-human lobby of the app handling the request"""
+    return current_app.extensions["battleships"]
+
+def publish_moves(game_id: str, game: dict, first_id: int) -> None:
+    """Function used to push the events of the moves just stored to the event streams
+    and spectators of the game. It is called by the game store while no other turn on the
+    game can be stored, so the events are pushed in the order they were played
+
+    :param game_id: a string value containing the id of the game
+    :param game: a dictionary containing the state of the game (see mp_game_engine.start_game)
+    :param first_id: an integer value with the id of the first of the new events
+    """
+    new_events = game["events"][first_id:]
+    was_over = first_id > 0 and game["events"][first_id - 1]["game_over"]
+    if not was_over and new_events and new_events[-1]["game_over"]:
+        metrics.GAMES_ACTIVE.dec()
+    services()["notifier"].notify(game_id, first_id + len(new_events),
+                                  bool(new_events) and new_events[-1]["game_over"])
+    services()["spectators"].publish(game_id, first_id, new_events)
+
+@pages.before_app_request
+def start_request_timer() -> None:
+    """Method which records when the request started and counts it as in flight"""
+    g.request_start = time.perf_counter()
+    metrics.REQUESTS_IN_FLIGHT.inc()
+    g.profiler = services()["request_profiler"].start()
+
+@pages.teardown_app_request
+def record_request_latency(_error = None) -> None:
+    """Method which records the latency of the request under its route, it also runs
+    when the request raised an exception. It also stops profiling the request"""
+    if g.get("profiler") is not None:
+        path = services()["request_profiler"].stop(g.pop("profiler"))
+        if path:
+            logging.info("The profile of the requests was written to %s", path)
+    if "request_start" in g:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, route)
+        metrics.REQUESTS_IN_FLIGHT.dec()
+
+@pages.route(rule = "/metrics", methods = ["GET"])
+def metrics_endpoint() -> None:
+    """Method which allows for GET requests.
+    Returns the metrics of this process in the Prometheus text format: the latency of
+    each route, the requests in flight, the active games and the time taken by the
+    AI's moves and the ship placements."""
+    return Response(metrics.render_metrics(), mimetype = "text/plain",
+                    headers = {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+def admin_error():
+    """Function used to check the admin token of the request, returns the error response
+    or None if the request is allowed"""
+    token = current_app.config["BATTLESHIPS_ADMIN_TOKEN"]
+    if not token:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token):
+        logging.warning("An admin request was made with a wrong token")
+        return jsonify({"error": "Forbidden"}), 403
+    return None
+
+@pages.route(rule = "/admin/profile", methods = ["POST"])
+def admin_profile() -> None:
+    """Method which allows for POST requests with the admin token.
+    Profiles the next requests (the requests argument, 10 by default) with cProfile and
+    writes their combined statistics to a .pstats file in the capture directory."""
+    error = admin_error()
+    if error:
+        return error
+    requests = request.args.get("requests", 10, type = int)
+    if requests <= 0:
+        return jsonify({"error": "The number of requests must be positive"}), 400
+    directory = current_app.config["BATTLESHIPS_CAPTURE_DIR"]
+    services()["request_profiler"].arm(requests, directory)
+    logging.info("The next %d requests will be profiled", requests)
+    return jsonify({"requests": requests, "directory": directory})
+
+@pages.route(rule = "/admin/memory", methods = ["POST"])
+def admin_memory() -> None:
+    """Method which allows for POST requests with the admin token.
+    The action argument "start" starts tracing the allocations with tracemalloc, "report"
+    writes the allocations retained since then and the bytes per active game to the
+    capture directory, and "stop" stops tracing."""
+    error = admin_error()
+    if error:
+        return error
+    memory_tracer = services()["memory_tracer"]
+    action = request.args.get("action", "report")
+    if action == "start":
+        memory_tracer.start()
+        return jsonify({"tracing": True})
+    if action == "stop":
+        memory_tracer.stop()
+        return jsonify({"tracing": False})
+    if action != "report":
+        return jsonify({"error": "The action must be start, report or stop"}), 400
+    path = memory_tracer.report(current_app.config["BATTLESHIPS_CAPTURE_DIR"],
+                                metrics.GAMES_ACTIVE.value)
+    if path is None:
+        return jsonify({"error": "The allocations are not being traced"}), 409
+    logging.info("The allocation report was written to %s", path)
+    return jsonify({"report": path})
+
+@pages.after_app_request
+def compress_response(response):
+    """Method which gzips the HTML and JSON responses for the clients that accept it,
+    the event streams and small responses are sent as they are"""
+    config = current_app.config
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or response.mimetype not in config["BATTLESHIPS_COMPRESSED_MIMETYPES"]
+            or "Content-Encoding" in response.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "")
+            or response.content_length < config["BATTLESHIPS_COMPRESSION_MINIMUM_SIZE"]):
+        return response
+    response.set_data(rendering.compress(response.get_data()))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    # The compressed body is a different representation, so its ETag becomes weak
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(etag, weak = True)
+    return response
+
+def ai_move_job(game: dict) -> tuple:
+    """Function used to get the function which chooses the AI's attack for the next turn
+    of a game and its arguments, which do not change with the game
+
+    :param game: a dictionary containing the state of the game (see mp_game_engine.start_game)
+    """
+    book = services()["opening_book"]
+    if book is not None:
+        opening = book.opening(game)
+        if opening is not None:
+            return book.cell, opening
+    ai_service = services()["ai_service"]
+    if ai_service is None:
+        return mp_game_engine.hunt_attack, (game["seed"], list(game["previous_ai_attacks"]),
+                                            len(game["user_board"]))
+    if ai_service.strategy is ai.cached_density_attack:
+        return ai_service.choose, (ai.observe(game), ai.position(game))
+    return ai_service.choose, (ai.observe(game),)
+
+def play_precomputed_turn(game_id: str, game: dict, user_attack: tuple) -> tuple:
+    """Function used to play a turn with the AI's precomputed attack when it is ready,
+    returns the result of the turn (see mp_game_engine.play_turn) and the job to
+    precompute the AI's next attack with (see ai_move_job), None if the game is over or
+    the user's attack was already played, in which case the game is not changed. An attack
+    on a game that is already over only gets its "finished" message
+
+    :param game_id: a string value containing the id of the game
+    :param game: a dictionary containing the state of the game (see mp_game_engine.start_game)
+    :param user_attack: a tuple value representing the x and y coordinate of the user's attack
+    """
+    user_attack = (int(user_attack[0]), int(user_attack[1]))
+    played = game["turns"].get(user_attack)
+    if played is not None:
+        # A retried or repeated attack gets the result of the turn it was first played in
+        logging.warning("The user has clicked on the same sqaure more than once")
+        return mp_game_engine.turn_result(game, played), None
+    if mp_game_engine.is_game_over(game):
+        logging.warning("An attack was made on a game that is already over")
+        return {"finished": mp_game_engine.finished_message(game)}, None
+    turn = len(game["previous_ai_attacks"])
+    ai_attack = services()["precomputer"].lookup(game_id, turn)
+    precomputed = ai_attack is not None
+    if not precomputed and (services()["ai_service"] is not None
+                            or services()["opening_book"] is not None):
+        choose, arguments = ai_move_job(game)
+        ai_start = time.perf_counter()
+        ai_attack = choose(*arguments)
+        metrics.AI_MOVE_SECONDS.observe(time.perf_counter() - ai_start)
+    result = mp_game_engine.play_turn(game, user_attack, ai_attack)
+    metrics.AI_PRECOMPUTED_MOVES.inc(str(precomputed).lower())
+    if mp_game_engine.is_game_over(game):
+        return result, None
+    return result, (turn + 1, *ai_move_job(game))
+
+def schedule_next_turn(response, game_id: str, next_turn: tuple) -> None:
+    """Function used to precompute the AI's attack for the next turn of a game once the
+    response has been sent
+
+    :param response: the response of the request
+    :param game_id: a string value containing the id of the game
+    :param next_turn: the turn, function and arguments returned by play_precomputed_turn
+    """
+    if next_turn is not None:
+        precomputer = services()["precomputer"]
+        turn, choose, arguments = next_turn
+        response.call_on_close(lambda: precomputer.schedule(game_id, turn, choose, *arguments))
+
+def current_game_id() -> str:
+    """Function used to retrieve the id of the game the request is for, from the game_id
+    argument or else the game_id cookie set when the ships were placed"""
+    return request.args.get("game_id") or request.cookies.get("game_id")
+
+@pages.route(rule = '/placement', methods = ["GET", "POST"])
 def placement_interface() -> None:
     """Method which allows for GET and POST requests.
     When a GET request is received, the method will render/return the placement.html template, 
     and assign the ships for the user and the size of the board.
     When a POST request is received, the method will retrieve the placement of the 
-    users' ship and place them on the players board.
+    users' ship and start a new game with them placed on the players board.
     It will also assign the AI's board with a random placement of battleships."""
+    game_config = services()["game_config"]
+    user_ships = game_config.fleet
+    board_size = game_config.size
     if request.method == "GET":
-        return render_template('placement.html', ships = user_ships , board_size = len(user_board))
+        response = current_app.make_response(render_template(
+            'placement.html', ships = user_ships , board_size = board_size,
+            grid = rendering.placement_grid(board_size)))
+        # The page only depends on the fleet and the size of the board
+        response.headers["Cache-Control"] = "public, max-age=300"
+        response.add_etag()
+        return response.make_conditional(request)
     if request.method == "POST":
         data = request.get_json()
         # Check to see if the data fetched from the json file matches the number of ships
@@ -36,26 +339,42 @@ def placement_interface() -> None:
         if len(data) != len(user_ships):
             logging.error("Not all ships were placed by the user")
             raise ValueError("Not all ships that are within in the dictionary were placed.")
-        else:
-            try:
-                with open('placement.json', 'w', encoding = "UTF-8") as file:
-                    json.dump(data, file)
-                players["Player_1"] = components.place_battleships(user_board, user_ships,"custom")
-                players["AI_Player"] = components.place_battleships(ai_board, ai_ships, "random")
-                return jsonify({'message': 'Received'}), 200
-            except FileNotFoundError as fne:
-                logging.error("The file that you are trying to write to does not exist.")
-                raise FileNotFoundError("placement.json file not found.") from fne
-
-@app.route(rule = "/", methods = ["GET"])
+        # A seed can be given to play a reproducible game, otherwise a new one is generated
+        placement_start = time.perf_counter()
+        game = mp_game_engine.new_game_state(data, current_app.config["BATTLESHIPS_AI_ALGORITHM"],
+                                             request.args.get("seed", type=int), game_config)
+        metrics.PLACEMENT_SECONDS.observe(time.perf_counter() - placement_start)
+        game_id = services()["store"].create_game(game)
+        metrics.GAMES_ACTIVE.inc()
+        response = jsonify({'message': 'Received', 'game_id': game_id, 'seed': game["seed"]})
+        response.set_cookie("game_id", game_id)
+        return response, 200
+
+@pages.route(rule = "/", methods = ["GET"])
 def root() -> None:
     """Method which allows for GET requests.
     When a GET request is received, the method will render/return the main.html template,
     and assign the board on the template with the players' board choice."""
+    store = services()["store"]
+    game_id = current_game_id()
+    if game_id is None or game_id not in store:
+        logging.warning("No game was found for the request, redirecting to the placement")
+        return redirect("/placement")
+    with store.game(game_id) as game:
+        size = len(game["user_board"])
+        cells = mp_game_engine.cell_records(game)
     logging.info("The users' board was successfully processed.")
-    return render_template('main.html', player_board = players["Player_1"])
+    # Larger boards are drawn on canvases instead of one element per cell
+    dense = size <= components.SPARSE_BOARD_SIZE
+    response = current_app.make_response(render_template(
+        'main.html', size = size, cells = cells,
+        attack_grid = rendering.attack_grid(size) if dense else None,
+        player_grid = rendering.player_grid(size) if dense else None))
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
 
-@app.route(rule = "/attack", methods = ["GET"])
+@pages.route(rule = "/attack", methods = ["GET"])
 def process_attack() -> None:
     """Method which allows for GET requests.
     When a GET request is received, the method will retrieve the two x and y arguments
@@ -63,65 +382,341 @@ def process_attack() -> None:
     These co-ordinates will be processed on the AI's board.
     An AI attack will also be generated and processed on the players' board.
     Logic is implemented to determine if the game should go on
-    or a certain player has won the game."""
+    or a certain player has won the game.
+    The whole turn is stored at once, and played again if a concurrent turn on the same
+    game was stored first.
+    The AI's attack is looked up if it was computed in the background after the previous
+    turn, and its attack for the next turn is computed once the response has been sent.
+    A retried or repeated attack gets the same response as the first one, without
+    changing the game, so clients can safely retry."""
+    store = services()["store"]
     if request.args:
         #Player's Guess/Turn
-        x = request.args.get('x')
-        y = request.args.get('y')
-        user_attack = (x, y)
-        player_attack_result = game_engine.attack((x,y), players["AI_Player"], ai_ships)
-        # Check to see if an attack by the user has already been guessed
-        while user_attack in previous_user_attacks:
-            logging.warning("The user has clicked on the same sqaure more than once")
-            return "Error - the user has clicked on the same sqaure more than once"
-        previous_user_attacks.append(user_attack)
-
-        ai_attack = mp_game_engine.generate_attack()
-        # Check to see if an attack by the user has already been guessed
-        while ai_attack in previous_ai_attacks:
-            logging.warning("The AI has tried to guess on the same square as its previous attacks.")
-            ai_attack = mp_game_engine.generate_attack()
-        previous_ai_attacks.append(ai_attack)
-        ai_attack_result = game_engine.attack(ai_attack, players["Player_1"], user_ships)
-
-        game_won = False
-        game_lost = False
-
-        #Check to see if all ships have been sunken for either the AI or the user
-        user_ships_sunk = all(value == 0 for value in user_ships.values())
-        ai_ships_sunk = all(value == 0 for value in ai_ships.values())
-        if ai_ships_sunk is True:
-            game_won = True
-
-        if user_ships_sunk is True:
-            game_lost = True
-
-        if game_won is True:
-            logging.info("The game has ended and the user has won")
-            return jsonify({"hit": player_attack_result, "AI_Turn": ai_attack,
-                             "finished":"Congratulations - You Won the Game!"})
-        elif game_lost is True:
-            logging.info("The game has ended and the user has won")
-            return jsonify({"hit": player_attack_result, "AI_Turn": ai_attack,
-                            "finished":"Game Over! The AI sunk all your ships!"})
-        else:
-            logging.info("The AI attacked the users board and "
-                         "the user has attacked the AI's board")
-            if player_attack_result is True:
-                logging.info("The player has hit the AI's ship!")
-            else:
-                logging.info("The player has missed the AI's ships")
-            if ai_attack_result is True:
-                logging.info("The AI has hit the player's ship!")
+        x = request.args.get('x', type=int)
+        y = request.args.get('y', type=int)
+        if x is None or y is None or not services()["game_config"].contains(x, y):
+            logging.error("The attack was not on the boards")
+            return jsonify({"error": "The attack must be on the boards"}), 400
+        game_id = current_game_id()
+        try:
+            result, next_turn = storage.update_game(
+                store, game_id, lambda game: play_precomputed_turn(game_id, game, (x, y)),
+                lambda game, first_id: publish_moves(game_id, game, first_id))
+        except KeyError:
+            logging.error("An attack was made on a game that does not exist")
+            return jsonify({"error": "Game not found"}), 404
+        response = jsonify(result)
+        schedule_next_turn(response, game_id, next_turn)
+        return response
+
+@pages.route(rule = "/attack/batch", methods = ["POST"])
+def process_attack_batch() -> None:
+    """Method which allows for POST requests from bots and automated clients.
+    The JSON body contains a "shots" list of [x, y] attacks which are played in order,
+    each followed by the AI's attack, and stored at once on the game store.
+    A shot at a location that was already attacked gets the result of the turn it was
+    first played in, as with /attack, and the batch stops once the game is over."""
+    store = services()["store"]
+    data = request.get_json(silent = True) or {}
+    shots = data.get("shots")
+    if (not isinstance(shots, list)
+            or not all(isinstance(shot, list) and len(shot) == 2
+                       and all(isinstance(value, int) for value in shot) for shot in shots)):
+        logging.error("The batch of attacks was not in the correct format")
+        return jsonify({"error": "The body must contain a list of [x, y] shots"}), 400
+    game_id = current_game_id()
+    def play(game: dict) -> tuple:
+        results = []
+        next_turn = None
+        size = len(game["ai_board"])
+        for x, y in shots:
+            if not (0 <= x < size and 0 <= y < size):
+                results.append({"x": x, "y": y, "error": "Out of the boards' bounds"})
+                continue
+            repeated = (x, y) in game["turns"]
+            result, played_turn = play_precomputed_turn(game_id, game, (x, y))
+            if not repeated:
+                next_turn = played_turn
+            results.append({"x": x, "y": y, **result})
+            if "finished" in result:
+                break
+        return results, next_turn
+    try:
+        results, next_turn = storage.update_game(
+            store, game_id, play, lambda game, first_id: publish_moves(game_id, game, first_id))
+    except KeyError:
+        logging.error("A batch of attacks was made on a game that does not exist")
+        return jsonify({"error": "Game not found"}), 404
+    logging.info("A batch of %d attacks was processed", len(results))
+    response = jsonify({"results": results})
+    schedule_next_turn(response, game_id, next_turn)
+    return response
+
+@pages.route(rule = "/state", methods = ["GET"])
+def game_state() -> None:
+    """Method which allows for GET requests.
+    Returns the version of the game (the number of moves played) with both boards encoded
+    as one character per cell, or with since=<version> only the cells that changed after
+    that version. Boards larger than components.SPARSE_BOARD_SIZE are sent as the "cells"
+    which are not water or not attacked (see mp_game_engine.cell_records). The response has an ETag of the version, so a client sending it back in
+    If-None-Match gets an empty 304 response while nothing has changed."""
+    store = services()["store"]
+    game_id = current_game_id()
+    since = request.args.get("since", type = int)
+    try:
+        with store.game(game_id) as game:
+            version = len(game["events"])
+            etag = f"{game_id}-{version}"
+            # The ETag of a gzipped response is weak (see compress_response)
+            if request.if_none_match.contains_weak(etag):
+                return Response(status = 304, headers = {"ETag": f'"{etag}"'})
+            if since is not None and 0 <= since <= version:
+                data = {"version": version, "since": since,
+                        "changes": mp_game_engine.cell_changes(game, since)}
+            elif len(game["user_board"]) > components.SPARSE_BOARD_SIZE:
+                data = {"version": version, "size": len(game["user_board"]),
+                        "cells": mp_game_engine.cell_records(game)}
             else:
-                logging.info("The AI has missed the player's ships")
-            return jsonify({"hit": player_attack_result, "AI_Turn": ai_attack})
+                data = {"version": version, "size": len(game["user_board"]),
+                        **mp_game_engine.cell_states(game)}
+    except KeyError:
+        logging.error("The state of a game that does not exist was requested")
+        return jsonify({"error": "Game not found"}), 404
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@pages.route(rule = "/events", methods = ["GET"])
+def game_events() -> None:
+    """Method which allows for GET requests.
+    Returns a server-sent events stream of the moves of the game, each event has the
+    attacked cell, whether it hit, the ship it sunk and whether the game is over.
+    A client which reconnects with a Last-Event-ID header (or last_event_id argument)
+    only receives the events after that one. The stream ends once the game is over."""
+    store = services()["store"]
+    notifier = services()["notifier"]
+    timeout = current_app.config["BATTLESHIPS_EVENTS_TIMEOUT"]
+    game_id = current_game_id()
+    last_event_id = request.headers.get("Last-Event-ID", request.args.get("last_event_id"))
+    try:
+        sent = int(last_event_id) + 1 if last_event_id is not None else 0
+    except ValueError:
+        return jsonify({"error": "The last event id must be a number"}), 400
+    if game_id is None or game_id not in store:
+        logging.error("An event stream was requested for a game that does not exist")
+        return jsonify({"error": "Game not found"}), 404
+
+    def stream():
+        nonlocal sent
+        yield "retry: 3000\n\n"
+        while True:
+            with store.game(game_id) as game:
+                new_events = game["events"][sent:]
+                game_over = mp_game_engine.is_game_over(game)
+            for event in new_events:
+                yield events.format_event(sent, event)
+                sent += 1
+            # A client resuming a finished game after its last event gets no new events
+            if game_over:
+                return
+            if not notifier.wait(game_id, sent, timeout):
+                yield ": keep-alive\n\n"
+
+    logging.info("An event stream was opened from event %d", sent)
+    return Response(stream(), mimetype = "text/event-stream",
+                    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@pages.route(rule = "/spectate/<game_id>", methods = ["GET"])
+def spectate(game_id: str) -> None:
+    """Method which allows for GET requests.
+    Returns a read-only server-sent events stream of the moves of a game for spectators.
+    The moves played so far are sent first, then every new move is fanned out from one
+    shared encoded buffer. A spectator that falls too far behind is dropped and can
+    reconnect from its last event id. The stream ends once the game is over."""
+    store = services()["store"]
+    spectators = services()["spectators"]
+    timeout = current_app.config["BATTLESHIPS_EVENTS_TIMEOUT"]
+    last_event_id = request.headers.get("Last-Event-ID", request.args.get("last_event_id"))
+    try:
+        sent = int(last_event_id) + 1 if last_event_id is not None else 0
+    except ValueError:
+        return jsonify({"error": "The last event id must be a number"}), 400
+    if game_id not in store:
+        logging.error("A spectator asked for a game that does not exist")
+        return jsonify({"error": "Game not found"}), 404
+    # Subscribing before reading the moves played so far means none can be missed
+    subscriber = spectators.subscribe(game_id)
+
+    def stream():
+        nonlocal sent
+        try:
+            yield "retry: 3000\n\n"
+            with store.game(game_id) as game:
+                played = game["events"][sent:]
+                game_over = mp_game_engine.is_game_over(game)
+            for event in played:
+                yield events.format_event(sent, event)
+                sent += 1
+            while not game_over:
+                chunks = spectators.receive(subscriber, timeout)
+                if chunks is None:
+                    return
+                if not chunks:
+                    # Moves played on another worker process are published from the store
+                    with store.game(game_id) as game:
+                        spectators.publish(game_id, sent, game["events"][sent:])
+                    yield ": keep-alive\n\n"
+                for event_id, chunk in chunks:
+                    if event_id >= sent:
+                        yield chunk
+                        sent = event_id + 1
+                        game_over = b'"game_over":true' in chunk
+        finally:
+            spectators.unsubscribe(game_id, subscriber)
+
+    return Response(stream(), mimetype = "text/event-stream",
+                    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def match_channel(match_id: str) -> str:
+    """Function used to get the id of the channel of the spectator hub the moves of a
+    human-vs-human match are pushed to, so it is never the id of a game against the AI
+
+    :param match_id: a string value containing the id of the match
+    """
+    return f"match-{match_id}"
+
+@pages.route(rule = "/pvp/join", methods = ["POST"])
+def pvp_join() -> None:
+    """Method which allows for POST requests.
+    The JSON body contains the "placement" of the player's ships, in the placement.json
+    format, and optionally the "size" of the boards and the "fleet" they want to play with,
+    the app's by default. The player is paired with the player who has waited longest for
+    the same size of boards and fleet, or else waits in the lobby for an opponent.
+    Returns the player's id, used by the other /pvp routes, and their match if they were paired."""
+    game_config = services()["game_config"]
+    data = request.get_json(silent = True) or {}
+    try:
+        config = components.GameConfig(data.get("size", game_config.size),
+                                       data.get("fleet", game_config.fleet))
+        ticket = services()["lobby"].join(config, data.get("placement"))
+    except (TypeError, ValueError, IndexError, KeyError, AttributeError, FileNotFoundError):
+        logging.error("A player tried to join the lobby with an invalid game")
+        return jsonify({"error": "The size, fleet or placement of the ships is not valid"}), 400
+    except RuntimeError:
+        return jsonify({"error": "The lobby is full, try again later"}), 503
+    return jsonify(ticket)
+
+@pages.route(rule = "/pvp/leave", methods = ["POST"])
+def pvp_leave() -> None:
+    """Method which allows for POST requests.
+    Removes the player given by the player argument from the lobby if they are still
+    waiting for an opponent."""
+    if not services()["lobby"].leave(request.args.get("player", "")):
+        return jsonify({"error": "The player is not waiting in the lobby"}), 404
+    return jsonify({"message": "Left the lobby"})
+
+@pages.route(rule = "/pvp/attack", methods = ["GET"])
+def pvp_attack() -> None:
+    """Method which allows for GET requests.
+    Plays the attack at the x and y arguments of the player given by the player argument
+    on their opponent's board, with the same rules as game_engine.attack, and pushes the
+    move to both players' event streams. A retried or repeated attack gets the same
+    response as the first one without changing the match."""
+    x = request.args.get("x", type = int)
+    y = request.args.get("y", type = int)
+    if x is None or y is None:
+        return jsonify({"error": "The attack must be on the boards"}), 400
+    try:
+        match_id, event_id, event = services()["lobby"].attack(request.args.get("player", ""),
+                                                               (x, y))
+    except KeyError:
+        logging.error("An attack was made by a player who is not in a match")
+        return jsonify({"error": "Match not found"}), 404
+    except IndexError:
+        return jsonify({"error": "The attack must be on the boards"}), 400
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 409
+    # The players take turns, so publishing the opponent's previous move again means it
+    # reaches the streams even if its request is still on its way, the hub skips it otherwise
+    first_id = max(event_id - 1, 0)
+    try:
+        services()["spectators"].publish(match_channel(match_id), first_id,
+                                         services()["lobby"].events(match_id, first_id))
+    except KeyError:
+        logging.warning("A match was dropped before its move could be pushed")
+    return jsonify({"hit": event["hit"], "sunk": event["sunk"], "game_over": event["game_over"]})
+
+@pages.route(rule = "/pvp/events", methods = ["GET"])
+def pvp_events() -> None:
+    """Method which allows for GET requests.
+    Returns a server-sent events stream for the player given by the player argument: a
+    "matched" event with the id of their match and their seat once they are paired, then
+    the move events of both players, in the same format as /events. A client which
+    reconnects with a Last-Event-ID header (or last_event_id argument) only receives the
+    moves after that one. The stream ends once the match is over."""
+    game_lobby = services()["lobby"]
+    spectators = services()["spectators"]
+    timeout = current_app.config["BATTLESHIPS_EVENTS_TIMEOUT"]
+    player_id = request.args.get("player", "")
+    last_event_id = request.headers.get("Last-Event-ID", request.args.get("last_event_id"))
+    try:
+        sent = int(last_event_id) + 1 if last_event_id is not None else 0
+    except ValueError:
+        return jsonify({"error": "The last event id must be a number"}), 400
+    waiter = game_lobby.waiter(player_id)
+    if waiter is None and game_lobby.seat(player_id) is None:
+        return jsonify({"error": "The player is not in the lobby"}), 404
+
+    def stream():
+        nonlocal sent
+        yield "retry: 3000\n\n"
+        # Waiting for an opponent without polling, the event is set once the player is paired
+        while waiter is not None and not waiter.wait(timeout):
+            yield ": keep-alive\n\n"
+        seat = game_lobby.seat(player_id)
+        if seat is None:
+            return
+        match_id, player_seat = seat
+        yield (f"event: matched\ndata: "
+               f"{json.dumps({'match_id': match_id, 'seat': player_seat}, separators=(',', ':'))}\n\n")
+        # Subscribing before reading the moves played so far means none can be missed
+        subscriber = spectators.subscribe(match_channel(match_id))
+        try:
+            try:
+                # Checked before reading the moves, so the last move of a match over is read
+                game_over = game_lobby.finished(match_id)
+                played = game_lobby.events(match_id, sent)
+            except KeyError:
+                return
+            for event in played:
+                yield events.format_event(sent, event)
+                sent += 1
+            while not game_over:
+                chunks = spectators.receive(subscriber, timeout)
+                if chunks is None:
+                    return
+                if not chunks:
+                    # The match may have been dropped to make room for new ones
+                    if game_lobby.seat(player_id) is None:
+                        return
+                    yield ": keep-alive\n\n"
+                for event_id, chunk in chunks:
+                    if event_id >= sent:
+                        yield chunk
+                        sent = event_id + 1
+                        game_over = b'"game_over":true' in chunk
+        finally:
+            spectators.unsubscribe(match_channel(match_id), subscriber)
+
+    return Response(stream(), mimetype = "text/event-stream",
+                    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # targeting_mode = False
 # ai_next_hits = []
 # ai_attack = None
 
-# @app.route(rule = "/attack", methods = ["GET"])
+# @pages.route(rule = "/attack", methods = ["GET"])
 # def process_attack_targeting_mode() -> None:
 #     """Method which allows for GET requests.
 #     When a GET request is received, the method will retrieve the two x and y arguments
@@ -234,5 +829,6 @@ def process_attack() -> None:
 #             return jsonify({"hit": player_attack_result, "AI_Turn": ai_attack})
 
 if __name__ == '__main__':
+    app = create_app()
     app.template_folder = "templates"
     app.run()
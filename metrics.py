@@ -0,0 +1,144 @@
+"""Module that contains the metrics recorded by the game, exposed by the web-based game
+in the Prometheus text format without needing a Prometheus server or client library"""
+import bisect
+import threading
+
+# Upper bounds in seconds of the histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+def format_labels(labels: dict) -> str:
+    """Function used to format labels in the Prometheus text format
+
+    :param labels: a dictionary with the name and value of each label
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+class Histogram:
+    """Histogram of observed values with one series per value of its label"""
+
+    def __init__(self, name: str, documentation: str, label: str = None,
+                 buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, label_value: str = None) -> None:
+        """Method used to record a value
+
+        :param value: a float value to record, in seconds for durations
+        :param label_value: a string value with the value of the label of the series
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                # One count per bucket plus +Inf, then the sum of the values
+                series = self.series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        """Method used to render the histogram as lines of the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = {label_value: list(series) for label_value, series in self.series.items()}
+        for label_value, series in sorted(snapshot.items(), key=lambda item: str(item[0])):
+            labels = {self.label: label_value} if self.label else {}
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': bound})} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+class Gauge:
+    """Value that can go up and down"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        """Method used to increase the value
+
+        :param amount: an integer value to add to the value
+        """
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: int = 1) -> None:
+        """Method used to decrease the value
+
+        :param amount: an integer value to take away from the value
+        """
+        with self.lock:
+            self.value -= amount
+
+    def render(self) -> list[str]:
+        """Method used to render the gauge as lines of the Prometheus text format"""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.value}"]
+
+class Counter:
+    """Value that only goes up, with one series per value of its label"""
+
+    def __init__(self, name: str, documentation: str, label: str = None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_value: str = None, amount: int = 1) -> None:
+        """Method used to increase the value of a series
+
+        :param label_value: a string value with the value of the label of the series
+        :param amount: an integer value to add to the value
+        """
+        with self.lock:
+            self.series[label_value] = self.series.get(label_value, 0) + amount
+
+    def render(self) -> list[str]:
+        """Method used to render the counter as lines of the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            snapshot = dict(self.series)
+        for label_value, value in sorted(snapshot.items(), key=lambda item: str(item[0])):
+            labels = {self.label: label_value} if self.label else {}
+            lines.append(f"{self.name}{format_labels(labels)} {value}")
+        return lines
+
+REQUEST_SECONDS = Histogram("battleships_request_duration_seconds",
+                            "Time taken to handle a request.", label = "route")
+REQUESTS_IN_FLIGHT = Gauge("battleships_requests_in_flight",
+                           "Requests being handled by this process.")
+GAMES_ACTIVE = Gauge("battleships_games_active",
+                     "Games started by this process that have not finished.")
+AI_MOVE_SECONDS = Histogram("battleships_ai_move_duration_seconds",
+                            "Time taken by the AI to choose its attack.")
+PLACEMENT_SECONDS = Histogram("battleships_placement_duration_seconds",
+                              "Time taken to place the ships of a new game.")
+AI_PRECOMPUTED_MOVES = Counter("battleships_ai_precomputed_moves_total",
+                               "AI moves by whether they had been computed ahead.",
+                               label = "precomputed")
+AI_FALLBACK_MOVES = Counter("battleships_ai_fallback_moves_total",
+                            "AI moves chosen by generate_attack because the AI service could "
+                            "not answer.", label = "reason")
+AI_BUDGET_USED = Histogram("battleships_ai_budget_used_ratio",
+                           "Fraction of its time budget the anytime AI used to choose its attack.",
+                           buckets = (0.1, 0.25, 0.5, 0.75, 0.9, 1, 1.1, 1.25, 1.5, 2))
+REGISTRY = (REQUEST_SECONDS, REQUESTS_IN_FLIGHT, GAMES_ACTIVE, AI_MOVE_SECONDS, PLACEMENT_SECONDS,
+            AI_PRECOMPUTED_MOVES, AI_FALLBACK_MOVES, AI_BUDGET_USED)
+
+def render_metrics() -> str:
+    """Function used to render every metric in the Prometheus text format"""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
@@ -1,23 +1,37 @@
 """Module that contains the functions that wil manage the 
 game mechanics of the multiplayer game with an AI Opponent"""
+import argparse
+import asyncio
+import json
 import random
 import logging
+import secrets
 import time
 import components
 import game_engine
-logging.basicConfig(filename = 'battleships.log', encoding='utf-8',
-                    level=logging.DEBUG, format = '%(asctime)s %(levelname)s: %(message)s'
-                    ,datefmt='%Y-%m-%d %H:%M:%S')
+import metrics
+import profiling
+import transposition
 players = {}
+# Seeds are at most 53 bits so they fit in a JavaScript number, web clients can send them back
+SEED_BITS = 53
 
 
-def generate_attack() -> tuple:
-    """Function used for generating a tuple that will represent the attack of the AI (player 2)"""
-    x_coordinate = random.randint(0,len(components.initialise_board()) - 1)
-    y_coordinate = random.randint(0,len(components.initialise_board()) - 1)
+@profiling.instrument
+def generate_attack(rng: random.Random = None, size: int = 10) -> tuple:
+    """Function used for generating a tuple that will represent the attack of the AI (player 2)
+
+    :param rng: the random.Random instance of the game, the random module is used if not given
+    :param size: an integer value representing the size of the boards
+    """
+    if rng is None:
+        rng = random
+    x_coordinate = rng.randint(0,size - 1)
+    y_coordinate = rng.randint(0,size - 1)
     ai_attack = (x_coordinate,y_coordinate)
     return ai_attack
 
+@profiling.instrument
 def targeting_mode(ai_hit: tuple, users_board: list[list], type_of_ship_hit: str) -> list[tuple]:
     """Function used for generating a list of tuples that will represent the attacks
     of the AI (player 2) to make in the next turns with advanced capabilities
@@ -27,17 +41,16 @@ def targeting_mode(ai_hit: tuple, users_board: list[list], type_of_ship_hit: str
     :param users_board: a 2D array containing the board arrangement of the player
     :param type_of_ship_hit: a string containing the name of the ship that was hit by ai_hit
     """
-    attacks_with_repetition = []
     attacks_without_repetition = []
     size = len(users_board)
-    #Will generate the placement of the type of shit that was hit
-    for i in range(size):
-        for j in range(size):
-            if users_board[i][j] == type_of_ship_hit:
-                ai_attack = (j, i)
-                if ai_attack != ai_hit:
-                    attacks_with_repetition.append(ai_attack)
     x, y = ai_hit
+    #Will generate the placement of the type of shit that was hit, which is either in the
+    #row or in the column of the hit, in the order of the rows and then the columns
+    ship_cells = {(j, y) for j, cell in components.row_items(users_board[y])
+                  if cell == type_of_ship_hit}
+    ship_cells.update((x, i) for i in range(size) if users_board[i][x] == type_of_ship_hit)
+    ship_cells.discard(ai_hit)
+    attacks_with_repetition = sorted(ship_cells, key = lambda cell: (cell[1], cell[0]))
     x_coordinates = []
     #Extract each attacks x and y values
     for attack in attacks_with_repetition:
@@ -72,113 +85,599 @@ def targeting_mode(ai_hit: tuple, users_board: list[list], type_of_ship_hit: str
                 attacks_without_repetition.append(attack)
     return attacks_without_repetition
 
-def print_board(users_board: list[list]) -> str:
+# Symbols of the ships of the standard fleet, so boards look the same whatever the fleet
+SHIP_SYMBOLS = {"Aircraft_Carrier": "X", "Battleship": "O", "Cruiser": "U",
+                "Submarine": "&", "Destroyer": "#"}
+# Symbols given in turn to the other ships of a fleet
+SPARE_SYMBOLS = "ABCDEFGHIJKLMNPQRSTVWYZ0123456789@$%*+="
+
+def ship_symbols(fleet: dict) -> dict[str, str]:
+    """Function used to build the table of the cell drawn for each ship of a fleet, the
+    ships of the standard fleet keep their symbols and the others are given the first spare
+    symbol not in use, falling back to ?
+
+    :param fleet: a dictionary containing the name and size of each ship
+    """
+    symbols = {ship: f" {SHIP_SYMBOLS[ship]}" for ship in fleet if ship in SHIP_SYMBOLS}
+    spare = iter(symbol for symbol in SPARE_SYMBOLS if f" {symbol}" not in symbols.values())
+    for ship in fleet:
+        if ship not in symbols:
+            symbols[ship] = f" {next(spare, '?')}"
+    return symbols
+
+def print_board(users_board: list[list], symbols: dict[str, str] = None) -> str:
     """Function that will be used for generating an ascii representation of a players' board
     
     :param board: a nested list of length (default 10 but it depends of 
     size parameter in initialise_board function) representing the layout of a board
+    :param symbols: a dictionary returned by ship_symbols, the symbols of the standard
+    fleet if not given
     """
+    if symbols is None:
+        symbols = ship_symbols(SHIP_SYMBOLS)
     size = len(users_board)
-    board = ""
     # Assigning the labels for the columns ranging from 0 to size
-    board += "    " + " ".join(str(i) for i in range(size)) + "\n"
-
-    # Assigning the top border of the board for seperation
-    board += "   " + "-" * (size * 2 + 1) + "\n"
-
-    # Assigning each row one by one
-    for i in range(size):
-        row = f"{i} |"
-        for j in range(size):
-            if users_board[i][j] is None:
-                row += f" {'~'}"  # Empty ocean space where ships are not placed
-            #Different symbols for each different ship
-            elif users_board[i][j] == "Aircraft_Carrier":
-                row += " X"
-            elif users_board[i][j] == "Battleship":
-                row += " O"
-            elif users_board[i][j] == "Cruiser":
-                row += " U"
-            elif users_board[i][j] == "Submarine":
-                row += " &"
-            elif users_board[i][j] == "Destroyer":
-                row += " #"
-            else:
-                row += " ?"
-        # Assigning each row of the board
-        board += row + " |\n"
-
-    # Assigning the bottom border of the board for seperation
-    board += "   " + "-" * (size * 2 + 1) + "\n"
-    return board
-
-def ai_opponent_game_loop() -> None:
-    """Function that will be used for the game to be played through the command-line-interface"""
-    print("Welcome to Battleships!")
-    print("Let's get started!")
-    user_board = components.initialise_board()
-    ai_board = components.initialise_board()
-    user_ships = components.create_battleships()
-    ai_ships = components.create_battleships()
-    players["Player_1"] = components.place_battleships(user_board, user_ships,"custom")
-    players["AI_Player"] = components.place_battleships(ai_board, ai_ships, "random")
+    labels = "    " + " ".join(str(i) for i in range(size)) + "\n"
+    # Assigning the top and bottom borders of the board for seperation
+    border = "   " + "-" * (size * 2 + 1) + "\n"
+    # Empty ocean space where ships are not placed
+    water = " ~" * size
+    # Assigning each row one by one, only the cells holding a ship are looked at
+    rows = []
+    for i, board_row in enumerate(users_board):
+        ships = components.row_items(board_row)
+        if ships:
+            cells = [" ~"] * size
+            for j, ship in ships:
+                cells[j] = symbols.get(ship, " ?")
+            rows.append(f"{i} |{''.join(cells)} |\n")
+        else:
+            rows.append(f"{i} |{water} |\n")
+    return "".join((labels, border, *rows, border))
+
+class BoardRenderer:
+    """Renderer of the frames of a board shown again and again in a terminal. In diff mode
+    the first frame clears the screen and draws the board at the top, keeping the lines
+    under it for the messages of the game, and each later frame only moves the cursor to
+    the cells which changed since the previous frame with ANSI escape codes and redraws them"""
+
+    def __init__(self, symbols: dict[str, str] = None, diff: bool = False):
+        self.symbols = symbols
+        self.diff = diff
+        # (x, y) to the symbol of each cell holding a ship in the previous frame
+        self.cells = None
+        self.size = None
+
+    def frame(self, board: list[list]) -> str:
+        """Method used to render the next frame of a board, returns an empty string in diff
+        mode when no cell changed
+
+        :param board: a nested list or a SparseBoard representing the layout of a board
+        """
+        if not self.diff:
+            return print_board(board, self.symbols)
+        symbols = self.symbols if self.symbols is not None else ship_symbols(SHIP_SYMBOLS)
+        cells = {(x, y): symbols.get(ship, " ?") for y, row in enumerate(board)
+                 for x, ship in components.row_items(row)}
+        if self.cells is None or self.size != len(board):
+            self.cells = cells
+            self.size = len(board)
+            # The board takes its rows, the labels and the two borders
+            lines = self.size + 3
+            # Clearing the screen, drawing the board at the top, then keeping the lines
+            # under it to scroll the messages and moving the cursor to them
+            return (f"\x1b[2J\x1b[H{print_board(board, symbols)}"
+                    f"\x1b[{lines + 1};r\x1b[{lines + 1};1H")
+        changes = []
+        for x, y in sorted(cells.keys() | self.cells.keys(), key = lambda cell: (cell[1], cell[0])):
+            symbol = cells.get((x, y), " ~")
+            if symbol != self.cells.get((x, y), " ~"):
+                # Rows start on the third line of the screen after the row label "y |"
+                changes.append(f"\x1b[{y + 3};{len(str(y)) + 2 * x + 3}H{symbol}")
+        self.cells = cells
+        if not changes:
+            return ""
+        # Saving and restoring the cursor so the messages carry on where they were
+        return "\x1b7" + "".join(changes) + "\x1b8"
+
+    def close(self) -> str:
+        """Method used to get the escape code that gives the whole screen back to scrolling
+        once the game is over, an empty string outside of diff mode"""
+        return "\x1b[r" if self.diff and self.cells is not None else ""
+
+def new_game_state(placement: dict, algorithm: str = "random", seed: int = None,
+                   config: components.GameConfig = None) -> dict:
+    """Function used to set up the state of a single web game against the AI opponent
+
+    :param placement: a dictionary in the placement.json format containing the
+    placement of the user's ships
+    :param algorithm: a string value containing the algorithm used to place the AI's ships
+    :param seed: an integer value used to seed the random number generator of the game,
+    a new one is generated if not given
+    :param config: the configuration of the game, the size of the boards and the fleet,
+    the default configuration if not given
+    """
+    if config is None:
+        config = components.GameConfig()
+    user_ships = config.new_ships()
+    user_board = components.place_battleships(config.new_board(), user_ships, "custom", placement)
+    return start_game(user_board, user_ships, algorithm, seed)
+
+def start_game(user_board: list[list], user_ships: dict, algorithm: str = "random",
+               seed: int = None) -> dict:
+    """Function used to set up the state of a web game from the user's placed board.
+    The game owns a random.Random instance seeded with the seed of the game, which
+    places the AI's ships and generates the AI's attacks, so the game can be rebuilt
+    exactly from its seed and the user's attacks
+
+    :param user_board: a nested list containing the user's placed ships
+    :param user_ships: a dictionary value containing the name of each ship as the key
+    and the size of the ship as the respective values
+    :param algorithm: a string value containing the algorithm used to place the AI's ships
+    :param seed: an integer value used to seed the random number generator of the game,
+    a new one is generated if not given
+    """
+    if seed is None:
+        seed = secrets.randbits(SEED_BITS)
+    rng = random.Random(seed)
+    ai_ships = dict(user_ships)
+    ai_board = components.place_battleships(components.initialise_board(len(user_board)),
+                                            ai_ships, algorithm, rng=rng)
+    logging.info("A game was started with the seed %d", seed)
+    return {"user_board": user_board, "ai_board": ai_board,
+            "user_ships": user_ships, "ai_ships": ai_ships, "fleet": dict(user_ships),
+            "previous_user_attacks": [], "previous_ai_attacks": [], "moves": [], "events": [],
+            "seed": seed, "algorithm": algorithm, "rng": rng,
+            "hashes": new_hash_states(len(user_board)), "turns": {}, "winner": None}
+
+def new_hash_states(size: int) -> dict:
+    """Function used to set up the Zobrist hashes of what each player of a web game has
+    seen of the other player's board, which apply_move keeps up to date
+
+    :param size: an integer value representing the size of the boards
+    """
+    return {"Player_1": transposition.new_hash_state(size),
+            "AI_Player": transposition.new_hash_state(size)}
+
+def is_game_over(game: dict) -> bool:
+    """Function used to check if all the ships of either player of a web game have been sunk
+
+    :param game: a dictionary containing the state of the game (see start_game)
+    """
+    return bool(game["events"]) and game["events"][-1]["game_over"]
+
+def ai_turn_rng(game: dict) -> random.Random:
+    """Function used to get the random number generator of a game ready for the AI's next
+    turn. It is reseeded from the seed of the game and the number of the turn, so the AI's
+    attack only depends on them and not on how the game was loaded
+
+    :param game: a dictionary containing the state of the game (see start_game)
+    """
+    rng = game["rng"]
+    rng.seed(f"{game['seed']}:{len(game['previous_ai_attacks'])}")
+    return rng
+
+def apply_move(game: dict, attacker: str, coordinates: tuple) -> bool:
+    """Function used to process an attack in a game state and record it as a move
+
+    :param game: a dictionary containing the state of the game (see new_game_state)
+    :param attacker: a string value, either "Player_1" or "AI_Player"
+    :param coordinates: a tuple value representing the x and y coordinate of the attack
+    """
+    coordinates = (int(coordinates[0]), int(coordinates[1]))
+    if attacker == "Player_1":
+        board, ships = game["ai_board"], game["ai_ships"]
+        game["previous_user_attacks"].append(coordinates)
+        # The user's turn is found by the index of its move (see turn_result)
+        game["turns"].setdefault(coordinates, len(game["moves"]))
+    else:
+        board, ships = game["user_board"], game["user_ships"]
+        game["previous_ai_attacks"].append(coordinates)
+    type_of_ship_hit = board[coordinates[1]][coordinates[0]]
+    hit = game_engine.attack(coordinates, board, ships, game["hashes"][attacker])
+    game["moves"].append((attacker, coordinates[0], coordinates[1], hit))
+    sunk = type_of_ship_hit if hit and ships[type_of_ship_hit] == 0 else None
+    # The game can only end on a move that sinks a ship, and stays over after that
+    was_over = bool(game["events"]) and game["events"][-1]["game_over"]
+    game_over = was_over or (sunk is not None and all(value == 0 for value in ships.values()))
+    if game_over and not was_over:
+        game["winner"] = attacker
+    # The event of the move pushed to the clients, its id is its index in the list
+    game["events"].append({"attacker": attacker, "cell": coordinates, "hit": hit,
+                           "sunk": sunk, "game_over": game_over})
+    return hit
+
+def play_turn(game: dict, user_attack: tuple, ai_attack: tuple = None) -> dict:
+    """Function used to play one turn of a web game, the user's attack followed by the AI's.
+    Returns a dictionary with the result of both attacks and a "finished" message once the
+    game is over (see turn_result). If the user has already attacked that location, the
+    result of the turn it was first attacked in is returned and the game is not changed,
+    and once the game is over only its "finished" message is returned.
+
+    :param game: a dictionary containing the state of the game (see new_game_state)
+    :param user_attack: a tuple value representing the x and y coordinate of the user's attack
+    :param ai_attack: a tuple value with the AI's attack for this turn if it was computed
+    ahead with hunt_attack, it is chosen here if not given
+    """
+    user_attack = (int(user_attack[0]), int(user_attack[1]))
+    # Check to see if an attack by the user has already been guessed
+    if user_attack in game["turns"]:
+        logging.warning("The user has clicked on the same sqaure more than once")
+        return turn_result(game, game["turns"][user_attack])
+    if is_game_over(game):
+        logging.warning("An attack was made on a game that is already over")
+        return {"finished": finished_message(game)}
+    turn = len(game["moves"])
+    player_attack_result = apply_move(game, "Player_1", user_attack)
+    if ai_attack is None or tuple(ai_attack) in game["previous_ai_attacks"]:
+        ai_start = time.perf_counter()
+        ai_attack = choose_ai_attack(ai_turn_rng(game), game["previous_ai_attacks"],
+                                     len(game["user_board"]))
+        metrics.AI_MOVE_SECONDS.observe(time.perf_counter() - ai_start)
+    ai_attack_result = apply_move(game, "AI_Player", ai_attack)
+    result = turn_result(game, turn)
+    #Check to see if all ships have been sunken for either the AI or the user
+    if "finished" in result:
+        logging.info("The game has ended and the %s has won",
+                     "user" if game["winner"] == "Player_1" else "AI")
+    else:
+        logging.info("The AI attacked the users board and "
+                     "the user has attacked the AI's board")
+        if player_attack_result is True:
+            logging.info("The player has hit the AI's ship!")
+        else:
+            logging.info("The player has missed the AI's ships")
+        if ai_attack_result is True:
+            logging.info("The AI has hit the player's ship!")
+        else:
+            logging.info("The AI has missed the player's ships")
+    return result
+
+def turn_result(game: dict, turn: int) -> dict:
+    """Function used to build the result of a turn of a web game from its moves, the same
+    every time it is asked for, so a repeated attack gets the response of its first turn
+
+    :param game: a dictionary containing the state of the game (see new_game_state)
+    :param turn: an integer value with the index of the user's move of the turn in the moves
+    """
+    _, _, _, hit = game["moves"][turn]
+    result = {"hit": hit}
+    if turn + 1 < len(game["moves"]):
+        _, ai_x, ai_y, _ = game["moves"][turn + 1]
+        result["AI_Turn"] = (ai_x, ai_y)
+    if game["events"][min(turn + 1, len(game["events"]) - 1)]["game_over"]:
+        result["finished"] = finished_message(game)
+    return result
+
+def finished_message(game: dict) -> str:
+    """Function used to get the message of a web game that is over for the user
+
+    :param game: a dictionary containing the state of the game (see new_game_state)
+    """
+    if game["winner"] == "Player_1":
+        return "Congratulations - You Won the Game!"
+    return "Game Over! The AI sunk all your ships!"
+
+def cell_states(game: dict) -> dict:
+    """Function used to encode the boards of a web game as one character per cell,
+    for the user's board "~" is water, "S" a ship, "X" a hit and "O" a miss by the AI, and
+    for the AI's board "." is a location not attacked yet, "X" a hit and "O" a miss.
+    Returns a dictionary with the rows of the "player" and "target" boards
+
+    :param game: a dictionary containing the state of the game (see start_game)
+    """
+    size = len(game["user_board"])
+    player = [["~" if cell is None else "S" for cell in row] for row in game["user_board"]]
+    target = [["."] * size for _ in range(size)]
+    for event in game["events"]:
+        x, y = event["cell"]
+        board = target if event["attacker"] == "Player_1" else player
+        board[y][x] = "X" if event["hit"] else "O"
+    return {"player": ["".join(row) for row in player], "target": ["".join(row) for row in target]}
+
+def cell_changes(game: dict, since: int) -> list[list]:
+    """Function used to list the cells of a web game that changed after a version, as
+    [board, x, y, state] lists in the encoding of cell_states, where the board is "player"
+    or "target". The version of a game is the number of moves that have been played
+
+    :param game: a dictionary containing the state of the game (see start_game)
+    :param since: an integer value with the version the client already has
+    """
+    return [["target" if event["attacker"] == "Player_1" else "player",
+             event["cell"][0], event["cell"][1], "X" if event["hit"] else "O"]
+            for event in game["events"][since:]]
+
+def cell_records(game: dict) -> list[list]:
+    """Function used to list the cells of a web game which are not water or not attacked,
+    as [board, x, y, state] lists in the encoding of cell_states, in the order to apply
+    them: the cells of the user's board holding a ship, then the attacked cells. It takes
+    the time of the ships and the moves rather than of the area of the boards
+
+    :param game: a dictionary containing the state of the game (see start_game)
+    """
+    ships = [["player", x, y, "S"] for y, row in enumerate(game["user_board"])
+             for x, _ in components.row_items(row)]
+    return ships + cell_changes(game, 0)
+
+def choose_ai_attack(rng: random.Random, previous_ai_attacks: list, size: int = 10) -> tuple:
+    """Function used to choose the AI's next attack in the command-line game, it only
+    depends on the random number generator and the AI's previous attacks, so it can be
+    chosen before the user's attack is known
+
+    :param rng: the random.Random instance of the game
+    :param previous_ai_attacks: a list of the AI's previous attacks
+    :param size: an integer value representing the size of the boards
+    """
+    ai_attack = generate_attack(rng, size)
+    # User validation to check that the AI is not guessing the same square more than once
+    while ai_attack in previous_ai_attacks:
+        logging.warning("The AI guessed the same location more than once")
+        if profiling.ENABLED:
+            profiling.count("mp_game_engine.generate_attack.retries")
+        ai_attack = generate_attack(rng, size)
+    return ai_attack
+
+def hunt_attack(seed: int, previous_ai_attacks: list, size: int = 10) -> tuple:
+    """Function used to choose the AI's attack for the next turn of a web game. Like
+    ai_turn_rng it only depends on the seed of the game and the AI's previous attacks,
+    so it can be computed before the user's attack is known
+
+    :param seed: an integer value with the seed of the game
+    :param previous_ai_attacks: a list of the AI's previous attacks
+    :param size: an integer value representing the size of the boards
+    """
+    return choose_ai_attack(random.Random(f"{seed}:{len(previous_ai_attacks)}"),
+                            previous_ai_attacks, size)
+
+def ai_opponent_game_loop(seed: int = None, read_input = input, output = print,
+                          pause: float = 1, placement: dict = None,
+                          config: components.GameConfig = None, diff: bool = False) -> dict:
+    """Function that will be used for the game to be played through the command-line-interface,
+    returns the result of the game. The game ends as incomplete if the input runs out
+
+    :param seed: an integer value used to seed the random number generator of the game,
+    a new one is generated if not given
+    :param read_input: the function used to read the user's attacks, input by default
+    :param output: the function used to show messages to the user, print by default
+    :param pause: a float value with the number of seconds to pause around the AI's turn,
+    0 to play without pausing
+    :param placement: a dictionary in the placement.json format containing the placement
+    of the user's ships, it is read from placement.json if not given
+    :param config: the configuration of the game, the default configuration if not given
+    :param diff: a boolean value, True to redraw only the cells of the user's board which
+    changed with ANSI escape codes instead of printing the whole board every turn
+    """
+    if config is None:
+        config = components.GameConfig()
+    renderer = BoardRenderer(ship_symbols(config.fleet), diff)
+    output("Welcome to Battleships!")
+    output("Let's get started!")
+    if seed is None:
+        seed = secrets.randbits(SEED_BITS)
+    rng = random.Random(seed)
+    output(f"Game seed: {seed}")
+    logging.info("A game was started with the seed %d", seed)
+    user_board = config.new_board()
+    ai_board = config.new_board()
+    user_ships = config.new_ships()
+    ai_ships = config.new_ships()
+    players["Player_1"] = components.place_battleships(user_board, user_ships, "custom", placement)
+    players["AI_Player"] = components.place_battleships(ai_board, ai_ships, "random", rng=rng)
     user_ships_sunk = False
     ai_ships_sunk = False
     previous_ai_attacks = []
     previous_player_attacks = []
+    result = {"game": "ai_opponent", "seed": seed, "result": "incomplete", "moves": 0,
+              "hits": 0, "ai_hits": 0}
     #While the user's ships arent all sunk and the AI's ships arent all sunk
     while not user_ships_sunk or not ai_ships_sunk:
         # The user's turn
-        print("It is your turn!")
-        user_attack = game_engine.cli_coordinates_input()
-        # User validation to check that they are not guessing the same square more than once
-        while user_attack in previous_player_attacks:
-            logging.warning("The user guessed the same location more than once")
-            print("You have already guessed at that co-ordinate, choose another one!")
-            user_attack = game_engine.cli_coordinates_input()
+        output("It is your turn!")
+        try:
+            user_attack = game_engine.cli_coordinates_input(read_input, output, config)
+            # User validation to check that they are not guessing the same square more than once
+            while user_attack in previous_player_attacks:
+                logging.warning("The user guessed the same location more than once")
+                output("You have already guessed at that co-ordinate, choose another one!")
+                user_attack = game_engine.cli_coordinates_input(read_input, output, config)
+        except EOFError:
+            logging.warning("The input ended before the game was over in ai opponent game loop")
+            if renderer.close():
+                output(renderer.close())
+            return result
         previous_player_attacks.append(user_attack)
+        result["moves"] += 1
         # Process the user's attack on the AI's board
         hit_or_miss_user = game_engine.attack(user_attack, ai_board, ai_ships)
         if hit_or_miss_user:
-            print("You hit the AI's ship!")
+            output("You hit the AI's ship!")
+            result["hits"] += 1
             logging.info("A ship was hit on the AI's board")
         else:
-            print("You missed!")
+            output("You missed!")
             logging.info("No ships were hit on the AI's board")
         # Check if the AI's ships are all sunk
         ai_ships_sunk = all(value == 0 for value in ai_ships.values())
         if ai_ships_sunk:
-            print("Congratulations! You sank all the AI's ships and won the game!")
+            output("Congratulations! You sank all the AI's ships and won the game!")
             logging.info("The game has ended and the user has won in ai opponent game loop.")
+            result["result"] = "won"
             break
         # The AI opponent's turn
-        print("\nAI's turn!")
-        time.sleep(1)
-        ai_attack = generate_attack()
-        # User validation to check that the AI is not guessing the same square more than once
-        while ai_attack in previous_ai_attacks:
-            logging.warning("The AI guessed the same location more than once")
-            ai_attack = generate_attack()
+        output("\nAI's turn!")
+        if pause:
+            time.sleep(pause)
+        ai_attack = choose_ai_attack(rng, previous_ai_attacks, config.size)
         previous_ai_attacks.append(ai_attack)
         # Process the AI's attack on the user's board
         hit_or_miss_ai = game_engine.attack(ai_attack, user_board, user_ships)
         if hit_or_miss_ai:
-            print(f"AI hit your ship at {ai_attack}!")
+            output(f"AI hit your ship at {ai_attack}!")
+            result["ai_hits"] += 1
             logging.info("A ship was hit on the user's board")
         else:
-            print("AI missed!")
+            output("AI missed!")
             logging.info("No ships were hit on the user's board")
-        time.sleep(1)
-        print("This is how your board looks:")
-        print(print_board(user_board))
+        if pause:
+            time.sleep(pause)
+        output("This is how your board looks:")
+        frame = renderer.frame(user_board)
+        if frame:
+            output(frame)
         logging.info("The board was sent to the command-line in ai opponent game loop.")
         # Check if the user's ships are all sunk
         user_ships_sunk = all(value == 0 for value in user_ships.values())
         if user_ships_sunk:
-            print("AI has sunk all your ships! Game Over!")
+            output("AI has sunk all your ships! Game Over!")
+            logging.info("The game has ended and the AI has won is ai opponent game loop.")
+            result["result"] = "lost"
+            break
+    output(renderer.close() + "Game Over!")
+    return result
+
+async def async_ai_opponent_game_loop(seed: int = None, read_input = input, output = print,
+                                      pause: float = 0.5, placement: dict = None,
+                                      config: components.GameConfig = None,
+                                      diff: bool = False) -> dict:
+    """Function that plays the same game as ai_opponent_game_loop on an asyncio event loop,
+    returns the result of the game. The user's attack is read in a worker thread while the
+    AI's next attack is chosen in another, so the AI's thinking time is hidden behind the
+    user's. The pause around the AI's turn is only cosmetic and does not hold up the AI
+
+    :param seed: an integer value used to seed the random number generator of the game,
+    a new one is generated if not given
+    :param read_input: the function used to read the user's attacks, input by default
+    :param output: the function used to show messages to the user, print by default
+    :param pause: a float value with the number of seconds to pause around the AI's turn,
+    0 to play without pausing
+    :param placement: a dictionary in the placement.json format containing the placement
+    of the user's ships, it is read from placement.json if not given
+    :param config: the configuration of the game, the default configuration if not given
+    :param diff: a boolean value, True to redraw only the cells of the user's board which
+    changed with ANSI escape codes instead of printing the whole board every turn
+    """
+    if config is None:
+        config = components.GameConfig()
+    renderer = BoardRenderer(ship_symbols(config.fleet), diff)
+    loop = asyncio.get_running_loop()
+    output("Welcome to Battleships!")
+    output("Let's get started!")
+    if seed is None:
+        seed = secrets.randbits(SEED_BITS)
+    rng = random.Random(seed)
+    output(f"Game seed: {seed}")
+    logging.info("A game was started with the seed %d", seed)
+    user_ships = config.new_ships()
+    ai_ships = config.new_ships()
+    user_board = components.place_battleships(config.new_board(), user_ships, "custom", placement)
+    ai_board = components.place_battleships(config.new_board(), ai_ships, "random", rng=rng)
+    previous_ai_attacks = []
+    previous_player_attacks = []
+    result = {"game": "ai_opponent", "seed": seed, "result": "incomplete", "moves": 0,
+              "hits": 0, "ai_hits": 0}
+    while True:
+        # The AI's next attack is chosen while the user is typing theirs
+        ai_choice = loop.run_in_executor(None, choose_ai_attack, rng, previous_ai_attacks,
+                                         config.size)
+        output("It is your turn!")
+        try:
+            user_attack = await asyncio.to_thread(game_engine.cli_coordinates_input,
+                                                  read_input, output, config)
+            while user_attack in previous_player_attacks:
+                logging.warning("The user guessed the same location more than once")
+                output("You have already guessed at that co-ordinate, choose another one!")
+                user_attack = await asyncio.to_thread(game_engine.cli_coordinates_input,
+                                                      read_input, output, config)
+        except EOFError:
+            logging.warning("The input ended before the game was over in ai opponent game loop")
+            if renderer.close():
+                output(renderer.close())
+            await ai_choice
+            return result
+        previous_player_attacks.append(user_attack)
+        result["moves"] += 1
+        if game_engine.attack(user_attack, ai_board, ai_ships):
+            output("You hit the AI's ship!")
+            result["hits"] += 1
+            logging.info("A ship was hit on the AI's board")
+        else:
+            output("You missed!")
+            logging.info("No ships were hit on the AI's board")
+        if all(value == 0 for value in ai_ships.values()):
+            output("Congratulations! You sank all the AI's ships and won the game!")
+            logging.info("The game has ended and the user has won in ai opponent game loop.")
+            await ai_choice
+            result["result"] = "won"
+            break
+        output("\nAI's turn!")
+        ai_attack, _ = await asyncio.gather(ai_choice, asyncio.sleep(pause))
+        previous_ai_attacks.append(ai_attack)
+        if game_engine.attack(ai_attack, user_board, user_ships):
+            output(f"AI hit your ship at {ai_attack}!")
+            result["ai_hits"] += 1
+            logging.info("A ship was hit on the user's board")
+        else:
+            output("AI missed!")
+            logging.info("No ships were hit on the user's board")
+        await asyncio.sleep(pause)
+        output("This is how your board looks:")
+        frame = renderer.frame(user_board)
+        if frame:
+            output(frame)
+        if all(value == 0 for value in user_ships.values()):
+            output("AI has sunk all your ships! Game Over!")
             logging.info("The game has ended and the AI has won is ai opponent game loop.")
+            result["result"] = "lost"
             break
-    print("Game Over!")
+    output(renderer.close() + "Game Over!")
+    return result
 
 if __name__ == '__main__':
-    ai_opponent_game_loop()
+    parser = argparse.ArgumentParser(description="Play Battleships against the AI opponent")
+    parser.add_argument("--seed", type=int, help="seed of the game, to replay a previous game")
+    parser.add_argument("--games", type=int, default=1, help="number of games to play in a row")
+    parser.add_argument("--capture", metavar="DIRECTORY",
+                        help="profile the games with cProfile and tracemalloc and write the "
+                        ".pstats file and allocation report to this directory")
+    parser.add_argument("--script", nargs="+", metavar="FILE",
+                        help="play a game from each move script (- for standard input) without "
+                        "prompts or pauses and write a JSON result line per game")
+    parser.add_argument("--transcripts", action="store_true",
+                        help="add the messages of each scripted game to its result line")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="choose the AI's attacks while you are typing yours")
+    parser.add_argument("--pause", type=float, default=1,
+                        help="number of seconds to pause around the AI's turn, 0 for none")
+    parser.add_argument("--size", type=int, default=10, help="size of the boards")
+    parser.add_argument("--fleet", default="battleships.txt", help="fleet definition file")
+    parser.add_argument("--diff", action="store_true",
+                        help="keep your board at the top of the terminal and redraw only the "
+                        "cells which changed, for large boards and slow connections")
+    arguments = parser.parse_args()
+    # Scripted games only log warnings and errors, logging every move would slow them down
+    components.configure_logging(level=logging.WARNING if arguments.script else logging.DEBUG)
+    game_config = components.GameConfig(arguments.size, components.load_fleet(arguments.fleet))
+    # The games after the first one are given the next seeds so they are not all the same
+    seeds = iter([None if arguments.seed is None else arguments.seed + game
+                  for game in range(len(arguments.script or []) or arguments.games)])
+    if arguments.script:
+        # The placement of the user's ships is read once for every script
+        with open("placement.json", "r", encoding="utf-8") as placement_file:
+            user_placement = json.load(placement_file)
+        game_engine.run_scripts(
+            lambda read_input, output: ai_opponent_game_loop(next(seeds), read_input, output, 0,
+                                                             user_placement, game_config),
+            arguments.script, arguments.transcripts)
+    elif arguments.capture:
+        for path in profiling.profile_games(lambda: ai_opponent_game_loop(next(seeds),
+                                                                          config=game_config),
+                                            arguments.games, arguments.capture, "ai_opponent_game"):
+            print(f"Written {path}")
+    elif arguments.use_async:
+        for seed in seeds:
+            asyncio.run(async_ai_opponent_game_loop(seed, pause=arguments.pause,
+                                                    config=game_config, diff=arguments.diff))
+    else:
+        for seed in seeds:
+            ai_opponent_game_loop(seed, pause=arguments.pause, config=game_config,
+                                  diff=arguments.diff)
@@ -0,0 +1,160 @@
+"""Module that contains the opening book of the AI: for each board size and fleet, the
+sequence of first attacks most likely to find a ship against the placement algorithms,
+learned offline from self-play. The book is a compact binary file which servers map into
+memory with mmap, so every worker process shares the same pages and an opening move is a
+table lookup. Run python3 opening_book.py to build the book
+
+Book file: a header, one index entry per board size and fleet, then the cells of each line"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import zlib
+import components
+
+# Header: magic, version, number of index entries
+HEADER = struct.Struct("<4sHH")
+# Index entry: size of the board, key of the fleet, offset of the line, number of attacks
+ENTRY = struct.Struct("<HIIH")
+# Attack of a line: x, y
+CELL = struct.Struct("<HH")
+MAGIC = b"BSOB"
+VERSION = 1
+
+def fleet_key(fleet: dict) -> int:
+    """Function used to get the key of a fleet in the book, which only depends on the
+    lengths of its ships
+
+    :param fleet: a dictionary containing the name and size of each ship
+    """
+    return zlib.crc32(repr(sorted(int(length) for length in fleet.values())).encode("utf-8"))
+
+def sample_boards(fleet: dict, size: int, algorithms: list, games: int, seed: int = 0) -> list:
+    """Function used to place the fleet like the AI opponent does in many self-play games,
+    returns the set of the indexes of the cells holding a ship in each game
+
+    :param fleet: a dictionary containing the name and size of each ship
+    :param size: an integer value representing the size of the board
+    :param algorithms: a list of the placement algorithms played against, in turn
+    :param games: an integer value with the number of games placed
+    :param seed: an integer value used to seed the placements
+    """
+    boards = []
+    for game in range(games):
+        board = components.place_battleships(components.initialise_board(size), dict(fleet),
+                                             algorithms[game % len(algorithms)],
+                                             rng = random.Random(f"{seed}:{game}"))
+        boards.append(frozenset(y * size + x for y, row in enumerate(board)
+                                for x, cell in enumerate(row) if cell is not None))
+    return boards
+
+def best_line(boards: list, size: int, depth: int) -> list[tuple]:
+    """Function used to find the sequence of first attacks most likely to hit: each attack
+    is on the cell holding a ship in the most games where every previous attack missed
+
+    :param boards: a list returned by sample_boards
+    :param size: an integer value representing the size of the board
+    :param depth: an integer value with the most attacks in the line
+    """
+    line = []
+    remaining = boards
+    for _ in range(depth):
+        counts = [0] * (size * size)
+        for board in remaining:
+            for index in board:
+                counts[index] += 1
+        for x, y in line:
+            counts[y * size + x] = -1
+        index = max(range(len(counts)), key = lambda cell: (counts[cell], -cell))
+        if counts[index] <= 0:
+            break
+        line.append((index % size, index // size))
+        remaining = [board for board in remaining if index not in board]
+    return line
+
+def write_book(path: str, lines: dict) -> None:
+    """Function used to write the book file, replacing it in one step so servers never
+    map a partly written book
+
+    :param path: a string value containing the path of the book file
+    :param lines: a dictionary of (board size, fleet key) to the list of attacks of the line
+    """
+    offset = HEADER.size + ENTRY.size * len(lines)
+    index = []
+    cells = []
+    for (size, key), line in sorted(lines.items()):
+        index.append(ENTRY.pack(size, key, offset, len(line)))
+        cells.extend(CELL.pack(x, y) for x, y in line)
+        offset += CELL.size * len(line)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(lines)) + b"".join(index) + b"".join(cells))
+    os.replace(temporary, path)
+
+class OpeningBook:
+    """Opening book mapped read-only into memory. The AI follows the line of its board
+    size and fleet while all its attacks have missed; the first hit ends the opening"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, entries = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not an opening book of version {VERSION}")
+        # (board size, fleet key) to (offset, number of attacks) of each line
+        self.lines = {}
+        for number in range(entries):
+            size, key, offset, length = ENTRY.unpack_from(self.data,
+                                                          HEADER.size + number * ENTRY.size)
+            self.lines[(size, key)] = (offset, length)
+
+    def cell(self, offset: int, ply: int) -> tuple:
+        """Method used to read an attack of a line
+
+        :param offset: an integer value with the offset of the line in the book
+        :param ply: an integer value with the number of the attack in the line
+        """
+        return CELL.unpack_from(self.data, offset + ply * CELL.size)
+
+    def opening(self, game: dict) -> tuple:
+        """Method used to find the AI's next attack of a web game in the book, returns the
+        offset of its line and the number of the attack to read with cell, or None once
+        the game has left the book
+
+        :param game: a dictionary containing the state of the game (see mp_game_engine.start_game)
+        """
+        line = self.lines.get((len(game["user_board"]), fleet_key(game["fleet"])))
+        ply = len(game["previous_ai_attacks"])
+        if line is None or ply >= line[1] or game["hashes"]["AI_Player"]["hits"]:
+            return None
+        offset = line[0]
+        for number, attack in enumerate(game["previous_ai_attacks"]):
+            if self.cell(offset, number) != tuple(attack):
+                return None
+        return offset, ply
+
+    def close(self) -> None:
+        """Method used to unmap the book"""
+        self.data.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the opening book of the AI from "
+                                     "self-play games")
+    parser.add_argument("--output", default="opening_book.bin")
+    parser.add_argument("--fleet", default="battleships.txt", help="fleet definition file")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10])
+    parser.add_argument("--algorithms", nargs="+", default=["random"],
+                        help="placement algorithms of the games played against")
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--depth", type=int, default=16, help="most attacks in each line")
+    arguments = parser.parse_args()
+    ships = components.load_fleet(arguments.fleet)
+    book = {}
+    for board_size in arguments.sizes:
+        sampled = sample_boards(ships, board_size, arguments.algorithms, arguments.games)
+        book[(board_size, fleet_key(ships))] = best_line(sampled, board_size, arguments.depth)
+        print(f"{board_size}x{board_size}: {book[(board_size, fleet_key(ships))]}")
+    write_book(arguments.output, book)
+    print(f"Written {arguments.output}")
@@ -0,0 +1,279 @@
+"""Module that contains the opt-in instrumentation of the hot paths of the game. It is
+switched on by setting the BATTLESHIPS_PROFILE environment variable before the game
+modules are imported, otherwise the instrumented functions are left untouched and cost
+nothing. Run python3 profiling.py to print the counters after simulated games.
+
+It also contains the on-demand cProfile and tracemalloc captures, which write .pstats
+files and allocation reports to a local directory for offline analysis. cProfile, pstats
+and tracemalloc are only imported once a capture is made, to keep the imports fast"""
+import argparse
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get("BATTLESHIPS_PROFILE", "") not in ("", "0")
+# Name of each instrumented function or counter to [calls, cumulative seconds]
+counters = {}
+lock = threading.Lock()
+
+def instrument(function):
+    """Decorator which counts the calls and cumulative time of a function when profiling
+    is enabled, and returns the function itself when it is not
+
+    :param function: the function to instrument
+    """
+    if not ENABLED:
+        return function
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with lock:
+                counter = counters.setdefault(name, [0, 0.0])
+                counter[0] += 1
+                counter[1] += elapsed
+    return wrapper
+
+def count(name: str, amount: int = 1) -> None:
+    """Function used to add to a counter, such as the retries of a loop. Callers check
+    ENABLED first so nothing is done when profiling is off
+
+    :param name: a string value containing the name of the counter
+    :param amount: an integer value to add to the counter
+    """
+    with lock:
+        counters.setdefault(name, [0, 0.0])[0] += amount
+
+def dump(file = None) -> None:
+    """Function used to print the counters, sorted by their cumulative time
+
+    :param file: the file to print to, standard output if not given
+    """
+    with lock:
+        rows = sorted(counters.items(), key=lambda item: (-item[1][1], item[0]))
+    print(f"{'counter':<50} {'calls':>10} {'total ms':>10} {'us/call':>10}", file=file)
+    for name, (calls, seconds) in rows:
+        timing = (f"{seconds * 1000:>10.2f} {seconds / calls * 1e6:>10.2f}"
+                  if seconds else f"{'':>10} {'':>10}")
+        print(f"{name:<50} {calls:>10} {timing}", file=file)
+
+def reset() -> None:
+    """Function used to clear the counters"""
+    with lock:
+        counters.clear()
+
+def capture_path(directory: str, name: str, extension: str) -> str:
+    """Function used to build the path of a capture file, named after the time it was made
+
+    :param directory: a string value containing the directory the captures are written to
+    :param name: a string value describing what was captured
+    :param extension: a string value with the extension of the file
+    """
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}{extension}")
+
+def write_memory_report(directory: str, name: str, baseline: "tracemalloc.Snapshot",
+                        games: int) -> str:
+    """Function used to write the allocations retained since a baseline snapshot, per line
+    of code and per active game, returns the path of the report. tracemalloc must be tracing
+
+    :param directory: a string value containing the directory the report is written to
+    :param name: a string value describing what was captured
+    :param baseline: the tracemalloc snapshot the allocations are compared to
+    :param games: an integer value with the number of games active
+    """
+    import tracemalloc
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)])
+    differences = snapshot.compare_to(baseline, "lineno")
+    retained = sum(difference.size_diff for difference in differences)
+    path = capture_path(directory, name, ".txt")
+    with open(path, "w", encoding="utf-8") as report:
+        report.write(f"Bytes retained since the baseline: {retained}\n")
+        report.write(f"Active games: {games}\n")
+        if games:
+            report.write(f"Bytes retained per active game: {retained / games:.0f}\n")
+        report.write("\nTop allocations retained since the baseline:\n")
+        for difference in differences[:25]:
+            report.write(f"{difference}\n")
+    snapshot.dump(path[:-len(".txt")] + ".tracemalloc")
+    return path
+
+def profile_games(play_game, games: int, directory: str, name: str) -> tuple[str, str]:
+    """Function used to play games under cProfile and tracemalloc, returns the paths of the
+    .pstats file and of the allocation report. The games returned by play_game are kept
+    until the end so the report shows the bytes retained per game
+
+    :param play_game: a function with no arguments which plays one game and returns it
+    :param games: an integer value with the number of games to play
+    :param directory: a string value containing the directory the captures are written to
+    :param name: a string value describing what was captured
+    """
+    import cProfile
+    import tracemalloc
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    played = []
+    profiler.enable()
+    for _ in range(games):
+        played.append(play_game())
+    profiler.disable()
+    report_path = write_memory_report(directory, name, baseline, games)
+    tracemalloc.stop()
+    stats_path = capture_path(directory, name, ".pstats")
+    profiler.dump_stats(stats_path)
+    return stats_path, report_path
+
+class RequestProfiler:
+    """Profiles the next requests handled by a server with cProfile once it is armed, and
+    writes their combined statistics to a .pstats file. cProfile can only profile one
+    thread at a time, so requests that arrive while another is being profiled are skipped"""
+
+    def __init__(self):
+        self.remaining = 0
+        self.directory = None
+        self.stats = None
+        self.lock = threading.Lock()
+        self.active = threading.Lock()
+
+    def arm(self, requests: int, directory: str) -> None:
+        """Method used to profile the next requests
+
+        :param requests: an integer value with the number of requests to profile
+        :param directory: a string value containing the directory the .pstats file is written to
+        """
+        with self.lock:
+            self.remaining = requests
+            self.directory = directory
+            self.stats = None
+
+    def start(self) -> "cProfile.Profile":
+        """Method used to start profiling a request, returns None if it is not profiled"""
+        if self.remaining <= 0 or not self.active.acquire(blocking=False):
+            return None
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop(self, profiler: "cProfile.Profile") -> str:
+        """Method used to stop profiling a request, returns the path of the .pstats file
+        once the last request has been profiled
+
+        :param profiler: the profiler returned by start
+        """
+        import pstats
+        profiler.disable()
+        self.active.release()
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+            self.remaining -= 1
+            if self.remaining:
+                return None
+            path = capture_path(self.directory, "requests", ".pstats")
+            self.stats.dump_stats(path)
+            self.stats = None
+            return path
+
+class MemoryTracer:
+    """Traces the allocations of a server with tracemalloc from a baseline, so the bytes
+    retained per active game can be reported"""
+
+    def __init__(self):
+        self.baseline = None
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        """Method used to start tracing and take the baseline snapshot"""
+        import tracemalloc
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.baseline = tracemalloc.take_snapshot()
+
+    def report(self, directory: str, games: int) -> str:
+        """Method used to write the allocation report, returns its path or None if
+        tracing was not started
+
+        :param directory: a string value containing the directory the report is written to
+        :param games: an integer value with the number of games active
+        """
+        with self.lock:
+            if self.baseline is None:
+                return None
+            return write_memory_report(directory, "memory", self.baseline, games)
+
+    def stop(self) -> None:
+        """Method used to stop tracing"""
+        import tracemalloc
+        with self.lock:
+            self.baseline = None
+            tracemalloc.stop()
+
+def dump_at_exit() -> None:
+    """Function used to print the counters to standard error when the process exits"""
+    dump(sys.stderr)
+
+if ENABLED and __name__ != "__main__":
+    # A server or load test prints its counters when it exits
+    atexit.register(dump_at_exit)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the profiling counters after "
+                                     "simulated games against the AI")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--algorithm", default="random", help="placement algorithm of the AI")
+    parser.add_argument("--capture", metavar="DIRECTORY",
+                        help="also profile the games with cProfile and tracemalloc and write "
+                        "the .pstats file and allocation report to this directory")
+    arguments = parser.parse_args()
+    # The game modules have to be imported after the environment variable is set
+    os.environ["BATTLESHIPS_PROFILE"] = "1"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import json
+    import random
+    import components
+    import mp_game_engine
+    import profiling
+    atexit.unregister(profiling.dump_at_exit)
+    components.configure_logging()
+    with open("placement.json", "r", encoding="utf-8") as placement_file:
+        placement = json.load(placement_file)
+    cells = [(x, y) for x in range(10) for y in range(10)]
+    seeds = iter(range(arguments.games))
+
+    def simulate_game() -> dict:
+        """Function used to play one simulated game, returns its state"""
+        seed = next(seeds)
+        game = mp_game_engine.new_game_state(placement, arguments.algorithm, seed)
+        initial_board = [list(row) for row in game["user_board"]]
+        for user_attack in random.Random(seed).sample(cells, len(cells)):
+            if "finished" in mp_game_engine.play_turn(game, user_attack):
+                break
+        # The targeting mode of the AI is exercised on each of its hits
+        for attacker, x, y, hit in game["moves"]:
+            if attacker == "AI_Player" and hit:
+                mp_game_engine.targeting_mode((x, y), initial_board, initial_board[y][x])
+        return game
+
+    if arguments.capture:
+        for path in profile_games(simulate_game, arguments.games, arguments.capture, "simulation"):
+            print(f"Written {path}")
+    else:
+        for _ in range(arguments.games):
+            simulate_game()
+    profiling.dump()
@@ -0,0 +1,43 @@
+"""Module that contains the cached HTML fragments of the board grids used by the
+templates of the web-based game"""
+import functools
+import gzip
+from markupsafe import Markup
+
+@functools.lru_cache(maxsize = 32)
+def attack_grid(size: int) -> Markup:
+    """Function used to build the grid of the AI's board the user clicks on to attack,
+    it only depends on the size of the board so it is built once per size
+
+    :param size: an integer value representing the size of the board
+    """
+    return Markup("".join(f'<div id="cell-{j}-{i}" onclick="sendAttack({j},{i}, \'/attack\')">'
+                          "</div>" for i in range(size) for j in range(size)))
+
+@functools.lru_cache(maxsize = 32)
+def player_grid(size: int) -> Markup:
+    """Function used to build the small grid showing the user's board, its cells are
+    coloured from the cell states of the board once the page has loaded
+
+    :param size: an integer value representing the size of the board
+    """
+    return Markup("".join(f'<div id="small-cell-{j}-{i}"></div>'
+                          for i in range(size) for j in range(size)))
+
+@functools.lru_cache(maxsize = 32)
+def placement_grid(size: int) -> Markup:
+    """Function used to build the grid the user places their ships on
+
+    :param size: an integer value representing the size of the board
+    """
+    return Markup("".join(f'<div id="cell-{j}-{i}" onclick="placeShip({j}, {i});" '
+                          f'onmouseover="handleMouseOver({j},{i})" onmouseout="handleMouseOut()">'
+                          "</div>" for i in range(size) for j in range(size)))
+
+def compress(body: bytes, level: int = 6) -> bytes:
+    """Function used to gzip the body of a response
+
+    :param body: a bytes value containing the body of the response
+    :param level: an integer value with the compression level, from 1 (fastest) to 9
+    """
+    return gzip.compress(body, compresslevel = level, mtime = 0)
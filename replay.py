@@ -0,0 +1,97 @@
+"""Module that contains the tool used to rebuild a web game exactly from its seed and
+the attacks played, so that a recorded game can be debugged offline"""
+import argparse
+import json
+import logging
+import components
+import journal
+import mp_game_engine
+import storage
+
+def replay_game(seed: int, user_board: list[list], user_ships: dict, user_attacks: list[tuple],
+                algorithm: str = "random", ai_attacks: list[tuple] = None) -> dict:
+    """Function used to rebuild a game from its seed and the user's attacks, the AI's
+    placement is generated again from the seed and its attacks too unless they are given.
+    Returns the state of the game
+
+    :param seed: an integer value containing the seed of the game
+    :param user_board: a nested list containing the user's placed ships
+    :param user_ships: a dictionary value containing the name of each ship as the key
+    and the size of the ship as the respective values
+    :param user_attacks: a list of the (x, y) attacks of the user in the order they were made
+    :param algorithm: a string value containing the algorithm used to place the AI's ships
+    :param ai_attacks: a list of the (x, y) attacks of the AI in the order they were made,
+    they are generated with mp_game_engine.choose_ai_attack if not given
+    """
+    game = mp_game_engine.start_game(user_board, dict(user_ships), algorithm, seed)
+    for turn, user_attack in enumerate(user_attacks):
+        ai_attack = ai_attacks[turn] if ai_attacks is not None and turn < len(ai_attacks) else None
+        result = mp_game_engine.play_turn(game, user_attack, ai_attack)
+        if result is not None and "finished" in result:
+            break
+    return game
+
+def replay_recorded_game(recorded: tuple, algorithm: str = None) -> tuple[dict, int]:
+    """Function used to replay a recorded game, returns the rebuilt state of the game and
+    the index of the first move that differs from the recording, or -1 if they all match.
+    The AI's attacks are the recorded ones, as they may have come from the opening book
+    or an AI which depends on time (see ai.py) rather than from the seed, so the replay
+    checks the AI's placement and the result of every attack
+
+    :param recorded: a tuple returned by storage.SQLiteGameStore.snapshot or journal.read_game
+    :param algorithm: a string value containing the algorithm used to place the AI's ships,
+    the one recorded with the game if not given
+    """
+    fleet, seed, recorded_algorithm, user_blob, _, moves = recorded
+    if algorithm is None:
+        algorithm = recorded_algorithm
+    user_attacks = [(x, y) for attacker, x, y, _ in moves if attacker == "Player_1"]
+    ai_attacks = [(x, y) for attacker, x, y, _ in moves if attacker == "AI_Player"]
+    game = replay_game(seed, storage.decode_board(user_blob, fleet), fleet, user_attacks, algorithm,
+                       ai_attacks)
+    for index, (recorded_move, replayed_move) in enumerate(zip(moves, game["moves"])):
+        if tuple(recorded_move) != tuple(replayed_move):
+            return game, index
+    return game, -1 if len(moves) == len(game["moves"]) else min(len(moves), len(game["moves"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild a web game from its seed and the "
+                                     "user's attacks")
+    parser.add_argument("game_id", nargs="?", help="id of a recorded game to replay")
+    parser.add_argument("--store", help="path of the SQLite game store the game is in")
+    parser.add_argument("--journal", help="path of the journal directory the game is in")
+    parser.add_argument("--seed", type=int, help="seed of the game to rebuild")
+    parser.add_argument("--placement", default="placement.json",
+                        help="placement of the user's ships used with --seed")
+    parser.add_argument("--moves", nargs="*", default=[],
+                        help="the user's attacks used with --seed, in the format x,y")
+    parser.add_argument("--algorithm", help="placement algorithm of the AI, the one recorded "
+                        "with the game or random with --seed by default")
+    arguments = parser.parse_args()
+    components.configure_logging()
+    if arguments.game_id:
+        if arguments.store:
+            recorded_game = storage.SQLiteGameStore(arguments.store).snapshot(arguments.game_id)
+        else:
+            recorded_game = journal.read_game(arguments.journal, arguments.game_id)
+        replayed, divergence = replay_recorded_game(recorded_game, arguments.algorithm)
+    elif arguments.seed is not None:
+        with open(arguments.placement, "r", encoding="utf-8") as file:
+            replayed = mp_game_engine.new_game_state(json.load(file),
+                                                     arguments.algorithm or "random",
+                                                     arguments.seed)
+        for move in arguments.moves:
+            mp_game_engine.play_turn(replayed, tuple(int(value) for value in move.split(",")))
+        divergence = None
+    else:
+        parser.error("either a game_id or --seed must be given")
+    for turn, (attacker, x, y, hit) in enumerate(replayed["moves"]):
+        print(f"{turn}: {attacker} attacked ({x},{y}) and {'hit' if hit else 'missed'}")
+    if divergence is None:
+        print(f"Seed {replayed['seed']}: {len(replayed['moves'])} moves were rebuilt")
+    elif divergence == -1:
+        print(f"Seed {replayed['seed']}: the replay matches the recorded game")
+    else:
+        logging.warning("The replay differs from the recorded game at move %d", divergence)
+        print(f"Seed {replayed['seed']}: the replay differs from the recording "
+              f"at move {divergence}")
@@ -0,0 +1,258 @@
+"""Module that contains the game-state stores used by the web-based game, so that
+several worker processes can serve the same games"""
+import json
+import logging
+import random
+import sqlite3
+import struct
+import threading
+import uuid
+from contextlib import contextmanager
+import components
+import mp_game_engine
+
+# The attackers are stored as their index in this tuple
+ATTACKERS = ("Player_1", "AI_Player")
+# Header of a board blob: format marker, size of the board
+BOARD_HEADER = struct.Struct("<BH")
+# Record of a cell holding a ship in a board blob: index of the cell (y * size + x), ship id
+CELL = struct.Struct("<IB")
+# First byte of the blobs of encode_board, never the first cell of a blob of one byte per cell
+SPARSE_BLOB = 255
+
+def encode_board(board: list[list], ships: dict) -> bytes:
+    """Function used to encode a board as a compact blob, a header with the size of the
+    board then one record per cell holding a ship, with the index of the cell and n for the
+    n-th ship of the fleet, so its length only depends on the fleet and not on the size
+
+    :param board: a nested list or a SparseBoard representing the layout of a board
+    :param ships: a dictionary value containing the name of each ship as the key
+    and the size of the ship as the respective values
+    """
+    ship_ids = {battleship: index + 1 for index, battleship in enumerate(ships)}
+    size = len(board)
+    return BOARD_HEADER.pack(SPARSE_BLOB, size) + b"".join(
+        CELL.pack(y * size + x, ship_ids[cell])
+        for y, row in enumerate(board) for x, cell in components.row_items(row))
+
+def decode_board(blob: bytes, ships: dict) -> list[list]:
+    """Function used to turn a blob made by encode_board back into a board, in the time
+    taken by its ships. Blobs of one byte per cell, written before boards were stored as
+    records, are still read
+
+    :param blob: a bytes value returned by encode_board
+    :param ships: the dictionary of ships that was used to encode the board
+    """
+    names = [None] + list(ships)
+    if blob[:1] != bytes([SPARSE_BLOB]):
+        size = int(len(blob) ** 0.5)
+        return [[names[cell] for cell in blob[row * size:(row + 1) * size]] for row in range(size)]
+    _, size = BOARD_HEADER.unpack_from(blob)
+    board = components.initialise_board(size)
+    for index, ship_id in CELL.iter_unpack(memoryview(blob)[BOARD_HEADER.size:]):
+        board[index // size][index % size] = names[ship_id]
+    return board
+
+def replay_moves(game: dict, moves: list[tuple]) -> dict:
+    """Function used to bring a game state up to date by running its moves through
+    game_engine.attack, returns the game state
+
+    :param game: a dictionary containing the state of the game (see mp_game_engine.new_game_state)
+    :param moves: a list of (attacker, x, y, hit) tuples in the order they were played
+    """
+    for attacker, x, y, _ in moves:
+        mp_game_engine.apply_move(game, attacker, (x, y))
+    return game
+
+def game_from_snapshot(fleet: dict, user_blob: bytes, ai_blob: bytes, seed: int,
+                       algorithm: str = "random") -> dict:
+    """Function used to build a new game state from the blobs of its initial boards
+
+    :param fleet: a dictionary with the name and size of each ship at the start of the game
+    :param user_blob: the encoded initial board of the user
+    :param ai_blob: the encoded initial board of the AI
+    :param seed: an integer value containing the seed of the game
+    :param algorithm: a string value containing the algorithm used to place the AI's ships
+    """
+    user_board = decode_board(user_blob, fleet)
+    return {"user_board": user_board, "ai_board": decode_board(ai_blob, fleet),
+            "user_ships": dict(fleet), "ai_ships": dict(fleet), "fleet": dict(fleet),
+            "previous_user_attacks": [], "previous_ai_attacks": [], "moves": [], "events": [],
+            "seed": seed, "algorithm": algorithm, "rng": random.Random(seed),
+            "hashes": mp_game_engine.new_hash_states(len(user_board)), "turns": {}, "winner": None}
+
+class MemoryGameStore:
+    """Game store which keeps every game in the memory of the current process"""
+
+    def __init__(self):
+        self.games = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def create_game(self, game: dict) -> str:
+        """Method used to store a new game, returns the id of the game
+
+        :param game: a dictionary containing the state of the game
+        """
+        game_id = uuid.uuid4().hex
+        with self.lock:
+            self.games[game_id] = game
+            self.locks[game_id] = threading.Lock()
+        logging.info("Game %s was created", game_id)
+        return game_id
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self.games
+
+    @contextmanager
+    def game(self, game_id: str, stored = None):
+        """Context manager which gives exclusive access to the state of a game,
+        raises a KeyError if the game does not exist
+
+        :param game_id: a string value containing the id of the game
+        :param stored: a function called with the game and its number of moves before the
+        block once moves are played on it, before another turn can be played on the game
+        """
+        lock = self.locks[game_id]
+        with lock:
+            game = self.games[game_id]
+            played = len(game["moves"])
+            yield game
+            if stored is not None and len(game["moves"]) > played:
+                stored(game, played)
+
+class SQLiteGameStore:
+    """Game store backed by a SQLite database in WAL mode. The initial boards are
+    stored as blobs and the moves as append-only rows, so every process that opens
+    the same file sees the same games"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        # Held while the moves of a turn are stored and published, so this process
+        # publishes the moves of a game in the order they were stored
+        self.write_lock = threading.Lock()
+        self.connection().executescript("""
+            CREATE TABLE IF NOT EXISTS games (
+                game_id TEXT PRIMARY KEY, fleet TEXT NOT NULL, seed INTEGER NOT NULL,
+                user_board BLOB NOT NULL, ai_board BLOB NOT NULL,
+                algorithm TEXT NOT NULL DEFAULT 'random');
+            CREATE TABLE IF NOT EXISTS moves (
+                game_id TEXT NOT NULL, seq INTEGER NOT NULL, attacker INTEGER NOT NULL,
+                x INTEGER NOT NULL, y INTEGER NOT NULL, hit INTEGER NOT NULL,
+                PRIMARY KEY (game_id, seq)) WITHOUT ROWID;""")
+        # Databases made before the placement algorithm was stored get its column
+        columns = [row[1] for row in self.connection().execute("PRAGMA table_info(games)")]
+        if "algorithm" not in columns:
+            self.connection().execute("ALTER TABLE games ADD COLUMN algorithm TEXT NOT NULL "
+                                      "DEFAULT 'random'")
+
+    def connection(self) -> sqlite3.Connection:
+        """Method used to get the connection of the current thread, opening it if needed"""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def create_game(self, game: dict) -> str:
+        """Method used to store a new game, returns the id of the game
+
+        :param game: a dictionary containing the state of the game, with no moves played
+        """
+        game_id = uuid.uuid4().hex
+        fleet = game["user_ships"]
+        self.connection().execute(
+            "INSERT INTO games (game_id, fleet, seed, user_board, ai_board, algorithm) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (game_id, json.dumps(fleet), game["seed"], encode_board(game["user_board"], fleet),
+             encode_board(game["ai_board"], fleet), game["algorithm"]))
+        logging.info("Game %s was created", game_id)
+        return game_id
+
+    def __contains__(self, game_id: str) -> bool:
+        row = self.connection().execute("SELECT 1 FROM games WHERE game_id = ?",
+                                        (game_id,)).fetchone()
+        return row is not None
+
+    def snapshot(self, game_id: str) -> tuple:
+        """Method used to read a game as it was stored, returns its fleet, seed, the algorithm
+        used to place the AI's ships, the blobs of its initial boards and its moves. Raises a
+        KeyError if the game does not exist
+
+        :param game_id: a string value containing the id of the game
+        """
+        connection = self.connection()
+        row = connection.execute("SELECT fleet, seed, algorithm, user_board, ai_board FROM games "
+                                 "WHERE game_id = ?", (game_id,)).fetchone()
+        if row is None:
+            raise KeyError(game_id)
+        moves = connection.execute("SELECT attacker, x, y, hit FROM moves WHERE game_id = ?"
+                                   " ORDER BY seq", (game_id,)).fetchall()
+        return (json.loads(row[0]), row[1], row[2], row[3], row[4],
+                [(ATTACKERS[attacker], x, y, bool(hit)) for attacker, x, y, hit in moves])
+
+    @contextmanager
+    def game(self, game_id: str, stored = None):
+        """Context manager which loads a game and appends the moves played on it once
+        the block exits. The game is read and replayed with no transaction open, and only
+        its new moves are written in a short IMMEDIATE transaction, so turns on other games
+        do not wait for this one. If another thread or worker process stored a move of the
+        same game first, the moves are not written and a sqlite3.IntegrityError is raised,
+        so the turn can be played again on the game with that move (see update_game).
+        Raises a KeyError if the game does not exist
+
+        :param game_id: a string value containing the id of the game
+        :param stored: a function called with the game and its number of moves before the
+        block once its new moves are stored, before the moves of another turn played by this
+        process can be stored
+        """
+        fleet, seed, algorithm, user_blob, ai_blob, moves = self.snapshot(game_id)
+        game = replay_moves(game_from_snapshot(fleet, user_blob, ai_blob, seed, algorithm), moves)
+        played = len(game["moves"])
+        yield game
+        new_moves = [(game_id, seq, ATTACKERS.index(attacker), x, y, int(hit))
+                     for seq, (attacker, x, y, hit) in enumerate(game["moves"][played:], played)]
+        if not new_moves:
+            return
+        connection = self.connection()
+        with self.write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany("INSERT INTO moves VALUES (?, ?, ?, ?, ?, ?)", new_moves)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            if stored is not None:
+                stored(game, played)
+
+def update_game(store, game_id: str, play, stored = None):
+    """Function used to play moves on a game of a store, returns what play returns. If the
+    moves could not be stored because another thread or worker process stored moves of the
+    same game at the same time, play is run again on the game with those moves
+
+    :param store: a game store returned by open_store
+    :param game_id: a string value containing the id of the game
+    :param play: a function which plays moves on the game state given to it
+    :param stored: a function called once the moves are stored (see the game method of the store)
+    """
+    while True:
+        try:
+            with store.game(game_id, stored) as game:
+                return play(game)
+        except sqlite3.IntegrityError:
+            logging.info("Moves were stored on game %s at the same time, playing again", game_id)
+
+def open_store(path: str = None):
+    """Function used to open the game store, the SQLite store if a path is given
+    or else the in-process memory store
+
+    :param path: a string value containing the path of the SQLite database
+    """
+    if path:
+        logging.info("Using the SQLite game store at %s", path)
+        return SQLiteGameStore(path)
+    return MemoryGameStore()
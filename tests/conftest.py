@@ -0,0 +1,13 @@
+import json
+import pytest
+
+########################################################################################################################
+# Shared fixtures of the tests
+########################################################################################################################
+@pytest.fixture
+def placement():
+    """
+    Used to load the placement of the user's ships from placement.json
+    """
+    with open("placement.json", "r", encoding="utf-8") as file:
+        return json.load(file)
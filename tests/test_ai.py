@@ -0,0 +1,169 @@
+import tracemalloc
+import ai
+import components
+import main
+import mp_game_engine
+import opening_book
+
+########################################################################################################################
+# Test ai.py functions
+########################################################################################################################
+def test_precomputed_move_is_only_used_for_its_turn():
+    """
+    Test if a precomputed AI attack is the one the AI chooses for that turn, and is not returned for another turn
+    """
+    precomputer = ai.MovePrecomputer()
+    precomputer.schedule("game", 1, mp_game_engine.hunt_attack, 42, [(0, 0)])
+    precomputer.shutdown()
+
+    assert precomputer.lookup("game", 1) == mp_game_engine.hunt_attack(42, [(0, 0)])
+    assert precomputer.lookup("game", 2) is None
+    assert precomputer.lookup("missing", 1) is None
+
+def test_attack_route_plays_the_same_game_with_precomputed_moves(placement):
+    """
+    Test if the /attack route plays the same AI attacks when they were precomputed after the previous turn as when
+    they are chosen during the turn
+    """
+    ai_attacks = []
+    precomputed = main.metrics.AI_PRECOMPUTED_MOVES.series.get("true", 0)
+    for close in (True, False):
+        app = main.create_app()
+        client = app.test_client()
+        client.post("/placement?seed=9", json=placement)
+        turns = []
+        for x in range(5):
+            response = client.get(f"/attack?x={x}&y=0")
+            turns.append(response.get_json()["AI_Turn"])
+            if close:
+                # Closing the response runs its close callbacks, which precompute the next AI attack,
+                # and the precomputer's thread runs its jobs in order
+                response.close()
+                app.extensions["battleships"]["precomputer"].executor.submit(int).result()
+        ai_attacks.append(turns)
+
+    assert ai_attacks[0] == ai_attacks[1]
+    assert main.metrics.AI_PRECOMPUTED_MOVES.series["true"] - precomputed == 4
+
+def test_density_attack_follows_up_a_hit(placement):
+    """
+    Test if the density AI attacks a cell next to a hit that has not been sunk yet
+    """
+    game = mp_game_engine.new_game_state(placement, seed=3)
+    # The user's Aircraft_Carrier is placed from (3, 2) in placement.json
+    assert mp_game_engine.apply_move(game, "AI_Player", (3, 2))
+    x, y = ai.density_attack(ai.observe(game))
+
+    assert abs(x - 3) + abs(y - 2) == 1
+
+def test_ai_service_falls_back_to_generate_attack_after_its_deadline(placement):
+    """
+    Test if the AI service returns the move of its strategy within the deadline, and the move of generate_attack when
+    the deadline has passed
+    """
+    game = mp_game_engine.new_game_state(placement, seed=3)
+    observation = ai.observe(game)
+    service = ai.AIService(ai.density_attack, workers=1, deadline=30)
+    try:
+        assert service.choose(observation) == ai.density_attack(observation)
+        service.deadline = 0
+        assert service.choose(observation) == ai.fallback_attack(observation)
+    finally:
+        service.shutdown()
+
+def test_anytime_attack_returns_a_move_within_its_budget(placement):
+    """
+    Test if the anytime AI follows up a hit when it has time to think, and still returns a valid attack when its budget
+    has already run out
+    """
+    game = mp_game_engine.new_game_state(placement, seed=3)
+    assert mp_game_engine.apply_move(game, "AI_Player", (3, 2))
+    observation = ai.observe(game)
+    (x, y), used = ai.anytime_attack(observation, 1)
+
+    assert abs(x - 3) + abs(y - 2) == 1
+    assert used < 1
+    assert ai.anytime_attack(observation, 0)[0] == ai.fallback_attack(observation)
+
+def test_zobrist_hash_folds_symmetric_positions(placement):
+    """
+    Test if the Zobrist hashes kept by game_engine.attack give the same position key to reflections of a position, and
+    a different key once another cell is attacked
+    """
+    first = mp_game_engine.new_game_state(placement, seed=1)
+    second = mp_game_engine.new_game_state(placement, seed=2)
+    mp_game_engine.apply_move(first, "AI_Player", (0, 9))
+    mp_game_engine.apply_move(second, "AI_Player", (9, 9))
+
+    assert ai.position(first)[0] == ai.position(second)[0]
+    mp_game_engine.apply_move(second, "AI_Player", (5, 5))
+    assert ai.position(first)[0] != ai.position(second)[0]
+
+def test_cached_density_attack_chooses_the_same_attack_as_density_attack(placement):
+    """
+    Test if the density AI chooses the same attacks through the transposition cache, from the cached reflection of a
+    position
+    """
+    ai.TRANSPOSITIONS.entries.clear()
+    reflected = mp_game_engine.new_game_state(placement, seed=3)
+    # The user's Aircraft_Carrier is placed from (3, 2) to (7, 2), so (6, 2) reflects it
+    assert mp_game_engine.apply_move(reflected, "AI_Player", (6, 2))
+    ai.cached_density_attack(ai.observe(reflected), ai.position(reflected))
+    game = mp_game_engine.new_game_state(placement, seed=3)
+    assert mp_game_engine.apply_move(game, "AI_Player", (3, 2))
+    hits = ai.TRANSPOSITIONS.hits
+
+    observation = ai.observe(game)
+    assert ai.cached_density_attack(observation, ai.position(game)) == ai.density_attack(observation)
+    assert ai.TRANSPOSITIONS.hits == hits + 1
+
+def test_opening_book_is_followed_until_the_first_hit(tmp_path, placement):
+    """
+    Test if the AI's attacks are read from the opening book while they all miss, and the book is left after a hit
+    """
+    game = mp_game_engine.new_game_state(placement, seed=3)
+    path = str(tmp_path / "book.bin")
+    # The user's Aircraft_Carrier is placed from (3, 2) to (7, 2)
+    line = [(0, 0), (9, 9), (5, 2), (1, 1)]
+    opening_book.write_book(path, {(10, opening_book.fleet_key(game["fleet"])): line})
+    book = opening_book.OpeningBook(path)
+    try:
+        for attack in line[:3]:
+            assert book.cell(*book.opening(game)) == attack
+            mp_game_engine.apply_move(game, "AI_Player", attack)
+        assert book.opening(game) is None
+    finally:
+        book.close()
+
+def test_observation_only_holds_the_attacked_cells(placement):
+    """
+    Test if the observation of a game on 10,000x10,000 boards only holds the cells the AI has attacked
+    """
+    game = mp_game_engine.new_game_state(placement, seed=3, config=components.GameConfig(10000))
+    for x in range(5):
+        mp_game_engine.play_turn(game, (x, 0))
+    observation = ai.observe(game)
+
+    assert len(observation[2]) == 5
+    x, y = ai.fallback_attack(observation)
+    assert y * 10000 + x not in observation[2]
+
+def test_density_attack_on_a_large_board_counts_a_bounded_number_of_cells():
+    """
+    Test if the density AI chooses its attacks on 10,000x10,000 boards without memory proportional to their area,
+    hunting within its window and following up a hit next to it
+    """
+    size = 10000
+    tracemalloc.start()
+    try:
+        first_x, first_y, width = ai.density_window((size, (5, 4, 3, 3, 2), {}, 1, 0))
+        x, y = ai.density_attack((size, (5, 4, 3, 3, 2), {}, 1, 0))
+        hit = ai.density_attack((size, (5, 4, 3, 3, 2), {5000 * size + 5000: ai.HIT}, 1, 1))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert width == ai.DENSITY_WINDOW
+    assert first_x <= x < first_x + width and first_y <= y < first_y + width
+    assert abs(hit[0] - 5000) + abs(hit[1] - 5000) == 1
+    assert peak < 2_000_000
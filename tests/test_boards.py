@@ -0,0 +1,83 @@
+import random
+import tracemalloc
+import components
+import game_engine
+import mp_game_engine
+import storage
+
+########################################################################################################################
+# Test the sparse board functions
+########################################################################################################################
+def test_sparse_board_is_placed_attacked_and_rendered_like_a_nested_list():
+    """
+    Test if a sparse board gets the same placement, attacks, targeting and rendering as a nested list board
+    """
+    fleet = components.load_fleet()
+    dense = components.place_battleships(components.initialise_board(12, sparse=False), dict(fleet), "random",
+                                         rng=random.Random(7))
+    sparse = components.place_battleships(components.initialise_board(12, sparse=True), dict(fleet), "random",
+                                          rng=random.Random(7))
+
+    assert mp_game_engine.print_board(sparse) == mp_game_engine.print_board(dense)
+    assert storage.encode_board(sparse, fleet) == storage.encode_board(dense, fleet)
+    x, y = next((x, y) for y, row in enumerate(dense) for x, cell in enumerate(row) if cell)
+    assert (mp_game_engine.targeting_mode((x, y), sparse, sparse[y][x])
+            == mp_game_engine.targeting_mode((x, y), dense, dense[y][x]))
+    dense_ships, sparse_ships = dict(fleet), dict(fleet)
+    for attack in [(x, y), (11, 11), (0, 5)]:
+        assert game_engine.attack(attack, sparse, sparse_ships) == game_engine.attack(attack, dense, dense_ships)
+    assert sparse_ships == dense_ships
+    assert sparse[y][x] is None
+
+def test_large_sparse_game_takes_kilobytes(placement):
+    """
+    Test if a game on 10,000x10,000 boards with the standard fleet takes kilobytes of memory
+    """
+    tracemalloc.start()
+    try:
+        game = mp_game_engine.new_game_state(placement, seed=1, config=components.GameConfig(10000))
+        for x in range(20):
+            mp_game_engine.play_turn(game, (x, 9999))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert isinstance(game["user_board"], components.SparseBoard)
+    assert peak < 200_000
+
+########################################################################################################################
+# Test the board renderer functions
+########################################################################################################################
+def test_print_board_gives_every_ship_of_a_fleet_its_own_symbol():
+    """
+    Test if print_board draws the ships of a fleet outside the standard one with their own symbols
+    """
+    fleet = {"Aircraft_Carrier": 5, "Frigate": 3, "Corvette": 2}
+    symbols = mp_game_engine.ship_symbols(fleet)
+    board = components.initialise_board(6)
+    board[0][:5] = ["Aircraft_Carrier"] * 5
+    board[2][1:4] = ["Frigate"] * 3
+    board[4][4:6] = ["Corvette"] * 2
+
+    assert symbols["Aircraft_Carrier"] == " X"
+    assert len(set(symbols.values())) == len(fleet)
+    rendered = mp_game_engine.print_board(board, symbols)
+    assert "?" not in rendered
+    assert rendered.splitlines()[4] == f"2 | ~{symbols['Frigate'] * 3} ~ ~ |"
+
+def test_board_renderer_diff_mode_only_redraws_changed_cells():
+    """
+    Test if the board renderer draws the whole board once, then only the cells which changed in diff mode
+    """
+    board = components.initialise_board()
+    board[3][6] = "Destroyer"
+    board[3][7] = "Destroyer"
+    renderer = mp_game_engine.BoardRenderer(diff = True)
+
+    first = renderer.frame(board)
+    assert mp_game_engine.print_board(board) in first
+    board[3][7] = None
+    assert renderer.frame(board) == "\x1b7\x1b[6;18H ~\x1b8"
+    assert renderer.frame(board) == ""
+    assert renderer.close() == "\x1b[r"
+    assert mp_game_engine.BoardRenderer().frame(board) == mp_game_engine.print_board(board)
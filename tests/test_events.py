@@ -0,0 +1,68 @@
+import threading
+import time
+import events
+
+########################################################################################################################
+# Test events.py functions
+########################################################################################################################
+def move_event(game_over=False):
+    """
+    Used to create a move event in the format made by mp_game_engine.apply_move
+    """
+    return {"attacker": "Player_1", "cell": (1, 2), "hit": True, "sunk": None, "game_over": game_over}
+
+def test_hub_shares_one_encoded_event_between_subscribers():
+    """
+    Test if every subscriber of a game receives the same encoded bytes for an event
+    """
+    hub = events.BroadcastHub(limit=4)
+    subscribers = [hub.subscribe("game") for _ in range(3)]
+    hub.publish("game", 0, [move_event()])
+
+    received = [hub.receive(subscriber, 0) for subscriber in subscribers]
+    assert received[0][0][0] == 0
+    assert all(chunks[0][1] is received[0][0][1] for chunks in received)
+
+def test_hub_drops_subscriber_that_falls_behind():
+    """
+    Test if a subscriber whose queue would grow past its limit is dropped while the others keep receiving events
+    """
+    hub = events.BroadcastHub(limit=2)
+    slow = hub.subscribe("game")
+    fast = hub.subscribe("game")
+    hub.publish("game", 0, [move_event(), move_event()])
+    assert len(hub.receive(fast, 0)) == 2
+    hub.publish("game", 2, [move_event()])
+
+    assert hub.receive(slow, 0) is None
+    assert len(hub.receive(fast, 0)) == 1
+
+def test_hub_skips_events_already_published():
+    """
+    Test if events published a second time, for example after reading them from the store, are not sent again
+    """
+    hub = events.BroadcastHub()
+    subscriber = hub.subscribe("game")
+    hub.publish("game", 0, [move_event(), move_event()])
+    hub.publish("game", 1, [move_event(), move_event()])
+
+    assert [event_id for event_id, _ in hub.receive(subscriber, 0)] == [0, 1, 2]
+
+def test_notifier_forgets_a_finished_game_once_its_streams_stop_waiting():
+    """
+    Test if the notifier keeps the condition of a finished game while a stream waits on it, and removes it once no
+    stream is waiting
+    """
+    notifier = events.GameNotifier()
+    woken = []
+    waiting = threading.Thread(target=lambda: woken.append(notifier.wait("game", 1, 5)))
+    waiting.start()
+    while "game" not in notifier.waiters:
+        time.sleep(0.01)
+    notifier.notify("other", 2, finished=True)
+    notifier.notify("game", 2, finished=True)
+    waiting.join(5)
+
+    assert woken == [True]
+    assert notifier.conditions == {} and notifier.versions == {}
+    assert notifier.waiters == {} and notifier.finished == set()
@@ -0,0 +1,70 @@
+import json
+import os
+import time
+import journal
+import mp_game_engine
+
+########################################################################################################################
+# Test journal.py functions
+########################################################################################################################
+def new_game():
+    """
+    Used to create a game with the user's ships placed from placement.json
+    """
+    with open("placement.json", "r", encoding="utf-8") as file:
+        return mp_game_engine.new_game_state(json.load(file))
+
+def test_journal_store_rebuilds_games_after_restart(tmp_path):
+    """
+    Test if a game played on a journal store is rebuilt with the same state by a new store opened on the directory
+    """
+    store = journal.JournalGameStore(str(tmp_path))
+    game_id = store.create_game(new_game())
+    with store.game(game_id) as game:
+        mp_game_engine.play_turn(game, (3, 2))
+        mp_game_engine.play_turn(game, (4, 2))
+        expected = {key: game[key] for key in ("user_board", "ai_board", "user_ships", "ai_ships", "moves")}
+    store.journal.close()
+
+    restarted = journal.JournalGameStore(str(tmp_path))
+    with restarted.game(game_id) as game:
+        assert {key: game[key] for key in expected} == expected
+
+def test_replay_ignores_incomplete_move_record(tmp_path):
+    """
+    Test if a partly written move record at the end of the journal, left by a crash, is ignored
+    """
+    writer = journal.MoveJournal(str(tmp_path))
+    writer.add_game(0, "a" * 32, new_game())
+    writer.add_moves(0, [("Player_1", 3, 2, True)])
+    writer.close()
+    with open(os.path.join(tmp_path, "moves.bin"), "ab") as file:
+        file.write(b"\x00\x00\x00")
+
+    games = journal.load_journal(str(tmp_path))
+    assert games["a" * 32][1]["previous_user_attacks"] == [(3, 2)]
+
+def test_replay_skips_finished_games(tmp_path):
+    """
+    Test if a game that was recorded as finished is not rebuilt
+    """
+    writer = journal.MoveJournal(str(tmp_path))
+    writer.add_game(0, "a" * 32, new_game())
+    writer.add_moves(0, [("Player_1", 3, 2, True)], finished=True)
+    writer.close()
+
+    assert journal.load_journal(str(tmp_path)) == {}
+
+def test_last_moves_are_fsynced_without_another_move(tmp_path):
+    """
+    Test if moves which do not fill a batch are fsynced by the timer once the batch interval has passed
+    """
+    writer = journal.MoveJournal(str(tmp_path), batch_size=64, batch_interval=0.5)
+    writer.add_game(0, "a" * 32, new_game())
+    writer.add_moves(0, [("Player_1", 3, 2, True)])
+    assert writer.pending == 1
+    time.sleep(1)
+
+    assert writer.pending == 0 and writer.timer is None
+    writer.close()
+    writer.close()
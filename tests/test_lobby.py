@@ -0,0 +1,78 @@
+import pytest
+import components
+import lobby
+
+########################################################################################################################
+# Test lobby.py functions
+########################################################################################################################
+def test_lobby_pairs_players_with_the_same_boards_and_fleet(placement):
+    """
+    Test if the lobby pairs a player with the oldest waiting player of the same board size and fleet only
+    """
+    game_lobby = lobby.Lobby()
+    first = game_lobby.join(components.GameConfig(10), placement)
+    other_size = game_lobby.join(components.GameConfig(12), placement)
+    second = game_lobby.join(components.GameConfig(10), placement)
+
+    assert first["match_id"] is None and other_size["match_id"] is None
+    assert second["seat"] == "Player_2"
+    assert game_lobby.seat(first["player"]) == (second["match_id"], "Player_1")
+    assert game_lobby.waiter(first["player"]) is None
+    assert game_lobby.waiter(other_size["player"]) is not None
+    assert game_lobby.leave(other_size["player"])
+    assert not game_lobby.queues and not game_lobby.waiting
+
+def test_lobby_attacks_take_turns_until_a_fleet_is_sunk(placement):
+    """
+    Test if the players of a match attack in turn, repeated attacks return their first move and the match ends once a
+    fleet is sunk
+    """
+    game_lobby = lobby.Lobby()
+    first = game_lobby.join(components.GameConfig(10), placement)["player"]
+    second = game_lobby.join(components.GameConfig(10), placement)["player"]
+    with pytest.raises(ValueError):
+        game_lobby.attack(second, (0, 0))
+    with pytest.raises(IndexError):
+        game_lobby.attack(first, (10, 0))
+
+    _, first_id, event = game_lobby.attack(first, (0, 0))
+    assert game_lobby.attack(first, (0, 0)) == (game_lobby.seat(first)[0], first_id, event)
+    cells = [(x, y) for y in range(10) for x in range(10)]
+    for cell, opponent_cell in zip(cells[1:], cells[::-1]):
+        game_lobby.attack(second, opponent_cell)
+        _, _, event = game_lobby.attack(first, cell)
+        if event["game_over"]:
+            break
+    assert event["game_over"] and event["attacker"] == "Player_1"
+    with pytest.raises(ValueError):
+        game_lobby.attack(second, (0, 0))
+
+def test_lobby_memory_is_bounded(placement):
+    """
+    Test if the lobby refuses players once it is full, drops players who waited too long and keeps its most matches
+    """
+    full = lobby.Lobby(limit=2)
+    full.join(components.GameConfig(10), placement)
+    full.join(components.GameConfig(11), placement)
+    with pytest.raises(RuntimeError):
+        full.join(components.GameConfig(12), placement)
+    full.timeout = -1
+    full.join(components.GameConfig(12), placement)
+    assert len(full.waiting) == 1
+
+    matches = lobby.Lobby(match_limit=2)
+    players = [matches.join(components.GameConfig(10), placement)["player"] for _ in range(6)]
+    assert len(matches.matches) == 2 and len(matches.players) == 4
+    assert matches.seat(players[0]) is None
+
+def test_lobby_refuses_a_placement_with_a_ship_left_off_the_board(placement):
+    """
+    Test if joining the lobby with a ship whose orientation is not h or v, or which was not placed, raises a ValueError
+    instead of starting a match which could never end
+    """
+    game_lobby = lobby.Lobby()
+    for ship in (["3", "2", "d"], ["3", "2"], "3,2,h"):
+        with pytest.raises(ValueError):
+            game_lobby.join(components.GameConfig(10), {**placement, "Aircraft_Carrier": ship})
+
+    assert game_lobby.waiting == {}
@@ -0,0 +1,340 @@
+import gzip
+import threading
+import time
+import main
+
+########################################################################################################################
+# Test main.py routes
+########################################################################################################################
+def test_attack_route_plays_a_turn(placement):
+    """
+    Test if the /attack route plays a turn on the game created by /placement and answers a repeated attack with the
+    same result
+    """
+    client = main.app.test_client()
+    response = client.post("/placement", json=placement)
+    assert response.status_code == 200
+
+    data = client.get("/attack?x=3&y=2").get_json()
+    assert isinstance(data["hit"], bool)
+    assert isinstance(data["AI_Turn"], list)
+    assert client.get("/attack?x=3&y=2").get_json() == data
+
+def test_attack_batch_route_stops_at_game_over(placement):
+    """
+    Test if the /attack/batch route plays every shot in order, answers repeated shots with the result of their first
+    turn and stops once the game is over
+    """
+    client = main.app.test_client()
+    client.post("/placement?seed=5", json=placement)
+    shots = [[x, y] for y in range(10) for x in range(10)]
+
+    results = client.post("/attack/batch", json={"shots": [[0, 0], [0, 0]] + shots}).get_json()["results"]
+    assert results[1] == results[0]
+    assert "finished" in results[-1]
+    assert client.post("/attack/batch", json={"shots": [[1, "a"]]}).status_code == 400
+
+def test_attack_routes_do_not_play_on_a_finished_game(placement):
+    """
+    Test if /attack and /attack/batch on a game that is already over return its finished message without playing a turn
+    """
+    client = main.app.test_client()
+    game_id = client.post("/placement?seed=5", json=placement).get_json()["game_id"]
+    shots = [[x, y] for y in range(10) for x in range(10)]
+    finished = client.post("/attack/batch", json={"shots": shots}).get_json()["results"][-1]["finished"]
+    with main.app.extensions["battleships"]["store"].game(game_id) as game:
+        played = len(game["moves"])
+    attacked = {tuple(shot) for shot in shots[:played // 2]}
+    x, y = next(shot for shot in shots if tuple(shot) not in attacked)
+
+    assert client.get(f"/attack?x={x}&y={y}").get_json() == {"finished": finished}
+    results = client.post("/attack/batch", json={"shots": [[x, y], [x, y]]}).get_json()["results"]
+    assert results == [{"x": x, "y": y, "finished": finished}]
+    with main.app.extensions["battleships"]["store"].game(game_id) as game:
+        assert len(game["moves"]) == played
+
+def test_attack_route_answers_retries_without_changing_the_game(placement):
+    """
+    Test if a retried /attack gets the same response as the first one without playing another turn
+    """
+    client = main.app.test_client()
+    game_id = client.post("/placement?seed=5", json=placement).get_json()["game_id"]
+    first = client.get("/attack?x=3&y=4")
+    first.close()
+    retry = client.get("/attack?x=3&y=4")
+    retry.close()
+
+    assert retry.get_json() == first.get_json()
+    with main.app.extensions["battleships"]["store"].game(game_id) as game:
+        assert len(game["moves"]) == 2
+
+def test_events_route_resumes_from_the_last_event_id(placement):
+    """
+    Test if the /events stream sends the move events of a finished game and only the later ones when resumed
+    """
+    client = main.app.test_client()
+    client.post("/placement?seed=5", json=placement)
+    shots = [[x, y] for y in range(10) for x in range(10)]
+    client.post("/attack/batch", json={"shots": shots})
+
+    stream = client.get("/events").get_data(as_text=True)
+    assert stream.count("event: move") >= 34
+    assert '"game_over":true' in stream
+    assert "id: 0\n" in stream
+    resumed = client.get("/events", headers={"Last-Event-ID": "3"}).get_data(as_text=True)
+    assert "id: 3\n" not in resumed and "id: 4\n" in resumed
+
+def test_spectate_route_streams_a_finished_game(placement):
+    """
+    Test if a spectator of a finished game receives every move event and the stream ends
+    """
+    client = main.app.test_client()
+    game_id = client.post("/placement?seed=5", json=placement).get_json()["game_id"]
+    played = client.post("/attack/batch", json={"shots": [[x, y] for y in range(10) for x in range(10)]})
+
+    stream = main.app.test_client().get(f"/spectate/{game_id}").get_data(as_text=True)
+    assert stream.count("event: move") == 2 * len(played.get_json()["results"])
+    assert main.app.test_client().get("/spectate/missing").status_code == 404
+
+def test_state_route_returns_changes_and_not_modified(placement):
+    """
+    Test if the /state route returns the cells changed since a version and a 304 response when the ETag still matches
+    """
+    client = main.app.test_client()
+    client.post("/placement?seed=5", json=placement)
+    first = client.get("/state")
+    assert first.get_json()["version"] == 0
+    assert len(first.get_json()["player"]) == 10
+
+    client.get("/attack?x=3&y=2")
+    changes = client.get("/state?since=0").get_json()
+    assert changes["version"] == 2
+    assert changes["changes"][0][:3] == ["target", 3, 2]
+    etag = client.get("/state").headers["ETag"]
+    assert client.get("/state", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/state", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+def test_root_route_is_compressed_and_conditional(placement):
+    """
+    Test if the main page is gzipped for clients accepting it, contains the whole grid, and returns 304 for its ETag
+    """
+    client = main.app.test_client()
+    client.post("/placement?seed=5", json=placement)
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    page = gzip.decompress(response.get_data()).decode("utf-8")
+    assert 'id="cell-9-9"' in page and 'id="small-cell-9-9"' in page
+    assert client.get("/", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+def test_metrics_route_reports_route_latency(placement):
+    """
+    Test if the /metrics route reports the latency of the routes that were requested in the Prometheus text format
+    """
+    client = main.app.test_client()
+    client.post("/placement?seed=5", json=placement)
+    client.get("/attack?x=0&y=0")
+    text = client.get("/metrics").get_data(as_text=True)
+
+    assert 'battleships_request_duration_seconds_count{route="/attack"}' in text
+    assert "battleships_placement_duration_seconds_count" in text
+    assert "# TYPE battleships_requests_in_flight gauge" in text
+
+def test_admin_profile_route_writes_the_profile_of_the_next_requests(tmp_path, placement):
+    """
+    Test if the /admin/profile route needs the admin token and writes a .pstats file once the next requests were profiled
+    """
+    app = main.create_app({"BATTLESHIPS_ADMIN_TOKEN": "secret", "BATTLESHIPS_CAPTURE_DIR": str(tmp_path)})
+    client = app.test_client()
+
+    assert client.post("/admin/profile?requests=2").status_code == 403
+    assert client.post("/admin/profile?requests=2", headers={"X-Admin-Token": "secret"}).status_code == 200
+    client.get("/placement")
+    assert not list(tmp_path.glob("*.pstats"))
+    client.get("/placement")
+    assert len(list(tmp_path.glob("requests-*.pstats"))) == 1
+
+def test_create_app_gives_each_app_its_own_store(placement):
+    """
+    Test if each app created by create_app has its own game store, so a game created on one is not found on the other
+    """
+    first = main.create_app().test_client()
+    second = main.create_app().test_client()
+    game_id = first.post("/placement?seed=5", json=placement).get_json()["game_id"]
+
+    assert first.get(f"/state?game_id={game_id}").status_code == 200
+    assert second.get(f"/state?game_id={game_id}").status_code == 404
+
+def test_attack_route_plays_on_a_large_board(placement):
+    """
+    Test if the web game plays on boards of the size of the app's game configuration and rejects attacks outside them
+    """
+    app = main.create_app({"BATTLESHIPS_BOARD_SIZE": 1000})
+    client = app.test_client()
+    client.post("/placement?seed=5", json=placement)
+
+    response = client.get("/attack?x=999&y=998")
+    response.close()
+    assert response.get_json()["hit"] is False
+    assert all(0 <= value < 1000 for value in response.get_json()["AI_Turn"])
+    assert client.get("/attack?x=1000&y=0").status_code == 400
+
+def test_root_and_state_routes_send_only_the_cells_of_a_large_board(placement):
+    """
+    Test if the main page and the full state of a game on 1000x1000 boards only hold the cells which are not water or
+    not attacked, instead of every cell
+    """
+    app = main.create_app({"BATTLESHIPS_BOARD_SIZE": 1000})
+    client = app.test_client()
+    client.post("/placement?seed=5", json=placement)
+    client.get("/attack?x=999&y=998").close()
+
+    page = client.get("/").get_data(as_text=True)
+    assert len(page) < 50_000
+    assert 'id="target-canvas"' in page and 'id="cell-999-999"' not in page
+    data = client.get("/state").get_json()
+    assert "player" not in data and data["size"] == 1000
+    assert ["target", 999, 998, "O"] in data["cells"]
+    assert sum(cell[3] == "S" for cell in data["cells"]) + sum(
+        cell[0] == "player" and cell[3] == "X" for cell in data["cells"]) == 17
+
+def test_pvp_routes_pair_players_and_stream_their_moves(placement):
+    """
+    Test if two players joining the lobby are paired, attack in turn and both receive the moves in their event streams
+    """
+    app = main.create_app({"BATTLESHIPS_EVENTS_TIMEOUT": 0.05})
+    client = app.test_client()
+    first = client.post("/pvp/join", json={"placement": placement}).get_json()
+    second = client.post("/pvp/join", json={"placement": placement}).get_json()
+    assert first["match_id"] is None and second["seat"] == "Player_2"
+
+    assert client.get(f"/pvp/attack?player={second['player']}&x=0&y=0").status_code == 409
+    assert client.get(f"/pvp/attack?player={first['player']}&x=0&y=0").status_code == 200
+    assert client.get(f"/pvp/attack?player={second['player']}&x=5&y=5").status_code == 200
+    assert client.get("/pvp/attack?player=missing&x=0&y=0").status_code == 404
+    assert client.post("/pvp/join", json={"placement": {}}).status_code == 400
+    stream = client.get(f"/pvp/events?player={first['player']}")
+    received = "".join(chunk.decode("utf-8") for _, chunk in zip(range(4), stream.response))
+    stream.close()
+    assert f'"match_id":"{second["match_id"]}"' in received
+    assert received.count("event: move") == 2
+
+def test_events_route_closes_when_resumed_after_the_last_event(placement):
+    """
+    Test if the /events stream of a finished game ends when it is resumed from its last event
+    """
+    client = main.app.test_client()
+    client.post("/placement?seed=5", json=placement)
+    client.post("/attack/batch", json={"shots": [[x, y] for y in range(10) for x in range(10)]})
+    last_event_id = client.get("/events").get_data(as_text=True).rsplit("id: ", 1)[1].split("\n")[0]
+
+    resumed = client.get("/events", headers={"Last-Event-ID": last_event_id}).get_data(as_text=True)
+    assert resumed == "retry: 3000\n\n"
+
+def test_spectate_and_pvp_streams_close_when_resumed_after_the_last_event(placement):
+    """
+    Test if the spectator stream of a finished game and the event stream of a finished match end when they are resumed
+    from their last event
+    """
+    app = main.create_app({"BATTLESHIPS_EVENTS_TIMEOUT": 0.05})
+    client = app.test_client()
+    game_id = client.post("/placement?seed=5", json=placement).get_json()["game_id"]
+    client.post("/attack/batch", json={"shots": [[x, y] for y in range(10) for x in range(10)]})
+    with app.extensions["battleships"]["store"].game(game_id) as game:
+        last_event_id = len(game["events"]) - 1
+    spectated = client.get(f"/spectate/{game_id}?last_event_id={last_event_id}").get_data(as_text=True)
+    assert spectated == "retry: 3000\n\n"
+
+    game_lobby = app.extensions["battleships"]["lobby"]
+    first = client.post("/pvp/join", json={"placement": placement}).get_json()["player"]
+    second = client.post("/pvp/join", json={"placement": placement}).get_json()["player"]
+    cells = [(x, y) for y in range(10) for x in range(10)]
+    for cell, opponent_cell in zip(cells, cells[::-1]):
+        _, event_id, event = game_lobby.attack(first, cell)
+        if event["game_over"]:
+            break
+        game_lobby.attack(second, opponent_cell)
+    resumed = client.get(f"/pvp/events?player={second}&last_event_id={event_id}").get_data(as_text=True)
+    assert "event: matched" in resumed and "event: move" not in resumed
+
+def test_state_route_is_not_modified_for_the_etag_of_a_gzipped_response(placement):
+    """
+    Test if the /state route returns a 304 response for the weak ETag of its gzipped response
+    """
+    client = main.create_app({"BATTLESHIPS_BOARD_SIZE": 20}).test_client()
+    client.post("/placement?seed=5", json=placement)
+    first = client.get("/state", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["ETag"].startswith("W/")
+
+    revalidated = client.get("/state", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+def test_concurrent_duplicate_attacks_on_the_sqlite_store_get_the_same_response(tmp_path, placement, monkeypatch):
+    """
+    Test if an /attack retried while the first request is still being played on the SQLite store gets the same response
+    as the first one, and only one turn is played
+    """
+    app = main.create_app({"BATTLESHIPS_STORE": str(tmp_path / "games.db")})
+    game_id = app.test_client().post("/placement?seed=5", json=placement).get_json()["game_id"]
+    play_precomputed_turn = main.play_precomputed_turn
+
+    def slow_turn(*arguments):
+        # Holding the turn open so the retry arrives while it is being played
+        time.sleep(0.05)
+        return play_precomputed_turn(*arguments)
+
+    monkeypatch.setattr(main, "play_precomputed_turn", slow_turn)
+    for x in range(3):
+        barrier = threading.Barrier(2)
+        responses = []
+
+        def attack():
+            client = app.test_client()
+            barrier.wait()
+            response = client.get(f"/attack?x={x}&y=7&game_id={game_id}")
+            responses.append((response.status_code, response.get_json()))
+            response.close()
+
+        threads = [threading.Thread(target=attack) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert responses[0] == responses[1] and responses[0][0] == 200
+
+    with app.extensions["battleships"]["store"].game(game_id) as game:
+        assert len(game["moves"]) == 6
+
+def test_concurrent_turns_are_published_to_spectators_in_order(placement):
+    """
+    Test if the moves of a turn whose publishing is slow still reach the spectators when another turn on the same game
+    is played at the same time, in the order they were played
+    """
+    app = main.create_app()
+    game_id = app.test_client().post("/placement?seed=5", json=placement).get_json()["game_id"]
+    hub = app.extensions["battleships"]["spectators"]
+    subscriber = hub.subscribe(game_id)
+    publish = hub.publish
+    calls = []
+
+    def slow_publish(*arguments):
+        calls.append(arguments[1])
+        if len(calls) == 1:
+            # Holding the first turn's publishing back so the second turn is played meanwhile
+            time.sleep(0.2)
+        publish(*arguments)
+
+    hub.publish = slow_publish
+
+    def attack(x):
+        app.test_client().get(f"/attack?x={x}&y=7&game_id={game_id}").close()
+
+    threads = [threading.Thread(target=attack, args=(x,)) for x in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(10)
+
+    assert [event_id for event_id, _ in hub.receive(subscriber, 1)] == [0, 1, 2, 3]
@@ -0,0 +1,30 @@
+import metrics
+
+########################################################################################################################
+# Test metrics.py functions
+########################################################################################################################
+def test_histogram_renders_cumulative_buckets():
+    """
+    Test if a histogram is rendered with cumulative bucket counts, its sum and its count for each label value
+    """
+    histogram = metrics.Histogram("test_seconds", "Test histogram.", label="route", buckets=(0.1, 1))
+    histogram.observe(0.05, "/attack")
+    histogram.observe(0.5, "/attack")
+    histogram.observe(5, "/attack")
+    lines = histogram.render()
+
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{route="/attack",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/attack",le="1"} 2' in lines
+    assert 'test_seconds_bucket{route="/attack",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/attack"} 3' in lines
+
+def test_gauge_goes_up_and_down():
+    """
+    Test if a gauge is rendered with its current value
+    """
+    gauge = metrics.Gauge("test_gauge", "Test gauge.")
+    gauge.inc(3)
+    gauge.dec()
+
+    assert gauge.render()[-1] == "test_gauge 2"
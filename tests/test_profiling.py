@@ -0,0 +1,37 @@
+import components
+import profiling
+
+########################################################################################################################
+# Test profiling.py functions
+########################################################################################################################
+def test_instrument_returns_the_function_when_disabled(monkeypatch):
+    """
+    Test if instrumenting a function while profiling is disabled leaves the function itself, so it costs nothing
+    """
+    monkeypatch.setattr(profiling, "ENABLED", False)
+
+    assert profiling.instrument(components.initialise_board) is components.initialise_board
+
+def test_instrument_counts_calls_and_time_when_enabled(monkeypatch):
+    """
+    Test if an instrumented function counts its calls and cumulative time while profiling is enabled
+    """
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setattr(profiling, "counters", {})
+    board = profiling.instrument(components.initialise_board)
+    board(5)
+    board(5)
+
+    calls, seconds = profiling.counters["components.initialise_board"]
+    assert calls == 2 and seconds >= 0
+
+def test_profile_games_writes_the_profile_and_the_allocation_report(tmp_path):
+    """
+    Test if profiling games writes a .pstats file and an allocation report with the bytes retained per game
+    """
+    stats_path, report_path = profiling.profile_games(lambda: components.initialise_board(50), 3, str(tmp_path),
+                                                      "boards")
+
+    assert stats_path.endswith(".pstats") and report_path.endswith(".txt")
+    with open(report_path, "r", encoding="utf-8") as report:
+        assert "Bytes retained per active game" in report.read()
@@ -0,0 +1,81 @@
+import random
+import components
+import journal
+import mp_game_engine
+import replay
+import storage
+
+########################################################################################################################
+# Test seeded games and replay.py functions
+########################################################################################################################
+def test_random_placement_is_reproducible_with_the_same_seed():
+    """
+    Test if the random placement algorithm places the ships in the same way when given generators with the same seed
+    """
+    boards = [components.place_battleships(components.initialise_board(), components.create_battleships(),
+                                           "random", rng=random.Random(7)) for _ in range(2)]
+
+    assert boards[0] == boards[1]
+
+def test_games_with_the_same_seed_play_the_same_ai_attacks(placement):
+    """
+    Test if two games with the same seed and the same user attacks have the same AI board and AI attacks
+    """
+    games = [mp_game_engine.new_game_state(placement, seed=1234) for _ in range(2)]
+    for game in games:
+        for user_attack in [(0, 0), (1, 1), (2, 2), (3, 3)]:
+            mp_game_engine.play_turn(game, user_attack)
+
+    assert games[0]["ai_board"] == games[1]["ai_board"]
+    assert games[0]["moves"] == games[1]["moves"]
+
+def test_recorded_game_replays_exactly(tmp_path, placement):
+    """
+    Test if a game recorded in the SQLite store is rebuilt with the same moves from its seed and the user's attacks
+    """
+    store = storage.SQLiteGameStore(str(tmp_path / "games.db"))
+    game_id = store.create_game(mp_game_engine.new_game_state(placement))
+    for user_attack in [(3, 2), (5, 5), (9, 9)]:
+        with store.game(game_id) as game:
+            mp_game_engine.play_turn(game, user_attack)
+
+    replayed, divergence = replay.replay_recorded_game(store.snapshot(game_id))
+    assert divergence == -1
+    assert len(replayed["moves"]) == 6
+
+def test_recorded_games_keep_their_placement_algorithm_and_a_53_bit_seed(tmp_path, placement):
+    """
+    Test if games recorded in the SQLite store and the journal are replayed with the placement algorithm they were
+    played with, and get seeds which fit in a JavaScript number
+    """
+    sqlite_store = storage.SQLiteGameStore(str(tmp_path / "games.db"))
+    journal_store = journal.JournalGameStore(str(tmp_path / "journal"))
+    game_ids = []
+    for store in (sqlite_store, journal_store):
+        game_id = store.create_game(mp_game_engine.new_game_state(placement, "simple"))
+        game_ids.append(game_id)
+        with store.game(game_id) as game:
+            assert game["seed"] < 2 ** 53
+            mp_game_engine.play_turn(game, (0, 0))
+    journal_store.close()
+
+    recorded = [sqlite_store.snapshot(game_ids[0]), journal.read_game(str(tmp_path / "journal"), game_ids[1])]
+    for recording in recorded:
+        assert recording[2] == "simple"
+        replayed, divergence = replay.replay_recorded_game(recording)
+        assert divergence == -1 and replayed["ai_board"][0][1] == "Aircraft_Carrier"
+
+def test_recorded_game_replays_the_ai_attacks_it_was_played_with(tmp_path, placement):
+    """
+    Test if a recorded game whose AI attacks did not come from the seed, such as those of the opening book or the
+    density AI, replays without a divergence
+    """
+    store = storage.SQLiteGameStore(str(tmp_path / "games.db"))
+    game_id = store.create_game(mp_game_engine.new_game_state(placement, seed=9))
+    for turn, user_attack in enumerate([(3, 2), (5, 5), (9, 9)]):
+        with store.game(game_id) as game:
+            mp_game_engine.play_turn(game, user_attack, (turn, 9))
+
+    replayed, divergence = replay.replay_recorded_game(store.snapshot(game_id))
+    assert divergence == -1
+    assert replayed["previous_ai_attacks"] == [(0, 9), (1, 9), (2, 9)]
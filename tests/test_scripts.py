@@ -0,0 +1,63 @@
+import asyncio
+import io
+import json
+import components
+import game_engine
+import mp_game_engine
+
+########################################################################################################################
+# Test the scripted command-line game functions
+########################################################################################################################
+def test_simple_game_loop_plays_a_script_to_the_end():
+    """
+    Test if the simple game loop reads its attacks from a script, skipping comments, and is won once every cell is attacked
+    """
+    lines = ["# every cell of the board"] + [f"{x},{y}" for y in range(10) for x in range(10)]
+    result = game_engine.simple_game_loop(game_engine.script_reader(lines), lambda *values: None)
+
+    assert result["result"] == "won"
+    assert result["hits"] == 17
+
+def test_run_scripts_writes_a_result_line_per_game(tmp_path):
+    """
+    Test if running scripts plays the AI opponent game loop without pausing and writes one JSON result line per script,
+    a script that runs out of moves ending the game as incomplete
+    """
+    complete = tmp_path / "complete.txt"
+    complete.write_text("\n".join(f"{x},{y}" for y in range(10) for x in range(10)))
+    short = tmp_path / "short.txt"
+    short.write_text("0,0\n0,0\n1,1\n")
+    out = io.StringIO()
+    game_engine.run_scripts(lambda read_input, output: mp_game_engine.ai_opponent_game_loop(1, read_input, output, 0),
+                            [str(complete), str(short)], out=out)
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [result["script"] for result in results] == [str(complete), str(short)]
+    assert results[0]["result"] in ("won", "lost")
+    assert results[1]["result"] == "incomplete" and results[1]["moves"] == 2
+
+def test_async_game_loop_plays_the_same_game_as_the_game_loop():
+    """
+    Test if the asyncio game loop, which chooses the AI's attacks while the user is typing, plays the same game as the
+    game loop with the same seed and attacks
+    """
+    lines = [f"{x},{y}" for y in range(10) for x in range(10)]
+    messages = [[], []]
+    result = mp_game_engine.ai_opponent_game_loop(3, game_engine.script_reader(lines), messages[0].append, 0)
+    async_result = asyncio.run(mp_game_engine.async_ai_opponent_game_loop(3, game_engine.script_reader(lines),
+                                                                          messages[1].append, 0))
+
+    assert async_result == result
+    assert messages[0] == messages[1]
+
+def test_cli_coordinates_input_accepts_multi_digit_coordinates_on_large_boards():
+    """
+    Test if the command-line input accepts coordinates of several digits within the size of the boards of the game
+    and asks again for those outside of them
+    """
+    config = components.GameConfig(1000)
+    messages = []
+    read_input = game_engine.script_reader(["1000,3", "12,x", "999,120"])
+
+    assert game_engine.cli_coordinates_input(read_input, messages.append, config) == (999, 120)
+    assert len(messages) == 2
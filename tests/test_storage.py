@@ -0,0 +1,112 @@
+import threading
+import components
+import mp_game_engine
+import storage
+
+########################################################################################################################
+# Test storage.py functions
+########################################################################################################################
+def test_encode_board_round_trip():
+    """
+    Test if a board encoded as a blob is decoded back into the same board
+    """
+    ships = components.create_battleships()
+    board = components.place_battleships(components.initialise_board(), ships, "random")
+    blob = storage.encode_board(board, ships)
+
+    assert isinstance(blob, bytes) and len(blob) == storage.BOARD_HEADER.size + 17 * storage.CELL.size
+    assert storage.decode_board(blob, ships) == board
+
+def test_board_blobs_do_not_grow_with_the_size_of_the_board(placement):
+    """
+    Test if the blob of a 10,000x10,000 board is as long as the blob of a 10x10 board with the same ships, and if blobs of
+    one byte per cell are still decoded
+    """
+    small = mp_game_engine.new_game_state(placement, seed=1)
+    large = mp_game_engine.new_game_state(placement, seed=1, config=components.GameConfig(10000))
+    blob = storage.encode_board(large["user_board"], large["fleet"])
+
+    assert len(blob) == len(storage.encode_board(small["user_board"], small["fleet"]))
+    decoded = storage.decode_board(blob, large["fleet"])
+    assert isinstance(decoded, components.SparseBoard) and decoded.rows == large["user_board"].rows
+    names = [None] + list(small["fleet"])
+    legacy = bytes(names.index(cell) for row in small["user_board"] for cell in row)
+    assert storage.decode_board(legacy, small["fleet"]) == small["user_board"]
+
+def test_sqlite_store_keeps_moves_between_connections(tmp_path, placement):
+    """
+    Test if the moves played on a game in the SQLite store are seen by another store opened on the same file,
+    as another worker process would
+    """
+    database = str(tmp_path / "games.db")
+    game_id = storage.SQLiteGameStore(database).create_game(mp_game_engine.new_game_state(placement))
+    with storage.SQLiteGameStore(database).game(game_id) as game:
+        result = mp_game_engine.play_turn(game, (3, 2))
+
+    with storage.SQLiteGameStore(database).game(game_id) as game:
+        assert game["previous_user_attacks"] == [(3, 2)]
+        assert game["previous_ai_attacks"] == [result["AI_Turn"]]
+        assert len(game["moves"]) == 2
+        assert game["ai_board"][2][3] is None
+
+def test_sqlite_store_plays_again_a_turn_overlapping_another(tmp_path, placement):
+    """
+    Test if a turn on a game which another turn stored its moves on while it was being played is played again on the
+    game with those moves, instead of failing to store the same moves again
+    """
+    database = str(tmp_path / "games.db")
+    store = storage.SQLiteGameStore(database)
+    game_id = store.create_game(mp_game_engine.new_game_state(placement))
+    plays = []
+
+    def first_turn(game):
+        plays.append(len(game["moves"]))
+        if len(plays) == 1:
+            # The second turn is played and stored while this one is being played
+            storage.update_game(storage.SQLiteGameStore(database), game_id,
+                                lambda other: mp_game_engine.play_turn(other, (4, 2)))
+        return mp_game_engine.play_turn(game, (3, 2))
+
+    storage.update_game(store, game_id, first_turn)
+
+    assert plays == [0, 2]
+    with store.game(game_id) as game:
+        assert game["previous_user_attacks"] == [(4, 2), (3, 2)]
+        assert len(game["moves"]) == 4
+
+def test_sqlite_store_turns_on_other_games_do_not_wait(tmp_path, placement):
+    """
+    Test if a turn on a game is stored while a turn on another game is still being played
+    """
+    database = str(tmp_path / "games.db")
+    store = storage.SQLiteGameStore(database)
+    first_id = store.create_game(mp_game_engine.new_game_state(placement))
+    second_id = store.create_game(mp_game_engine.new_game_state(placement))
+    stored = threading.Event()
+
+    def second_turn():
+        with storage.SQLiteGameStore(database).game(second_id) as game:
+            mp_game_engine.play_turn(game, (4, 2))
+        stored.set()
+
+    with store.game(first_id) as game:
+        mp_game_engine.play_turn(game, (3, 2))
+        thread = threading.Thread(target=second_turn)
+        thread.start()
+        assert stored.wait(5)
+    thread.join(5)
+
+    with store.game(second_id) as game:
+        assert game["previous_user_attacks"] == [(4, 2)]
+
+def test_memory_store_unknown_game_raises_key_error():
+    """
+    Test if asking the memory store for a game that does not exist raises a KeyError
+    """
+    store = storage.MemoryGameStore()
+    try:
+        with store.game("missing"):
+            pass
+        assert False, "A KeyError was not raised"
+    except KeyError:
+        pass
@@ -0,0 +1,126 @@
+"""Module that contains the Zobrist hashing of what a player has seen of the other player's
+board, kept up to date by game_engine.attack, and the transposition cache which lets the
+AI reuse its evaluation of a position it has seen before, in any game and in any of its
+reflections and rotations"""
+import threading
+from collections import OrderedDict
+
+MASK = (1 << 64) - 1
+# The 8 reflections and rotations of a square board, each mapping (x, y) to a new cell
+SYMMETRIES = (
+    lambda x, y, last: (x, y),
+    lambda x, y, last: (last - x, y),
+    lambda x, y, last: (x, last - y),
+    lambda x, y, last: (last - x, last - y),
+    lambda x, y, last: (y, x),
+    lambda x, y, last: (last - y, x),
+    lambda x, y, last: (y, last - x),
+    lambda x, y, last: (last - y, last - x),
+)
+# Index of the symmetry which undoes each symmetry
+INVERSES = (0, 1, 2, 3, 4, 6, 5, 7)
+
+def zobrist_key(index: int, hit: bool) -> int:
+    """Function used to get the random 64-bit key of an attacked cell. The keys are
+    computed with the splitmix64 mixing function rather than stored, so they are the same
+    in every process and cost no memory whatever the size of the board
+
+    :param index: an integer value with the index of the cell, y * size + x
+    :param hit: a boolean value, True if the attack on the cell was a hit
+    """
+    value = ((index * 2 + hit + 1) * 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+def new_hash_state(size: int) -> dict:
+    """Function used to set up the hashes of a board none of whose cells were attacked
+
+    :param size: an integer value representing the size of the board
+    """
+    # One hash per symmetry of the board and the number of hits
+    return {"size": size, "hashes": [0] * len(SYMMETRIES), "hits": 0}
+
+def record_attack(state: dict, coordinates: tuple, hit: bool) -> None:
+    """Function used to update the hashes of a board with a new attack, in constant time.
+    Each cell is expected to be attacked once
+
+    :param state: a dictionary returned by new_hash_state
+    :param coordinates: a tuple value representing the x and y coordinate of the attack
+    :param hit: a boolean value, True if the attack was a hit
+    """
+    size = state["size"]
+    hashes = state["hashes"]
+    for number, symmetry in enumerate(SYMMETRIES):
+        x, y = symmetry(coordinates[0], coordinates[1], size - 1)
+        hashes[number] ^= zobrist_key(y * size + x, hit)
+    if hit:
+        state["hits"] += 1
+
+def position_key(state: dict, fleet: dict, ships: dict) -> tuple:
+    """Function used to get the key of a position in a transposition cache and the
+    symmetry which turns the board into the orientation the position is cached in.
+    Positions which are reflections or rotations of each other get the same key
+
+    :param state: a dictionary returned by new_hash_state
+    :param fleet: a dictionary containing the name and size of each ship at the start of the game
+    :param ships: a dictionary containing the name and size left of each ship
+    """
+    hashes = state["hashes"]
+    symmetry = min(range(len(hashes)), key = hashes.__getitem__)
+    lengths = tuple(sorted(fleet[ship] for ship, left in ships.items() if left))
+    sunk_cells = sum(fleet[ship] for ship, left in ships.items() if not left)
+    # The observation of the board changes once every hit belongs to a sunk ship
+    return (hashes[symmetry], state["size"], lengths, sunk_cells == state["hits"]), symmetry
+
+def transform(indexes: list, symmetry: int, size: int) -> list:
+    """Function used to move cells of a board with one of its symmetries, returns their
+    sorted indexes
+
+    :param indexes: a list of the indexes of the cells, y * size + x
+    :param symmetry: an integer value with the index of the symmetry in SYMMETRIES
+    :param size: an integer value representing the size of the board
+    """
+    moved = []
+    for index in indexes:
+        x, y = SYMMETRIES[symmetry](index % size, index // size, size - 1)
+        moved.append(y * size + x)
+    return sorted(moved)
+
+class TranspositionCache:
+    """Least recently used cache of the evaluations of positions, such as the best cells
+    to attack, stored in the orientation of their key (see position_key)"""
+
+    def __init__(self, limit: int = 65536):
+        self.limit = limit
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple):
+        """Method used to retrieve the evaluation of a position, returns None if it is not cached
+
+        :param key: a tuple returned by position_key
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value) -> None:
+        """Method used to store the evaluation of a position, dropping the least recently
+        used one once the cache is full
+
+        :param key: a tuple returned by position_key
+        :param value: the evaluation of the position in the orientation of its key
+        """
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.limit:
+                self.entries.popitem(last = False)